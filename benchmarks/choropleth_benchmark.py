@@ -0,0 +1,74 @@
+"""
+Benchmarks the census choropleth: payload size and render time of the original layer
+(full-precision `to_json` of every column, colors from a per-feature `get_color` scan)
+vs. the compact pipeline in `src.choropleth`, for 10-, 50- and 100-mile catchments over
+the synthetic tracts of the overlap benchmark.
+
+Run from the repository root:
+    python -m benchmarks.choropleth_benchmark
+"""
+import time
+
+import folium
+import numpy as np
+
+from benchmarks.overlap_benchmark import make_circle, make_synthetic_tracts
+from src.choropleth import choropleth_geojson, DECILE_COLORS
+from src.core import overlay_tracts
+
+RADII_MILES = [10, 50, 100]
+
+
+def get_color(value, deciles):
+    """
+    The original per-feature decile lookup.
+    """
+    if value is None:
+        return '#999999'
+    for i, threshold in enumerate(deciles):
+        if value <= threshold:
+            return DECILE_COLORS[i]
+    return DECILE_COLORS[-1]
+
+
+def render(geojson_data, style_function):
+    m = folium.Map(location=[36.8, -119.4], tiles=None)
+    folium.GeoJson(geojson_data, style_function=style_function,
+                   tooltip=folium.GeoJsonTooltip(fields=['tooltip_value'], aliases=['Value:'], localize=True)).add_to(m)
+    return folium.Figure().add_child(m).render()
+
+
+def legacy_choropleth(tracts, plot_var, deciles):
+    return render(tracts.to_json(), lambda feature: {'fillColor': get_color(feature['properties'][plot_var], deciles),
+                                                      'color': 'black', 'weight': 0.1, 'fillOpacity': 0.7})
+
+
+def compact_choropleth(tracts, plot_var, deciles):
+    geojson_data = choropleth_geojson(tracts, plot_var, deciles, ['tooltip_value'])
+    return render(geojson_data, lambda feature: {'fillColor': feature['properties']['fill_color'],
+                                                  'color': 'black', 'weight': 0.1, 'fillOpacity': 0.7})
+
+
+def time_call(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    tract_gdf = make_synthetic_tracts()
+    rng = np.random.default_rng(0)
+    tract_gdf['B19013_001E'] = rng.lognormal(11, 0.4, len(tract_gdf))
+    tract_gdf['tooltip_value'] = tract_gdf['B19013_001E'].map(lambda x: f'${x:,.2f}')
+    print(f"{'radius (mi)':>12} {'tracts':>8} {'legacy MB':>10} {'compact MB':>11} {'legacy (s)':>11} {'compact (s)':>12}")
+    for radius in RADII_MILES:
+        tracts = overlay_tracts(tract_gdf, make_circle(radius).union_all())
+        deciles = tracts['B19013_001E'].quantile([0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9]).to_list()
+        legacy_time, legacy_html = time_call(legacy_choropleth, tracts, 'B19013_001E', deciles)
+        compact_time, compact_html = time_call(compact_choropleth, tracts, 'B19013_001E', deciles)
+        print(f'{radius:>12} {len(tracts):>8,} {len(legacy_html) / 1e6:>10.2f} {len(compact_html) / 1e6:>11.2f} '
+              f'{legacy_time:>11.2f} {compact_time:>12.2f}')
+
+
+if __name__ == '__main__':
+    main()
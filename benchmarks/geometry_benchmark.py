@@ -0,0 +1,97 @@
+"""
+Micro-benchmark of circle generation and area calculation: the original per-call
+`functools.partial(pyproj.transform, ...)` path vs. the cached-Transformer kernels
+in `src.geometry`, for 1-250 mile radii; and of POI distances: per-row
+`geopy.distance.geodesic` vs. the batched `distances_from` kernel.
+
+Run from the repository root:
+    python -m benchmarks.geometry_benchmark
+"""
+import time
+import warnings
+from functools import partial
+
+import geopandas as gpd
+import numpy as np
+import pyproj
+import shapely
+from geopy.distance import geodesic
+from shapely.geometry import Point
+from shapely.ops import transform
+
+from src.geometry import distances_from, geodesic_circle, equal_area_sq_meters, METERS_PER_MILE, SQ_METERS_PER_SQ_MILE
+
+LON, LAT = -87.63, 41.88
+RADII_MILES = [1, 5, 10, 25, 50, 100, 250]
+POI_COUNTS = [1000, 10000, 50000]
+
+
+def legacy_circle_and_area(radius_miles):
+    """
+    The original CatchmentArea.draw_circle followed by calculate_area_sq_miles.
+    """
+    az_ea_proj = partial(
+        pyproj.transform,
+        pyproj.Proj(f'+proj=aeqd +lat_0={LAT} +lon_0={LON} +x_0=0 +y_0=0'),
+        pyproj.Proj('+proj=longlat +datum=WGS84')
+    )
+    circle = transform(az_ea_proj, Point(LON, LAT).buffer(radius_miles * 1609.34))
+    proj = partial(pyproj.transform,
+                   pyproj.Proj(init='epsg:4326'),
+                   pyproj.Proj(proj='aea', lat_1=circle.bounds[1], lat_2=circle.bounds[3]))
+    return circle, round(transform(proj, circle).area / 2589988.11, 2)
+
+
+def kernel_circle_and_area(radius_miles):
+    circle = geodesic_circle(LON, LAT, radius_miles * METERS_PER_MILE)
+    return circle, round(equal_area_sq_meters(circle) / SQ_METERS_PER_SQ_MILE, 2)
+
+
+def make_pois(n_pois):
+    """
+    Creates small square POI footprints scattered around the benchmark location.
+    """
+    rng = np.random.default_rng(0)
+    lon, lat = LON + rng.normal(0, 0.3, n_pois), LAT + rng.normal(0, 0.3, n_pois)
+    return gpd.GeoSeries(shapely.box(lon - 0.0002, lat - 0.0002, lon + 0.0002, lat + 0.0002), crs='EPSG:4326')
+
+
+def legacy_distances(pois):
+    """
+    The original per-row distance of fetch_poi_within_catchment.
+    """
+    return pois.apply(lambda x: geodesic((x.centroid.y, x.centroid.x), (LAT, LON)).miles)
+
+
+def kernel_distances(pois):
+    return distances_from(LON, LAT, pois) / METERS_PER_MILE
+
+
+def time_call(func, *args, repeat=20):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(*args)
+    return (time.perf_counter() - start) / repeat, result
+
+
+def main():
+    warnings.simplefilter('ignore', FutureWarning)
+    warnings.simplefilter('ignore', DeprecationWarning)
+    print(f"{'radius (mi)':>12} {'legacy (ms)':>12} {'kernel (ms)':>12} {'speedup':>9} {'legacy area':>13} {'kernel area':>13}")
+    for radius in RADII_MILES:
+        legacy_time, (_, legacy_area) = time_call(legacy_circle_and_area, radius)
+        kernel_time, (_, kernel_area) = time_call(kernel_circle_and_area, radius)
+        print(f'{radius:>12} {legacy_time * 1000:>12.3f} {kernel_time * 1000:>12.3f} {legacy_time / kernel_time:>8.1f}x '
+              f'{legacy_area:>13,.2f} {kernel_area:>13,.2f}')
+
+    print(f"\n{'POIs':>12} {'legacy (ms)':>12} {'kernel (ms)':>12} {'speedup':>9} {'max diff (mi)':>14}")
+    for n_pois in POI_COUNTS:
+        pois = make_pois(n_pois)
+        legacy_time, legacy = time_call(legacy_distances, pois, repeat=1)
+        kernel_time, kernel = time_call(kernel_distances, pois, repeat=3)
+        print(f'{n_pois:>12,} {legacy_time * 1000:>12.1f} {kernel_time * 1000:>12.1f} {legacy_time / kernel_time:>8.1f}x '
+              f'{np.abs(legacy.to_numpy() - kernel).max():>14.2e}')
+
+
+if __name__ == '__main__':
+    main()
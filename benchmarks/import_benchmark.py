@@ -0,0 +1,50 @@
+"""
+Cold-import benchmark: time to import each entry point in a fresh interpreter, with
+the original module-level import set of `src/utils.py` (Streamlit, folium, osmnx,
+plotly and `from scipy import *`) as the baseline.
+
+Run from the repository root:
+    python -m benchmarks.import_benchmark
+"""
+import statistics
+import subprocess
+import sys
+import time
+
+REPEAT = 5
+# What every importer of the original src/utils.py paid for at import time
+LEGACY_IMPORTS = ('import streamlit, folium, streamlit_folium, geopandas, census, plotly.figure_factory, '
+                  'plotly.express, osmnx, requests_cache; from scipy import *')
+TARGETS = {
+    'legacy utils imports': LEGACY_IMPORTS,
+    'src.core': 'import src.core',
+    'src.catchment_area': 'import src.catchment_area',
+    'src.batch (worker)': 'import src.batch',
+    'src.utils (app)': 'import src.utils',
+}
+
+
+def time_import(statement, repeat=REPEAT):
+    """
+    Returns the median wall time (seconds) of running `statement` in a fresh interpreter.
+    """
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', statement], check=True, capture_output=True)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    interpreter = time_import('pass')
+    legacy = time_import(LEGACY_IMPORTS) - interpreter
+    print(f'Interpreter start-up: {interpreter * 1000:.0f} ms (subtracted below)')
+    print(f"{'target':<24} {'import (ms)':>12} {'vs legacy':>10}")
+    for name, statement in TARGETS.items():
+        elapsed = time_import(statement) - interpreter
+        print(f'{name:<24} {elapsed * 1000:>12.0f} {legacy / elapsed:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Benchmarks population surface estimates against the exact tract overlay.
+
+Rasterizes the synthetic state of the overlap benchmark (~9,000 tracts with random
+populations) at 500 m cells, then times the summed-area estimate and the tract overlay
+for 1-100 mile circular catchments and checks the estimate against its error bound. The
+overlay timing leaves out loading the tracts and fetching their populations, which the
+surface also saves in the app.
+
+Run from the repository root:
+    python -m benchmarks.population_surface_benchmark
+"""
+import time
+
+import numpy as np
+
+from benchmarks.overlap_benchmark import make_synthetic_tracts, time_call, CENTER_LON, CENTER_LAT
+from src.core import overlay_tracts
+from src.geometry import geodesic_circle, project, EQUAL_AREA_CRS, METERS_PER_MILE
+from src.population_surface import rasterize_population, PopulationSurface
+
+RADII_MILES = [1, 5, 10, 25, 50, 100]
+CELL_SIZE = 500
+
+
+def main():
+    tract_gdf = make_synthetic_tracts()
+    population = np.random.default_rng(0).integers(500, 8000, len(tract_gdf)).astype(float)
+    start = time.perf_counter()
+    geometries = project(tract_gdf.geometry.to_numpy(), tract_gdf.crs.to_string(), EQUAL_AREA_CRS)
+    surface = PopulationSurface(rasterize_population(geometries, population, CELL_SIZE), CELL_SIZE)
+    print(f'{len(tract_gdf):,} synthetic tracts rasterized to {len(surface.tile_keys):,} tiles of '
+          f'{CELL_SIZE} m cells in {time.perf_counter() - start:.1f} s')
+    tract_population = dict(zip(tract_gdf['GEOID'], population))
+    print(f"{'radius (mi)':>12} {'overlay':>10} {'surface':>10} {'bound':>8} {'diff':>6} "
+          f"{'overlay (s)':>12} {'surface (ms)':>13} {'speedup':>9}")
+    for radius in RADII_MILES:
+        circle = geodesic_circle(CENTER_LON, CENTER_LAT, radius * METERS_PER_MILE)
+        overlay_time, overlap = time_call(lambda: overlay_tracts(tract_gdf.copy(), circle))
+        exact = (overlap['GEOID'].map(tract_population) * overlap['coverage_percentage']).sum()
+        surface_time, estimate = time_call(surface.estimate, circle, repeat=20)
+        diff = abs(estimate['population'] - exact)
+        print(f"{radius:>12} {exact:>10,.0f} {estimate['population']:>10,.0f} {estimate['error_bound']:>8,.0f} "
+              f"{diff:>6,.0f} {overlay_time:>12.3f} {surface_time * 1000:>13.2f} {overlay_time / surface_time:>8.0f}x")
+
+
+if __name__ == '__main__':
+    main()
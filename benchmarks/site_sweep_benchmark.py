@@ -0,0 +1,53 @@
+"""
+Benchmarks the FFT site sweep against scoring candidates one catchment at a time.
+
+Rasterizes the synthetic state of the overlap benchmark at 500 m cells, sweeps a
+2 x 2 degree region with 5 and 25 mile catchments at 1 mile spacing, and compares a
+sample of candidates with one population surface estimate per catchment (itself far
+faster than a CatchmentArea run with its tract overlay).
+
+Run from the repository root:
+    python -m benchmarks.site_sweep_benchmark
+"""
+import time
+
+import numpy as np
+
+from benchmarks.overlap_benchmark import make_synthetic_tracts, CENTER_LON, CENTER_LAT
+from src.geometry import geodesic_circle, project, EQUAL_AREA_CRS, METERS_PER_MILE
+from src.population_surface import rasterize_population, PopulationSurface
+from src.site_sweep import sweep_sites
+
+REGION = (CENTER_LON - 1, CENTER_LAT - 1, CENTER_LON + 1, CENTER_LAT + 1)
+RADII_MILES = [5, 25]
+SPACING_MILES = 1
+CELL_SIZE = 500
+SAMPLE_SITES = 200
+
+
+def main():
+    tract_gdf = make_synthetic_tracts()
+    population = np.random.default_rng(0).integers(500, 8000, len(tract_gdf)).astype(float)
+    geometries = project(tract_gdf.geometry.to_numpy(), tract_gdf.crs.to_string(), EQUAL_AREA_CRS)
+    surface = PopulationSurface(rasterize_population(geometries, population, CELL_SIZE), CELL_SIZE)
+    # Warm up the cached transformers
+    surface.estimate(geodesic_circle(CENTER_LON, CENTER_LAT, METERS_PER_MILE))
+    print(f"{'radius (mi)':>12} {'sites':>8} {'sweep (s)':>10} {'per site (s)':>13} {'speedup':>9} {'max rel. diff':>14}")
+    for radius in RADII_MILES:
+        start = time.perf_counter()
+        candidates = sweep_sites(surface, REGION, radius, SPACING_MILES).candidates()
+        sweep_time = time.perf_counter() - start
+
+        sample = candidates.sample(SAMPLE_SITES, random_state=radius)
+        start = time.perf_counter()
+        estimates = np.array([surface.estimate(geodesic_circle(lon, lat, radius * METERS_PER_MILE))['population']
+                              for lon, lat in zip(sample['longitude'], sample['latitude'])])
+        # Extrapolated to every candidate
+        per_site_time = (time.perf_counter() - start) * len(candidates) / SAMPLE_SITES
+        rel_diff = np.abs(sample['population'].to_numpy() / estimates - 1).max()
+        print(f'{radius:>12} {len(candidates):>8,} {sweep_time:>10.2f} {per_site_time:>13.1f} '
+              f'{per_site_time / sweep_time:>8.0f}x {rel_diff:>14.2e}')
+
+
+if __name__ == '__main__':
+    main()
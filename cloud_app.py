@@ -6,9 +6,15 @@ from geopy.location import Location
 from census import Census
 import time
 from src.utils import *
-import pickle
 from folium.plugins import Fullscreen
 from src.catchment_area import CatchmentArea
+from src.acs_store import ACSStore, has_acs_store
+from src.isochrone_engine import RoadGraphIsochroneEngine
+from src.isochrone_cache import get_isochrone_cache
+from src.poi_store import POIStore, has_poi_store
+from src.census_catalog import load_census_catalog, profile_variables
+from src.population_surface import PopulationSurface, has_population_surface, DEFAULT_CELL_SIZE
+from src.session_cache import StageCache
 
 # TO DO:
 # update ACS data to 2022
@@ -21,9 +27,53 @@ ors_client = client.Client(key=st.secrets['openroute_api_key'])
 census_year = st.secrets['census_year']
 census_api_key =  st.secrets['census_api_key']
 census_api = Census(census_api_key) 
-acs_api_url = "https://api.census.gov/data/{0}/acs/acs5".format(census_year)
 nominatim_client =  st.secrets['nominatim_client']
 default_address = st.secrets['default_address']
+# Serve ACS tract data from the local store when it has been ingested for this year
+acs_store = ACSStore(census_year) if has_acs_store(census_year) else None
+# Serve POIs from the local OSM extract store when it has been ingested, instead of the Overpass API
+poi_store = POIStore() if has_poi_store() else None
+
+@st.cache_resource
+def load_isochrone_backend(road_graph_dir):
+    # Offline drive-time isochrones from a pre-built road graph, loaded once per process
+    return RoadGraphIsochroneEngine(road_graph_dir)
+
+# Optional: serve travel-time catchments from a local road graph instead of OpenRouteService
+isochrone_backend = load_isochrone_backend(st.secrets['road_graph_dir']) if 'road_graph_dir' in st.secrets else None
+
+@st.cache_resource
+def get_census_catalog(census_year):
+    # Searchable Census variable catalog (compiled on disk, or from the Census API), loaded once per process
+    return load_census_catalog(census_year)
+
+@st.cache_resource
+def get_population_surface(census_year, cell_size):
+    # Population raster for instant distance-catchment population, loaded once per process when it has been built
+    return PopulationSurface.load(census_year, cell_size) if has_population_surface(census_year, cell_size) else None
+
+def build_catchment_area(address, radius_type, radius, travel_profile):
+    previous = st.session_state.get('catchment_area')
+    if previous is not None and (previous.address, previous.location, previous.radius_type, previous.travel_profile) == (address, st.session_state.location, radius_type, travel_profile):
+        # Only the radius changed: a nested catchment reuses the previous tracts, Census data and POIs
+        return previous.with_radius(radius)
+    catchment_area = CatchmentArea(address, st.session_state.location, radius_type, radius, travel_profile,
+                                   ors_client, acs_store, isochrone_backend, get_isochrone_cache(), poi_store,
+                                   get_population_surface(census_year, st.secrets.get('population_cell_size', DEFAULT_CELL_SIZE)))
+    catchment_area.generate_geometry()
+    return catchment_area
+
+def build_catchment_map(session_state):
+    # Base map with the selected tile layer, plus the catchment and its location once generated
+    session_state.catchment_map = folium.Map(location=[session_state.location.latitude, session_state.location.longitude], zoom_start=13)
+    update_map_layer(session_state)
+    # Fullscreen plugin for map expansion
+    Fullscreen(position="topright", title="Expand me", title_cancel="Exit me", force_separate_button=True).add_to(session_state.catchment_map)
+    if "catchment_area" in session_state:
+        plot_catchment_area(session_state)
+        folium.Marker([session_state.catchment_area.location.latitude, session_state.catchment_area.location.longitude],
+                        popup='Catchment Location', icon=folium.Icon(color='red', prefix='fa',icon='map-pin'), tooltip=session_state.catchment_area.address).add_to(session_state.catchment_map)
+    return map_html(session_state.catchment_map)
 
 def main():
     # set theme
@@ -34,6 +84,9 @@ def main():
     st._config.set_option(f'theme.textColor',"#262730")
 
     st.title("Catchment Area Explorer")
+    # Results of the previous reruns; stages are only recomputed when their inputs change
+    stages = st.session_state.setdefault('stages', StageCache())
+    stages.start_rerun()
     tab1, tab2, tab3, tab4, tab5 = st.tabs(["Generate Catchment Area", "Demographic Insights", "Point of Interest Insights", "Real Estate Insights","How It Works"])
     # User inputs
     with st.sidebar:
@@ -56,61 +109,52 @@ def main():
         st.subheader('Catchment area characteristics')
         st.session_state.tile_layer_value, st.session_state.tile_layer_type = map_tile_layer_selections()
         # Initialize a location
-        st.session_state.location = geocode_address(address, nominatim_client)
-        # Initialize map
-        st.session_state.catchment_map = folium.Map(location=[st.session_state.location.latitude, st.session_state.location.longitude], zoom_start=13)
-        update_map_layer(st.session_state)
-        # Fullscreen plugin for map expansion
-        Fullscreen(position="topright", title="Expand me", title_cancel="Exit me", force_separate_button=True).add_to(st.session_state.catchment_map)
+        st.session_state.location = stages.get('geocode', (address,), lambda: geocode_address(address, nominatim_client))
 
         # Generate catchment area
         if generate_catchment:
             # Initialize 'location' in session state if not already present
             if st.session_state.location:
                 with st.spinner('Generating catchment area...'):
-                    st.session_state.catchment_area = CatchmentArea(address,
-                                                                    st.session_state.location, 
-                                                                    radius_type, 
-                                                                    radius,   
-                                                                    travel_profile,
-                                                                    ors_client)
-                    st.session_state.catchment_area.generate_geometry()
-                    plot_catchment_area(st.session_state)
+                    st.session_state.catchment_area = stages.get('catchment', (address, radius_type, radius, travel_profile),
+                                                                 lambda: build_catchment_area(address, radius_type, radius, travel_profile))
             else: 
                 st.error("Could not geocode the address. Please try another address or check the geocoding service.")
 
+        catchment_key = None
         if "catchment_area" in st.session_state and st.session_state.location:
-            # Calculate catchment properties
-            st.session_state.catchment_area.calculate_area_sq_miles()
-            st.session_state.catchment_area.calculate_total_population(census_api, census_year)
+            catchment_area = st.session_state.catchment_area
+            catchment_key = (catchment_area.address, catchment_area.radius_type, catchment_area.radius, catchment_area.travel_profile)
+            # Calculate catchment properties (only when the catchment changed)
+            stages.get('area', catchment_key, catchment_area.calculate_area_sq_miles)
+            stages.get('population', catchment_key + (census_year,), lambda: catchment_area.calculate_total_population(census_api, census_year))
             # Generate dynamic caption
             location_caption = 'Location: '+address
             if radius_type == 'Distance (miles)':
                 radius_caption = 'Catchment radius: '+str(radius)+' miles'
             else: 
                 radius_caption = 'Catchment radius: '+str(radius)+' minutes by '+travel_profile.lower()
-            total_pop_caption = 'Estimated catchment population: ' + '{:,}'.format(int(st.session_state.catchment_area.total_population))
+            total_pop_caption = total_population_caption(st.session_state.catchment_area)
             catchment_size_caption = "Catchment size: "+'{:,}'.format(st.session_state.catchment_area.area)+" square miles"
             map_caption1 = location_caption + ' | ' + radius_caption 
             map_caption2 = catchment_size_caption + ' | ' + total_pop_caption
             st.caption(map_caption1)
             st.caption(map_caption2)
-            folium.GeoJson(st.session_state.catchment_area.geometry, style_function=lambda x: {'fillColor': 'blue', 'color': 'blue'}).add_to(st.session_state.catchment_map)
-            folium.Marker([st.session_state.catchment_area.location.latitude, st.session_state.catchment_area.location.longitude],
-                            popup='Catchment Location', icon=folium.Icon(color='red', prefix='fa',icon='map-pin'), tooltip=st.session_state.catchment_area.address).add_to(st.session_state.catchment_map)
         else:
             st.caption('No catchment generated. Use left control panel to define and generate your catchment area.')
-        # Plot catchment map
-        folium_static(st.session_state.catchment_map)
+        # Plot catchment map (rendered once per location, tile layer and catchment, and reused by the other tabs)
+        map_key = (st.session_state.location.point if st.session_state.location else None,
+                   tile_layer_name(st.session_state.tile_layer_value), catchment_key)
+        st.session_state.catchment_map_html = stages.get('catchment_map', map_key, lambda: build_catchment_map(st.session_state))
+        show_map_html(st.session_state.catchment_map_html)
 
 
     with tab2:
         st.subheader('Overlay demographic data within your catchment')
-        variables_df = fetch_census_variables(acs_api_url)
-        if variables_df is not None:
-            filters_dict = variables_df.groupby('Variable Group')['Variable Name'].apply(list).to_dict()
-            var_group, var_name, normalization = make_census_variable_selections(filters_dict)
-            plot_census_data = st.button("Plot Demographic Data")
+        census_catalog = get_census_catalog(census_year)
+        if census_catalog is not None:
+            var_group, var_name, normalization = make_census_variable_selections(census_catalog)
+            plot_census_data = st.button("Plot Demographic Data", disabled=var_group is None)
         st.divider()
         if "catchment_area" in st.session_state:
             location_caption = 'Location: '+address
@@ -118,7 +162,7 @@ def main():
                 radius_caption = 'Catchment radius: '+str(radius)+' miles'
             else: 
                 radius_caption = 'Catchment radius: '+str(radius)+' minutes by '+travel_profile.lower()
-            total_pop_caption = 'Estimated catchment population: ' + '{:,}'.format(int(st.session_state.catchment_area.total_population))
+            total_pop_caption = total_population_caption(st.session_state.catchment_area)
             catchment_size_caption = "Catchment size: "+'{:,}'.format(st.session_state.catchment_area.area)+" square miles"
             map_caption1 = location_caption + ' | ' + radius_caption 
             map_caption2 = catchment_size_caption + ' | ' + total_pop_caption
@@ -131,16 +175,17 @@ def main():
             if "catchment_area" in st.session_state:
                 with st.spinner('Fetching demographic data to plot...'):
                     # Fetch variable codes to pass to census API
-                    acs_variables = variables_df[(variables_df['Variable Name']==var_name) & (variables_df['Variable Group']==var_group)]['variable'].to_list()
-                    acs_variable_types = variables_df[(variables_df['Variable Name']==var_name) & (variables_df['Variable Group']==var_group)]['variable_type'].to_list()
-                    acs_variable_dict = dict(zip(acs_variables, acs_variable_types)) # dictionary of variable codes and assocaited variable types
+                    acs_variable_dict = census_catalog.variable_types(var_group, var_name) # dictionary of variable codes and assocaited variable types
+                    acs_variables = list(acs_variable_dict)
                     # Fetch census data for overlapping tracts
                     st.session_state.catchment_area.demographic_enrichment(census_api, acs_variable_dict,census_year, normalization)
+                    # Catchment-level totals/averages from the apportionment matrix (reuses the tract data just fetched)
+                    variable_summary = st.session_state.catchment_area.summarize_census_variables(census_api, acs_variable_dict, census_year)
                     # Generate dynamic caption (displaying catchment area total or weighted avg. depending on type of variable)
                     if var_name.startswith('Total') or var_name.startswith('Aggregate'):
-                        st.caption('Sum (across entire catchment) of `'+var_group+'` - `'+var_name+'`: '+f'{int(st.session_state.catchment_area.census_data[list(acs_variable_dict)[0]].sum(skipna=True)):,}')
+                        st.caption('Sum (across entire catchment) of `'+var_group+'` - `'+var_name+'`: '+f'{int(variable_summary["total"].iloc[0]):,}')
                     else: 
-                        weighted_avg_dict = calculate_census_var_weighted_average(st.session_state.catchment_area.census_data, acs_variables)
+                        weighted_avg_dict = variable_summary['average'].to_dict()
                         if ('DOLLARS' in var_group) or  ('INCOME' in var_group) or ('COSTS' in var_group):
                             st.caption('Average (across entire catchment population) of `'+var_group+'` - `'+var_name+'`: '+f'${np.round(weighted_avg_dict[acs_variables[0]],2):,}')
                         else:
@@ -155,13 +200,25 @@ def main():
             else:
                 st.error('Must generate catchment area first before overlaying census data. Please define and generate your catchment area using the left control panel.')
         else:
-            folium_static(st.session_state.catchment_map)
+            show_map_html(st.session_state.catchment_map_html)
+        # Many variables in one go; plots of profile variables are then served from the fetched tract data
+        if census_catalog is not None and "catchment_area" in st.session_state:
+            st.divider()
+            with st.expander('Demographic profile'):
+                profile = make_demographic_profile_selections()
+                if st.button('Build Demographic Profile'):
+                    with st.spinner('Fetching demographic profile...'):
+                        try:
+                            st.session_state.catchment_area.demographic_profile(census_api, census_year, profile_variables(profile, census_catalog))
+                        except ValueError as e:
+                            st.error(str(e))
+                if st.session_state.catchment_area.profile_summary is not None:
+                    st.dataframe(profile_summary_table(st.session_state.catchment_area.profile_summary, census_catalog))
         
     with tab3:
         st.subheader('Overlay point-of-interest (POI) data within your catchment')
-        # Read in list of amenities
-        with open('src/osm_tags.pkl', 'rb') as f:
-            osm_tags = pickle.load(f)
+        # Read in list of amenities (loaded once per process)
+        osm_tags = load_osm_tags()
         poi_tags, poi_map_type = make_poi_selections(osm_tags)
         plot_poi_data = st.button("Plot POI data")
         st.divider()
@@ -173,7 +230,7 @@ def main():
                 radius_caption = 'Catchment radius: '+str(radius)+' miles'
             else: 
                 radius_caption = 'Catchment radius: '+str(radius)+' minutes by '+travel_profile.lower()
-            total_pop_caption = 'Estimated catchment population: ' + '{:,}'.format(int(st.session_state.catchment_area.total_population))
+            total_pop_caption = total_population_caption(st.session_state.catchment_area)
             catchment_size_caption = "Catchment size: "+'{:,}'.format(st.session_state.catchment_area.area)+" square miles"
             map_caption1 = location_caption + ' | ' + radius_caption 
             map_caption2 = catchment_size_caption + ' | ' + total_pop_caption
@@ -194,7 +251,11 @@ def main():
             else:
                 st.error('Must generate catchment area first before overlaying census data. Please define and generate your catchment area using the left control panel.')
         else:
-            folium_static(st.session_state.catchment_map)
+            show_map_html(st.session_state.catchment_map_html)
+
+    with st.sidebar:
+        with st.expander('Debug: stages recomputed on this rerun'):
+            st.dataframe(stages.report(), hide_index=True)
 
     with tab4:
         st.subheader('Coming Soon!')
@@ -220,7 +281,7 @@ def main():
                     plot below which shows the variable's distribution across all census tracts in your catchment area.
                     ''')
         st.markdown('''3. Overlaying Points-of-Interest: Finally, navigate to the `Point of Interest Insights` tab to plot points of interest within your catchment area.
-                    Select your POI categoy (e.g., cafes, fast food, dentist, car wash, etc.) and specify your map type (POI markers or heatmap). Upon clicking the
+                    Select your POI categoy (e.g., cafes, fast food, dentist, car wash, etc.) and specify your map type (POI markers, POI clusters or heatmap). Upon clicking the
                     `Plot POI Data` button, you can view your points-of-interest within your catchment area using the interactive map.
                     ''')
         st.subheader('Open-Source Data APIs:')
@@ -0,0 +1,215 @@
+"""
+Local columnar store of ACS 5-year tract tables, used as an offline backend for
+`fetch_census_data_for_tracts`.
+
+The store is laid out as one Parquet file per ACS table, sorted by GEOID::
+
+    <store_dir>/<census_year>/<TABLE>.parquet      # columns: GEOID, <TABLE>_001E, <TABLE>_002E, ...
+
+Build it once with the ingest command, e.g.:
+    python -m src.acs_store 2021 B01003 B19013 B25077          # all states
+    python -m src.acs_store 2021 B01003 --states 06 32         # California and Nevada only
+"""
+import argparse
+import logging
+import os
+import re
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+from census import Census
+
+from src.core import call_with_retries, raise_transient_statuses
+
+logger = logging.getLogger(__name__)
+
+ACS_STORE_DIR = os.environ.get('CATCHMENT_ACS_STORE', 'data/acs_store')
+
+ACS_VARIABLES_URL = "https://api.census.gov/data/{0}/acs/acs5/variables.json"
+
+# FIPS codes of the 50 states, DC and Puerto Rico
+STATE_FIPS_CODES = ['01', '02', '04', '05', '06', '08', '09', '10', '11', '12', '13', '15', '16', '17', '18', '19',
+                    '20', '21', '22', '23', '24', '25', '26', '27', '28', '29', '30', '31', '32', '33', '34', '35',
+                    '36', '37', '38', '39', '40', '41', '42', '44', '45', '46', '47', '48', '49', '50', '51', '53',
+                    '54', '55', '56', '72']
+
+
+def table_of(variable):
+    """
+    Returns the ACS table a variable belongs to (e.g. 'B01003' for 'B01003_001E').
+    """
+    return variable.split('_')[0]
+
+
+def list_table_variables(census_year, table):
+    """
+    Lists the estimate variables of an ACS table from the Census API variable catalog.
+
+    Parameters
+    ----------
+    census_year : str
+        The ACS year.
+    table : str
+        The ACS table ID, e.g. 'B19013'.
+
+    Returns
+    -------
+    list of str
+        The table's estimate variable codes, sorted.
+    """
+    response = requests.get(ACS_VARIABLES_URL.format(census_year))
+    response.raise_for_status()
+    pattern = re.compile(rf'^{re.escape(table)}_\d+E$')
+    return sorted(v for v in response.json()['variables'] if pattern.match(v))
+
+
+def ingest_acs_tables(census_api, census_year, tables, state_codes=None, store_dir=ACS_STORE_DIR):
+    """
+    Downloads ACS 5-year tract tables from the Census API and writes them to the local store.
+
+    Parameters
+    ----------
+    census_api : census.Census
+        The Census API client.
+    census_year : str
+        The ACS year.
+    tables : list of str
+        The ACS table IDs to ingest.
+    state_codes : list of str, optional
+        The state FIPS codes to ingest. Defaults to all states, DC and Puerto Rico.
+    store_dir : str
+        The root directory of the store.
+
+    Returns
+    -------
+    dict
+        The number of tracts stored per table.
+    """
+    year_dir = os.path.join(store_dir, str(census_year))
+    os.makedirs(year_dir, exist_ok=True)
+    state_codes = state_codes or STATE_FIPS_CODES
+    raise_transient_statuses(census_api)
+    tract_counts = {}
+    for table in tables:
+        variables = list_table_variables(census_year, table)
+        state_frames = []
+        for state_code in state_codes:
+            # The census client splits tables wider than the API's 50-variable limit into several requests
+            state_json = call_with_retries(census_api.acs5.get, variables,
+                                           geo={'for': 'tract:*', 'in': f'state:{state_code}'}, year=int(census_year))
+            state_frames.append(pd.DataFrame(state_json))
+        table_data = pd.concat(state_frames, ignore_index=True)
+        table_data['GEOID'] = table_data['state'] + table_data['county'] + table_data['tract']
+        table_data = table_data[['GEOID'] + variables]
+        table_data[variables] = table_data[variables].apply(pd.to_numeric, errors='coerce')
+
+        # Replace previously ingested tracts of the same states
+        path = os.path.join(year_dir, f'{table}.parquet')
+        if os.path.exists(path):
+            existing = pd.read_parquet(path)
+            table_data = pd.concat([existing[~existing['GEOID'].str[:2].isin(state_codes)], table_data], ignore_index=True)
+        table_data.sort_values('GEOID').to_parquet(path, index=False, row_group_size=10000)
+        tract_counts[table] = len(table_data)
+    return tract_counts
+
+
+def has_acs_store(census_year, store_dir=ACS_STORE_DIR):
+    """
+    Returns True if any ACS table has been ingested for the given year.
+    """
+    year_dir = os.path.join(store_dir, str(census_year))
+    return os.path.isdir(year_dir) and any(f.endswith('.parquet') for f in os.listdir(year_dir))
+
+
+class ACSStore:
+    """
+    Read-only view of the local ACS store for one year, answering variable/tract lookups
+    with a columnar read of only the requested columns and GEOIDs.
+    """
+    def __init__(self, census_year, store_dir=ACS_STORE_DIR):
+        self.census_year = str(census_year)
+        self.year_dir = os.path.join(store_dir, self.census_year)
+
+    def tables(self):
+        """
+        Returns the ACS table IDs available in the store.
+        """
+        if not os.path.isdir(self.year_dir):
+            return []
+        return sorted(f[:-len('.parquet')] for f in os.listdir(self.year_dir) if f.endswith('.parquet'))
+
+    def lookup(self, variables, geoids):
+        """
+        Reads tract values for a set of variables from the store.
+
+        Each table is served on its own, so a table (or variable) missing from the store, or
+        tracts missing from a table, only leave those variables of those tracts to the Census API.
+
+        Parameters
+        ----------
+        variables : list of str
+            The census variable codes.
+        geoids : iterable of str
+            The tract GEOIDs.
+
+        Returns
+        -------
+        tuple
+            A DataFrame with 'state', 'county', 'tract', 'GEOID' and one column per variable served
+            from the store, for every tract that has any of them (NaN where a table lacks the tract),
+            and the list of (variables, GEOIDs) groups the store could not serve (to be fetched from
+            the Census API).
+        """
+        geoids = list(dict.fromkeys(geoids))
+        variables = list(dict.fromkeys(variables))
+        available = set(self.tables())
+        store_data = pd.DataFrame({'GEOID': pd.Series(dtype=object)})
+        missing = {}
+        for table in dict.fromkeys(table_of(v) for v in variables):
+            table_vars = [v for v in variables if table_of(v) == table]
+            path = os.path.join(self.year_dir, f'{table}.parquet')
+            table_data = None
+            if table in available:
+                try:
+                    # Variables that were not part of the ingested table are left to the Census API
+                    stored_vars = [v for v in table_vars if v in pq.read_schema(path).names]
+                    if stored_vars:
+                        table_data = pd.read_parquet(path, columns=['GEOID'] + stored_vars, filters=[('GEOID', 'in', geoids)])
+                except (FileNotFoundError, pa.ArrowInvalid) as e:
+                    # A table removed or left unreadable (e.g. by an interrupted ingest) is served by the Census API
+                    logger.warning('Could not read ACS table %s from %s, fetching it from the Census API: %s', table, path, e)
+                    table_data = None
+            if table_data is None:
+                missing.setdefault(tuple(geoids), []).extend(table_vars)
+                continue
+            store_data = store_data.merge(table_data, on='GEOID', how='outer')
+            unstored_vars = [v for v in table_vars if v not in stored_vars]
+            if unstored_vars:
+                missing.setdefault(tuple(geoids), []).extend(unstored_vars)
+            missing_geoids = sorted(set(geoids) - set(table_data['GEOID']))
+            if missing_geoids:
+                missing.setdefault(tuple(missing_geoids), []).extend(stored_vars)
+
+        store_data.insert(0, 'state', store_data['GEOID'].str[:2])
+        store_data.insert(1, 'county', store_data['GEOID'].str[2:5])
+        store_data.insert(2, 'tract', store_data['GEOID'].str[5:])
+        return store_data, [(missing_vars, list(missing_geoids)) for missing_geoids, missing_vars in missing.items()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingest ACS 5-year tract tables into the local ACS store.')
+    parser.add_argument('census_year', help='ACS year to ingest, e.g. 2021')
+    parser.add_argument('tables', nargs='+', help='ACS table IDs to ingest, e.g. B01003 B19013')
+    parser.add_argument('--states', nargs='*', help='State FIPS codes to ingest (default: all states)')
+    parser.add_argument('--store-dir', default=ACS_STORE_DIR, help='Root directory of the ACS store')
+    parser.add_argument('--api-key', default=os.environ.get('CENSUS_API_KEY'), help='Census API key (default: $CENSUS_API_KEY)')
+    args = parser.parse_args()
+    tract_counts = ingest_acs_tables(Census(args.api_key), args.census_year, args.tables, args.states, args.store_dir)
+    for table, n_tracts in tract_counts.items():
+        print(f'{table}: {n_tracts:,} tracts')
+
+
+if __name__ == '__main__':
+    main()
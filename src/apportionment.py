@@ -0,0 +1,134 @@
+"""
+Sparse tract-to-catchment apportionment, used to aggregate any number of ACS
+variables to catchment level with a single matrix multiply.
+"""
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+
+class ApportionmentMatrix:
+    """
+    Tract weights for one or more catchments.
+
+    Rows are catchments and columns are tracts. `count_weights` holds each tract's
+    coverage share (used to apportion counts, e.g. 'Total:' variables), and
+    `population_weights` holds each tract's share of the catchment's apportioned
+    population (used for population-weighted averages, e.g. medians).
+    """
+    def __init__(self, geoids, count_weights, population_weights, population, catchments=None):
+        self.geoids = pd.Index(geoids, name='GEOID')
+        self.count_weights = count_weights
+        self.population_weights = population_weights
+        self.population = population
+        self.catchments = pd.RangeIndex(count_weights.shape[0]) if catchments is None else pd.Index(catchments)
+
+    @classmethod
+    def from_overlapping_tracts(cls, overlapping_tracts, tract_population, catchments=None):
+        """
+        Builds the matrix from the overlapping tracts of one or more catchments.
+
+        Parameters
+        ----------
+        overlapping_tracts : geopandas.GeoDataFrame or list of geopandas.GeoDataFrame
+            The overlapping tracts of each catchment, with 'GEOID' and 'coverage_percentage' columns.
+        tract_population : pandas.Series
+            Unscaled total population ('B01003_001E') of each tract, indexed by GEOID.
+        catchments : list, optional
+            Labels for the catchments (rows). Defaults to 0..K-1.
+
+        Returns
+        -------
+        ApportionmentMatrix
+            The apportionment matrix.
+        """
+        if not isinstance(overlapping_tracts, (list, tuple)):
+            overlapping_tracts = [overlapping_tracts]
+        geoids = pd.Index(pd.unique(np.concatenate([tracts['GEOID'].to_numpy() for tracts in overlapping_tracts])))
+        rows = np.concatenate([np.full(len(tracts), k) for k, tracts in enumerate(overlapping_tracts)])
+        cols = geoids.get_indexer(np.concatenate([tracts['GEOID'].to_numpy() for tracts in overlapping_tracts]))
+        coverage = np.concatenate([tracts['coverage_percentage'].to_numpy(dtype=float) for tracts in overlapping_tracts])
+        shape = (len(overlapping_tracts), len(geoids))
+        count_weights = sparse.csr_matrix((coverage, (rows, cols)), shape=shape)
+
+        # Population weights: apportioned tract population over the catchment's apportioned population
+        tract_population = tract_population.reindex(geoids).fillna(0).to_numpy(dtype=float)
+        apportioned = count_weights.multiply(tract_population[np.newaxis, :]).tocsr()
+        population = np.asarray(apportioned.sum(axis=1)).ravel()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scale = np.where(population > 0, 1 / population, 0)
+        population_weights = sparse.diags(scale) @ apportioned
+        return cls(geoids, count_weights, population_weights.tocsr(), population, catchments)
+
+    def _value_matrix(self, tract_values, variables):
+        # ACS uses large negative sentinels for unavailable estimates; like missing values they contribute nothing
+        values = tract_values.reindex(index=self.geoids, columns=variables).to_numpy(dtype=float)
+        return np.where(values > 0, values, 0)
+
+    def totals(self, tract_values, variables):
+        """
+        Apportioned catchment totals (sum of tract value x coverage) for each variable.
+
+        Parameters
+        ----------
+        tract_values : pandas.DataFrame
+            Unscaled tract values indexed by GEOID, one column per variable.
+        variables : list of str
+            The variables to aggregate.
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per catchment and one column per variable.
+        """
+        return pd.DataFrame(self.count_weights @ self._value_matrix(tract_values, variables),
+                            index=self.catchments, columns=variables)
+
+    def averages(self, tract_values, variables):
+        """
+        Population-weighted catchment averages for each variable.
+
+        Parameters
+        ----------
+        tract_values : pandas.DataFrame
+            Unscaled tract values indexed by GEOID, one column per variable.
+        variables : list of str
+            The variables to aggregate.
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per catchment and one column per variable.
+        """
+        return pd.DataFrame(self.population_weights @ self._value_matrix(tract_values, variables),
+                            index=self.catchments, columns=variables)
+
+    def summarize(self, tract_values, variable_dict, catchment=0):
+        """
+        Summarizes variables for one catchment: apportioned totals, totals normalized by the
+        catchment population, and population-weighted averages.
+
+        Parameters
+        ----------
+        tract_values : pandas.DataFrame
+            Unscaled tract values indexed by GEOID, one column per variable.
+        variable_dict : dictionary
+            A dictionary containing the variable codes and associated variable types.
+        catchment : object
+            The label of the catchment (row) to summarize.
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per variable with 'variable_type', 'total', 'normalized' and 'average' columns.
+        """
+        variables = list(variable_dict)
+        row = self.catchments.get_loc(catchment)
+        totals = self.totals(tract_values, variables).iloc[row].to_numpy()
+        population = self.population[row]
+        summary = pd.DataFrame({'variable_type': [variable_dict[var] for var in variables],
+                                'total': totals,
+                                'normalized': totals / population if population > 0 else np.nan,
+                                'average': self.averages(tract_values, variables).iloc[row].to_numpy()},
+                               index=pd.Index(variables, name='variable'))
+        return summary
@@ -0,0 +1,346 @@
+"""
+Headless batch runner: scores a table of sites (addresses or coordinates) with
+CatchmentArea on a process pool, checkpointing progress so interrupted runs resume.
+
+Input columns (CSV or Parquet):
+    site_id                       optional, defaults to the row number
+    address                       or latitude + longitude
+    radius_type                   optional, 'Distance (miles)' (default) or 'Travel time (minutes)'
+    radius                        optional, defaults to --radius
+    travel_profile                optional, e.g. 'Driving (car)' for travel-time catchments
+
+Example:
+    CENSUS_API_KEY=... python -m src.batch sites.csv results.parquet --census-year 2021 \\
+        --radius 5 --variables B19013_001E=other_metric B01001_002E=population_count --poi-tags amenity=cafe,restaurant
+"""
+import argparse
+import glob
+import json
+import logging
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import pandas as pd
+from census import Census
+from geopy.location import Location
+from openrouteservice import client
+
+from src.acs_store import ACSStore, has_acs_store
+from src.catchment_area import CatchmentArea
+from src.geocoding import get_geocoder, normalize_address
+from src.isochrone_cache import get_isochrone_cache
+from src.poi_store import POIStore, has_poi_store
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_RADIUS_TYPE = 'Distance (miles)'
+CHECKPOINT_EVERY = 100
+
+
+def default_services(config):
+    """
+    Builds the external service clients used to score sites.
+
+    Parameters
+    ----------
+    config : dict
+        Service settings: 'census_api_key', 'census_year', 'ors_api_key' and 'nominatim_client'.
+
+    Returns
+    -------
+    dict
+        'geocoder' (a `src.geocoding.Geocoder`, or any object with `geocode(address)` returning a geopy Location),
+        'census_api', 'ors_client', 'acs_store' (None when the local ACS store is absent),
+        'isochrone_cache' (the snapped isochrone cache shared with the app) and 'poi_store'
+        (None when the local POI store is absent).
+    """
+    return {'geocoder': get_geocoder(config.get('nominatim_client') or 'catchment-area-batch'),
+            'census_api': Census(config.get('census_api_key')),
+            'ors_client': client.Client(key=config['ors_api_key']) if config.get('ors_api_key') else None,
+            'acs_store': ACSStore(config['census_year']) if has_acs_store(config['census_year']) else None,
+            'isochrone_cache': get_isochrone_cache(),
+            'poi_store': POIStore() if has_poi_store() else None}
+
+
+# Services of the current worker process, built once by the pool initializer
+_services = None
+
+
+def _init_worker(service_factory, service_config):
+    global _services
+    _services = service_factory(service_config)
+
+
+def score_site(site, census_year, variable_dict=None, poi_tags=None, services=None):
+    """
+    Generates a site's catchment and computes its area, population, ACS variables and POI counts.
+
+    Parameters
+    ----------
+    site : dict
+        One input row (see module docstring for the columns).
+    census_year : str
+        The ACS year.
+    variable_dict : dictionary, optional
+        ACS variable codes and associated variable types to summarize.
+    poi_tags : dictionary, optional
+        The OSM group and categories to count (e.g., {'amenity':['cafe', 'restaurant']}).
+    services : dict, optional
+        Service clients (see `default_services`). Defaults to the worker's services.
+
+    Returns
+    -------
+    dict
+        One result row. Failures are reported in the 'error' column.
+    """
+    services = services or _services
+    start = time.perf_counter()
+    result = {'site_id': site['site_id'], 'address': site.get('address'),
+              'radius_type': site.get('radius_type') or DEFAULT_RADIUS_TYPE, 'radius': site['radius'],
+              'travel_profile': site.get('travel_profile'), 'error': None}
+    try:
+        if pd.notna(site.get('latitude')) and pd.notna(site.get('longitude')):
+            location = Location(site.get('address') or '', (site['latitude'], site['longitude']), {})
+        else:
+            location = services['geocoder'].geocode(site['address'])
+            if location is None:
+                raise ValueError(f"Could not geocode address: {site['address']}")
+        result['latitude'], result['longitude'] = location.latitude, location.longitude
+
+        catchment = CatchmentArea(site.get('address'), location, result['radius_type'], site['radius'],
+                                  result['travel_profile'], services['ors_client'], services['acs_store'],
+                                  isochrone_cache=services.get('isochrone_cache'), poi_store=services.get('poi_store'))
+        catchment.generate_geometry()
+        result['area_sq_miles'] = catchment.calculate_area_sq_miles()
+        result['total_population'] = catchment.calculate_total_population(services['census_api'], census_year)
+
+        if variable_dict:
+            summary = catchment.summarize_census_variables(services['census_api'], variable_dict, census_year)
+            for var, row in summary.iterrows():
+                # Counts are reported as catchment totals, other metrics as population-weighted averages
+                result[var] = row['total'] if row['variable_type'] == 'population_count' else row['average']
+
+        if poi_tags:
+            key = list(poi_tags.keys())[0]
+            poi_data = catchment.poi_enrichment(poi_tags, fetch_superset=False)
+            counts = poi_data[key].value_counts() if not poi_data.empty else pd.Series(dtype=int)
+            for category in poi_tags[key]:
+                result[f'poi_{key}_{category}'] = int(counts.get(category, 0))
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+    result['elapsed_seconds'] = time.perf_counter() - start
+    return result
+
+
+def read_sites(input_path, radius=None, radius_type=None, travel_profile=None):
+    """
+    Reads the input site table and fills in default catchment settings.
+    """
+    sites = pd.read_parquet(input_path) if input_path.endswith('.parquet') else pd.read_csv(input_path)
+    if 'site_id' not in sites.columns:
+        sites['site_id'] = range(len(sites))
+    sites['site_id'] = sites['site_id'].astype(str)
+    for column, default in [('radius', radius), ('radius_type', radius_type or DEFAULT_RADIUS_TYPE), ('travel_profile', travel_profile)]:
+        if column not in sites.columns:
+            sites[column] = default
+        elif default is not None:
+            sites[column] = sites[column].fillna(default)
+    return sites
+
+
+def geocode_sites(sites, geocoder):
+    """
+    Fills in the coordinates of sites given only by address, geocoding each distinct address once.
+
+    Geocoding runs here, in the parent process, so a single scheduler keeps the provider within
+    its rate limit; addresses that cannot be geocoded are left for `score_site` to report.
+    """
+    if 'address' not in sites.columns:
+        return sites
+    sites = sites.copy()
+    for column in ['latitude', 'longitude']:
+        if column not in sites.columns:
+            sites[column] = float('nan')
+    missing = (sites['latitude'].isna() | sites['longitude'].isna()) & sites['address'].notna()
+    if not missing.any():
+        return sites
+
+    coordinates, failed = {}, 0
+    for address, location, error in geocoder.geocode_batch(sites.loc[missing, 'address'].unique()):
+        if location is None:
+            failed += 1
+            if error is not None:
+                logger.warning('Geocoding failed for %r: %s', address, error)
+        else:
+            coordinates[normalize_address(address)] = (location.latitude, location.longitude)
+    keys = sites.loc[missing, 'address'].map(normalize_address)
+    sites.loc[missing, 'latitude'] = keys.map(lambda key: coordinates.get(key, (None, None))[0]).astype(float)
+    sites.loc[missing, 'longitude'] = keys.map(lambda key: coordinates.get(key, (None, None))[1]).astype(float)
+    logger.info('Geocoded %d distinct addresses (%d failed)', keys.nunique(), failed)
+    return sites
+
+
+def _checkpoint_dir(output_path):
+    return f'{output_path}.checkpoint'
+
+
+def load_checkpoint(output_path):
+    """
+    Loads the results already written to the checkpoint of an output path.
+    """
+    parts = sorted(glob.glob(os.path.join(_checkpoint_dir(output_path), 'part-*.parquet')))
+    if not parts:
+        return pd.DataFrame()
+    return pd.concat([pd.read_parquet(part) for part in parts], ignore_index=True)
+
+
+def _check_checkpoint_settings(output_path, settings, restart=False):
+    # A checkpoint only resumes the run it was written by: results scored with other settings are never mixed in
+    checkpoint_dir = _checkpoint_dir(output_path)
+    if restart and os.path.isdir(checkpoint_dir):
+        shutil.rmtree(checkpoint_dir)
+    settings = json.loads(json.dumps(settings))
+    settings_path = os.path.join(checkpoint_dir, 'settings.json')
+    if os.path.exists(settings_path):
+        with open(settings_path) as f:
+            saved = json.load(f)
+        if saved != settings:
+            changed = sorted(name for name in settings if saved.get(name) != settings[name])
+            raise ValueError(f"The checkpoint in {checkpoint_dir} was written with different settings ({', '.join(changed)}); "
+                             "re-run with restart=True (--restart) to discard it.")
+    else:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        with open(settings_path, 'w') as f:
+            json.dump(settings, f)
+
+
+def _write_checkpoint(output_path, results):
+    checkpoint_dir = _checkpoint_dir(output_path)
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    part = len(glob.glob(os.path.join(checkpoint_dir, 'part-*.parquet')))
+    pd.DataFrame(results).to_parquet(os.path.join(checkpoint_dir, f'part-{part:05d}.parquet'), index=False)
+
+
+def run_batch(input_path, output_path, census_year, variable_dict=None, poi_tags=None, radius=None, radius_type=None,
+              travel_profile=None, max_workers=None, checkpoint_every=CHECKPOINT_EVERY,
+              service_factory=default_services, service_config=None, restart=False):
+    """
+    Scores every site of an input table on a process pool and writes a results table.
+
+    Completed sites are checkpointed next to the output (`<output_path>.checkpoint/`) every
+    `checkpoint_every` results; re-running the same command skips sites already checkpointed.
+    A checkpoint written with other scoring settings (census year, variables, POI tags or
+    catchment defaults) is refused unless `restart` discards it.
+
+    Parameters
+    ----------
+    input_path : str
+        CSV or Parquet table of sites.
+    output_path : str
+        CSV or Parquet (by extension) path of the results table.
+    census_year : str
+        The ACS year.
+    variable_dict : dictionary, optional
+        ACS variable codes and associated variable types to summarize.
+    poi_tags : dictionary, optional
+        The OSM group and categories to count.
+    radius, radius_type, travel_profile : optional
+        Defaults for sites that do not specify them.
+    max_workers : int, optional
+        The number of worker processes (defaults to the number of CPUs).
+    checkpoint_every : int
+        The number of results per checkpoint part.
+    service_factory : callable
+        Picklable function building the service clients in each worker from `service_config`
+        (replace with local stand-ins to run without external services).
+    service_config : dict, optional
+        Settings passed to `service_factory`.
+    restart : bool
+        Whether to discard an existing checkpoint and score every site again.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The results table.
+    """
+    sites = read_sites(input_path, radius, radius_type, travel_profile)
+    _check_checkpoint_settings(output_path, {'census_year': str(census_year), 'variable_dict': variable_dict or {},
+                                             'poi_tags': poi_tags or {}, 'radius': radius,
+                                             'radius_type': radius_type or DEFAULT_RADIUS_TYPE,
+                                             'travel_profile': travel_profile}, restart)
+    done = load_checkpoint(output_path)
+    if not done.empty:
+        sites = sites[~sites['site_id'].isin(done['site_id'])]
+        logger.info('Resuming: %d sites already checkpointed, %d remaining', len(done), len(sites))
+
+    service_config = dict(service_config or {}, census_year=census_year)
+    start = time.perf_counter()
+    completed = 0
+    if not sites.empty:
+        sites = geocode_sites(sites, service_factory(service_config)['geocoder'])
+        pending = []
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(service_factory, service_config)) as executor:
+            futures = [executor.submit(score_site, site, census_year, variable_dict, poi_tags)
+                       for site in sites.to_dict('records')]
+            for future in as_completed(futures):
+                pending.append(future.result())
+                completed += 1
+                if len(pending) >= checkpoint_every:
+                    _write_checkpoint(output_path, pending)
+                    pending = []
+                    elapsed = time.perf_counter() - start
+                    logger.info('%d/%d sites scored (%.2f sites/s)', completed, len(futures), completed / elapsed)
+            if pending:
+                _write_checkpoint(output_path, pending)
+
+    elapsed = time.perf_counter() - start
+    results = load_checkpoint(output_path)
+    # An empty input leaves no checkpointed results, and no columns to count errors in
+    errors = results['error'].notna().sum() if 'error' in results.columns else 0
+    if output_path.endswith('.parquet'):
+        results.to_parquet(output_path, index=False)
+    else:
+        results.to_csv(output_path, index=False)
+    logger.info('Scored %d sites in %.1fs (%.2f sites/s), %d errors; results written to %s', completed, elapsed,
+                completed / elapsed if elapsed > 0 else float('nan'), errors, output_path)
+    return results
+
+
+def parse_poi_tags(poi_tags):
+    """
+    Parses 'key=value1,value2' into {'key': ['value1', 'value2']}.
+    """
+    key, values = poi_tags.split('=', 1)
+    return {key: values.split(',')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score a table of sites with catchment area, population, ACS variables and POI counts.')
+    parser.add_argument('input_path', help='CSV or Parquet table of sites')
+    parser.add_argument('output_path', help='CSV or Parquet path for the results')
+    parser.add_argument('--census-year', required=True, help='ACS year, e.g. 2021')
+    parser.add_argument('--radius', type=float, help='Default radius for sites without one')
+    parser.add_argument('--radius-type', default=DEFAULT_RADIUS_TYPE, choices=['Distance (miles)', 'Travel time (minutes)'])
+    parser.add_argument('--travel-profile', help="Default travel profile, e.g. 'Driving (car)'")
+    parser.add_argument('--variables', nargs='*', default=[], help='ACS variables as CODE=variable_type, e.g. B19013_001E=other_metric')
+    parser.add_argument('--poi-tags', help='OSM POI tags to count, e.g. amenity=cafe,restaurant')
+    parser.add_argument('--workers', type=int, help='Number of worker processes (default: CPU count)')
+    parser.add_argument('--checkpoint-every', type=int, default=CHECKPOINT_EVERY, help='Results per checkpoint part')
+    parser.add_argument('--restart', action='store_true', help='Discard the checkpoint of a previous run and score every site again')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s')
+    variable_dict = dict(var.split('=', 1) if '=' in var else (var, 'other_metric') for var in args.variables)
+    service_config = {'census_api_key': os.environ.get('CENSUS_API_KEY'),
+                      'ors_api_key': os.environ.get('ORS_API_KEY'),
+                      'nominatim_client': os.environ.get('NOMINATIM_CLIENT')}
+    run_batch(args.input_path, args.output_path, args.census_year, variable_dict,
+              parse_poi_tags(args.poi_tags) if args.poi_tags else None, args.radius, args.radius_type,
+              args.travel_profile, args.workers, args.checkpoint_every, service_config=service_config, restart=args.restart)
+
+
+if __name__ == '__main__':
+    main()
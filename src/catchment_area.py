@@ -1,28 +1,175 @@
+import copy
+import logging
 import geopandas as gpd
-from shapely.geometry import shape, Point
-from shapely.ops import transform
-from functools import partial
-import pyproj
-from src.utils import load_state_boundaries, find_intersecting_states, calculate_overlapping_tracts, fetch_census_data_for_tracts, fetch_poi_within_catchment
+import shapely
+from shapely.geometry import shape
+import pandas as pd
+from src.core import load_state_boundaries, find_intersecting_states, calculate_overlapping_tracts, fetch_tract_values, scale_census_data, query_pois, load_osm_tags
 from requests_cache import install_cache
+from src.overlap_cache import overlap_cache
+from src.apportionment import ApportionmentMatrix
+from src.geometry import geodesic_circle, equal_area_sq_meters, METERS_PER_MILE, SQ_METERS_PER_SQ_MILE
+
+# Travel profiles and corresponding OpenRouteService profiles
+TRAVEL_PROFILES = {
+    "Driving (car)": 'driving-car',
+    "Driving (heavy goods vehicle)": 'driving-hgv',
+    "Walking": 'foot-walking',
+    "Cycling (regular)": 'cycling-regular',
+    "Cycling (road)": 'cycling-road',
+    "Cycling (mountain)": 'cycling-mountain',
+    "Cycling (electric)": 'cycling-electric',
+    "Hiking": 'foot-hiking',
+    "Wheelchair": 'wheelchair'
+}
+# OpenRouteService limits per isochrones request
+ORS_MAX_LOCATIONS = 5
+ORS_MAX_RANGES = 10
+# Columns of the POI supersets kept per catchment, besides the OSM key itself
+POI_COLUMNS = ['name', 'addr:housenumber', 'addr:street', 'addr:city', 'addr:state', 'addr:postcode',
+               'centroid_lon', 'centroid_lat', 'distance', 'geometry']
+
+logger = logging.getLogger(__name__)
+
+def fetch_isochrones(ors_client, locations, ranges_minutes, travel_profile, cache=None):
+    """
+    Fetches travel-time isochrones for several locations and ranges, batching as many
+    locations and ranges per OpenRouteService request as the API allows.
+
+    Parameters
+    ----------
+    ors_client : openrouteservice.Client
+        The OpenRouteService client, or any object with a compatible isochrones() method
+        (e.g. src.isochrone_engine.RoadGraphIsochroneEngine).
+    locations : list of tuple
+        The (longitude, latitude) of each site.
+    ranges_minutes : list of int
+        The travel times, in minutes.
+    travel_profile : str
+        The travel profile (a key of TRAVEL_PROFILES).
+    cache : src.isochrone_cache.IsochroneCache, optional
+        A snapped-origin isochrone cache; only (site, range) pairs it misses are requested.
+
+    Returns
+    -------
+    dict
+        Maps (site index, range in minutes) to a (shapely geometry, isochrone properties) tuple.
+    """
+    # Enable caching for API requests; the cache lasts for one day (86400 seconds)
+    install_cache('openrouteservice_api_cache', backend='sqlite', expire_after=86400)
+
+    ranges_minutes = sorted(set(ranges_minutes))
+    source = type(ors_client).__name__
+    isochrones = {}
+    if cache is not None:
+        for site_index, (lon, lat) in enumerate(locations):
+            for range_minutes in ranges_minutes:
+                cached = cache.get(source, lon, lat, travel_profile, range_minutes)
+                if cached is not None:
+                    isochrones[(site_index, range_minutes)] = cached
+
+    # Request only the sites with missing ranges, and only the ranges missing for at least one of them
+    missing_sites = [i for i in range(len(locations)) if any((i, r) not in isochrones for r in ranges_minutes)]
+    missing_ranges = [r for r in ranges_minutes if any((i, r) not in isochrones for i in missing_sites)]
+    for loc_start in range(0, len(missing_sites), ORS_MAX_LOCATIONS):
+        site_chunk = missing_sites[loc_start:loc_start + ORS_MAX_LOCATIONS]
+        for range_start in range(0, len(missing_ranges), ORS_MAX_RANGES):
+            range_chunk = missing_ranges[range_start:range_start + ORS_MAX_RANGES]
+            params = {
+                'locations': [list(locations[i]) for i in site_chunk],
+                'range': [range_minutes * 60 for range_minutes in range_chunk],  # Convert minutes to seconds
+                'range_type': 'time',
+                'profile': TRAVEL_PROFILES[travel_profile],
+                'attributes': ['area', 'total_pop']
+            }
+            response_iso = ors_client.isochrones(**params)
+
+            # Split the response into per-site, per-range geometries
+            minutes_by_seconds = {range_minutes * 60: range_minutes for range_minutes in range_chunk}
+            for feature in response_iso.get('features', []):
+                properties = feature['properties']
+                site_index = site_chunk[properties.get('group_index', 0)]
+                range_minutes = minutes_by_seconds[properties.get('value', range_chunk[0] * 60)]
+                isochrones[(site_index, range_minutes)] = (shape(feature['geometry']), properties)
+                if cache is not None:
+                    cache.put(source, *locations[site_index], travel_profile, range_minutes, *isochrones[(site_index, range_minutes)])
+    return isochrones
+
+def generate_drive_time_areas(catchment_areas):
+    """
+    Generates the geometries of several travel-time catchments with batched isochrone requests
+    (one batch per isochrone client, travel profile and isochrone cache) instead of one request
+    per catchment.
+
+    Parameters
+    ----------
+    catchment_areas : list of CatchmentArea
+        Catchments with radius type 'Travel time (minutes)'.
+
+    Returns
+    -------
+    list of CatchmentArea
+        The same catchments, with geometry and iso_properties set.
+    """
+    by_profile = {}
+    for catchment_area in catchment_areas:
+        # Catchments with different caches are batched apart, so each reads and fills its own cache
+        key = (catchment_area.isochrone_client(), catchment_area.travel_profile, catchment_area.isochrone_cache)
+        by_profile.setdefault(key, []).append(catchment_area)
+    for (isochrone_client, travel_profile, isochrone_cache), group in by_profile.items():
+        locations = [(c.location.longitude, c.location.latitude) for c in group]
+        isochrones = fetch_isochrones(isochrone_client, locations, [c.radius for c in group], travel_profile, isochrone_cache)
+        for site_index, catchment_area in enumerate(group):
+            if (site_index, catchment_area.radius) not in isochrones:
+                raise ValueError(f"No isochrone data received from the API for {catchment_area.address}.")
+            catchment_area._reset_enrichment()
+            catchment_area.geometry, catchment_area.iso_properties = isochrones[(site_index, catchment_area.radius)]
+    return catchment_areas
 
 class CatchmentArea:
-    def __init__(self, address, location, radius_type, radius, travel_profile=None, ors_client=None):
+    def __init__(self, address, location, radius_type, radius, travel_profile=None, ors_client=None, acs_store=None, isochrone_backend=None, isochrone_cache=None, poi_store=None, population_surface=None):
         self.address = address
         self.location = location
         self.radius_type = radius_type
         self.radius = radius
         self.travel_profile = travel_profile
         self.ors_client = ors_client
+        self.acs_store = acs_store
+        # Anything with an openrouteservice-compatible isochrones() method, e.g. RoadGraphIsochroneEngine
+        self.isochrone_backend = isochrone_backend
+        self.isochrone_cache = isochrone_cache
+        # Local POI store (src.poi_store.POIStore) answering POI queries instead of Overpass
+        self.poi_store = poi_store
+        # Precomputed population raster (src.population_surface.PopulationSurface) for instant distance-catchment population
+        self.population_surface = population_surface
         self.geometry = None
         self.iso_properties = None
         self.census_data = None
         self.census_tracts = None
         self.poi_data = None
+        self.profile_data = None
+        self.profile_summary = None
         self.area = None
         self.total_pop = None
+        # Largest difference of a population surface estimate from the tract overlay (0 when computed exactly)
+        self.population_error_bound = 0
+        self._overlapping_tracts = {}
+        self._tract_values = {}
+        self._apportionment = {}
+        self._poi_supersets = {}
+        # Results of a catchment nested with this one, reused after a radius change (see with_radius)
+        self._nested = None
+
+    def _reset_enrichment(self):
+        # Tract data, weights and POIs belong to the previous geometry
+        self._overlapping_tracts = {}
+        self._tract_values = {}
+        self._apportionment = {}
+        self._poi_supersets = {}
+        self._nested = None
 
     def generate_geometry(self):
+        self._reset_enrichment()
         if self.radius_type == 'Distance (miles)':
             return self.draw_circle()
         elif self.radius_type == 'Travel time (minutes)':
@@ -33,104 +180,227 @@ class CatchmentArea:
     def draw_circle(self):
         if not self.location:
             raise ValueError("Invalid location.")
-        radius_meters = self.radius * 1609.34  # Convert miles to meters
-        point = Point(self.location.longitude, self.location.latitude)
-        # Transform to approximate on a spherical surface
-        az_ea_proj = partial(
-            pyproj.transform,
-            pyproj.Proj(f'+proj=aeqd +lat_0={self.location.latitude} +lon_0={self.location.longitude} +x_0=0 +y_0=0'),
-            pyproj.Proj('+proj=longlat +datum=WGS84')
-        )
-        circle_poly = transform(az_ea_proj, point.buffer(radius_meters))
+        radius_meters = self.radius * METERS_PER_MILE  # Convert miles to meters
+        # Circle laid out in an azimuthal equidistant projection centred on the location
+        circle_poly = geodesic_circle(self.location.longitude, self.location.latitude, radius_meters)
         self.geometry = circle_poly
         return self.geometry
 
+    def with_radius(self, radius):
+        """
+        Returns the catchment of the same site and type with another radius. When the two catchments
+        are nested (e.g. 10 and 12 miles), the new one reuses the tract overlaps, tract values and POIs
+        of this one, and only computes what changes: the containment of tracts outside the smaller
+        catchment, the Census values of newly touched tracts and the POIs of the difference region.
+        Results are the same as for a catchment generated from scratch.
+        """
+        resized = copy.copy(self)
+        resized.radius = radius
+        resized.census_data = resized.census_tracts = resized.poi_data = None
+        resized.profile_data = resized.profile_summary = None
+        resized.area = resized.total_pop = None
+        resized.generate_geometry()
+        if shapely.contains(resized.geometry, self.geometry):
+            grown = True
+        elif shapely.contains(self.geometry, resized.geometry):
+            grown = False
+        else:
+            return resized
+        resized._nested = {'geometry': self.geometry, 'grown': grown, 'overlapping_tracts': dict(self._overlapping_tracts),
+                           'tract_values': dict(self._tract_values), 'poi_supersets': dict(self._poi_supersets)}
+        return resized
+
+    def isochrone_client(self):
+        # The offline isochrone backend, when configured, takes precedence over OpenRouteService
+        return self.isochrone_backend or self.ors_client
+
     def draw_drive_time_area(self):
-        # Ensure the location and OpenRouteService client are configured
-        if not self.location or not self.ors_client:
+        # Ensure the location and an isochrone client are configured
+        if not self.location or not self.isochrone_client():
             raise ValueError("Invalid location or OpenRouteService client not configured.")
-
-        # Enable caching for API requests; the cache lasts for one day (86400 seconds)
-        install_cache('openrouteservice_api_cache', backend='sqlite', expire_after=86400)
-
-        # Define travel profiles and corresponding API parameters
-        travel_profile_dict = {
-            "Driving (car)": 'driving-car',
-            "Driving (heavy goods vehicle)": 'driving-hgv',
-            "Walking": 'foot-walking',
-            "Cycling (regular)": 'cycling-regular',
-            "Cycling (road)": 'cycling-road',
-            "Cycling (mountain)": 'cycling-mountain',
-            "Cycling (electric)": 'cycling-electric',
-            "Hiking": 'foot-hiking',
-            "Wheelchair": 'wheelchair'
-        }
-        coordinates = [[self.location.longitude, self.location.latitude]]
-        params = {
-            'locations': coordinates,
-            'range': [self.radius * 60],  # Convert minutes to seconds
-            'range_type': 'time',
-            'profile': travel_profile_dict[self.travel_profile],
-            'attributes': ['area', 'total_pop']
-        }
-
-        # Make the API call with caching
-        response_iso = self.ors_client.isochrones(**params)
-        
-        # Parse the response and create geometry
-        if 'features' in response_iso and len(response_iso['features']) > 0:
-            self.geometry = shape(response_iso['features'][0]['geometry'])
-            self.iso_properties = response_iso['features'][0]['properties']
-            return self.geometry
-        else:
+        isochrones = fetch_isochrones(self.isochrone_client(), [(self.location.longitude, self.location.latitude)], [self.radius], self.travel_profile, self.isochrone_cache)
+        if (0, self.radius) not in isochrones:
             raise ValueError("No isochrone data received from the API.")
-    
+        self.geometry, self.iso_properties = isochrones[(0, self.radius)]
+        return self.geometry
+
+    def draw_drive_time_rings(self, ranges_minutes):
+        # Nested travel-time rings (e.g. 5/10/15/30 minutes) around the location, in as few requests as possible
+        if not self.location or not self.isochrone_client():
+            raise ValueError("Invalid location or OpenRouteService client not configured.")
+        isochrones = fetch_isochrones(self.isochrone_client(), [(self.location.longitude, self.location.latitude)], ranges_minutes, self.travel_profile, self.isochrone_cache)
+        return {range_minutes: geometry for (_, range_minutes), (geometry, _) in isochrones.items()}
+
+    def get_overlapping_tracts(self, acs_year):
+        if not self.geometry:
+            raise ValueError("Catchment area not defined.")
+        def compute_overlap():
+            states_gdf = load_state_boundaries(acs_year)
+            catchment_gdf = gpd.GeoDataFrame(index=[0], crs='EPSG:4326', geometry=[self.geometry])
+            intersecting_states = find_intersecting_states(catchment_gdf, states_gdf)
+            return calculate_overlapping_tracts(catchment_gdf, intersecting_states, acs_year, self._contained_geoids(acs_year))
+        if acs_year not in self._overlapping_tracts:
+            # Shared across catchments, reruns and sessions; keyed by geometry WKB and year
+            self._overlapping_tracts[acs_year] = overlap_cache.get_or_compute(self.geometry, acs_year, compute_overlap)
+        return self._overlapping_tracts[acs_year]
+
+    def _contained_geoids(self, acs_year):
+        # Tracts inside a smaller nested catchment are inside this one too, so only the others need a containment test
+        nested = self._nested
+        if nested is None or not nested['grown'] or acs_year not in nested['overlapping_tracts']:
+            return None
+        nested_tracts = nested['overlapping_tracts'][acs_year]
+        return set(nested_tracts.loc[nested_tracts['coverage_percentage'] == 1, 'GEOID'])
+
+    def get_tract_values(self, census_api, acs_year, variables, group_counties=False):
+        # Unscaled tract values, indexed by GEOID; only variables and tracts not fetched before are requested
+        overlapping_tracts = self.get_overlapping_tracts(acs_year)
+        variables = list(dict.fromkeys(variables))
+        if acs_year not in self._tract_values and self._nested is not None and acs_year in self._nested['tract_values']:
+            # Values of the nested catchment's tracts that are also in this one
+            nested_values = self._nested['tract_values'][acs_year]
+            self._tract_values[acs_year] = nested_values[nested_values.index.isin(overlapping_tracts['GEOID'])]
+        tract_values = self._tract_values.get(acs_year, pd.DataFrame(index=pd.Index([], name='GEOID')))
+        new_tracts = overlapping_tracts[~overlapping_tracts['GEOID'].isin(tract_values.index)]
+        missing_vars = [var for var in variables if var not in tract_values.columns]
+        if missing_vars and not tract_values.index.empty:
+            fetched_tracts = overlapping_tracts[overlapping_tracts['GEOID'].isin(tract_values.index)]
+            tract_values = tract_values.join(self._fetch_tract_values(census_api, acs_year, missing_vars, fetched_tracts, group_counties))
+        if not new_tracts.empty:
+            # Newly touched tracts get every variable fetched so far
+            all_vars = list(dict.fromkeys(list(tract_values.columns) + variables))
+            tract_values = pd.concat([tract_values, self._fetch_tract_values(census_api, acs_year, all_vars, new_tracts, group_counties)])
+        if missing_vars or not new_tracts.empty:
+            self._tract_values[acs_year] = tract_values
+        return tract_values.reindex(overlapping_tracts['GEOID'])[variables]
+
+    def _fetch_tract_values(self, census_api, acs_year, variables, tracts, group_counties):
+        fetched = fetch_tract_values(census_api, acs_year, variables, tracts, backend=self.acs_store, group_counties=group_counties)
+        fetched = fetched.drop_duplicates('GEOID').set_index('GEOID') if not fetched.empty else pd.DataFrame(index=pd.Index([], name='GEOID'))
+        # Variables or tracts the Census returned nothing for are kept as missing values
+        return fetched.reindex(index=pd.Index(tracts['GEOID'].unique(), name='GEOID'), columns=variables)
+
+    def get_apportionment(self, census_api, acs_year):
+        if acs_year not in self._apportionment:
+            overlapping_tracts = self.get_overlapping_tracts(acs_year)
+            tract_population = self.get_tract_values(census_api, acs_year, ['B01003_001E'])['B01003_001E']
+            self._apportionment[acs_year] = ApportionmentMatrix.from_overlapping_tracts(overlapping_tracts, tract_population)
+        return self._apportionment[acs_year]
+
+    def summarize_census_variables(self, census_api, acs_variable_dict, acs_year):
+        if not self.geometry:
+            raise ValueError("Catchment area not defined.")
+        apportionment = self.get_apportionment(census_api, acs_year)
+        tract_values = self.get_tract_values(census_api, acs_year, list(acs_variable_dict))
+        return apportionment.summarize(tract_values, acs_variable_dict)
+
     def demographic_enrichment(self, census_api, acs_variable_dict, acs_year, normalization):
         if not self.geometry:
             raise ValueError("Catchment area not defined.")
-        states_gdf = load_state_boundaries(acs_year)
-        catchment_gdf = gpd.GeoDataFrame(index=[0], crs='EPSG:4326', geometry=[self.geometry])
-        intersecting_states = find_intersecting_states(catchment_gdf, states_gdf)
-        overlapping_tracts = calculate_overlapping_tracts(catchment_gdf, intersecting_states, acs_year)
+        overlapping_tracts = self.get_overlapping_tracts(acs_year)
 
-        # Fetch census data
-        census_data = fetch_census_data_for_tracts(census_api, acs_year, acs_variable_dict, overlapping_tracts, normalization)
+        # Fetch census data (reusing tract values already fetched for this catchment) and scale to the catchment
+        tract_values = self.get_tract_values(census_api, acs_year, list(acs_variable_dict)+['B01003_001E'])
+        tract_values = tract_values.dropna(how='all')  # tracts the Census returned no data for
+        census_data = scale_census_data(tract_values.reset_index(), acs_variable_dict, overlapping_tracts, normalization)
         self.census_data = census_data
         self.census_tracts = overlapping_tracts
         return census_data, overlapping_tracts
     
-    def poi_enrichment(self, poi_tags):
+    def demographic_profile(self, census_api, acs_year, variable_dict):
+        # Many variables at once (e.g. a full ACS table or a predefined profile), fetched in the fewest Census
+        # requests; later enrichments and summaries of these variables are served from the fetched tract values
+        if not self.geometry:
+            raise ValueError("Catchment area not defined.")
+        overlapping_tracts = self.get_overlapping_tracts(acs_year)
+        tract_values = self.get_tract_values(census_api, acs_year, list(variable_dict)+['B01003_001E'], group_counties=True)
+        tract_values = tract_values.dropna(how='all')
+        # One wide frame of apportioned tract values, plus catchment totals and averages
+        self.profile_data = scale_census_data(tract_values.reset_index(), variable_dict, overlapping_tracts, 'No')
+        self.profile_summary = self.summarize_census_variables(census_api, variable_dict, acs_year)
+        return self.profile_data, self.profile_summary
+
+    def get_poi_superset(self, key, values, offered=True):
+        # POIs of every category of a group offered in the app (plus any others requested), fetched once per
+        # catchment, or of the requested categories only if not `offered`; True stands for every value of the key
+        if key not in self._poi_supersets and self._nested is not None and key in self._nested['poi_supersets']:
+            self._poi_supersets[key] = self._nested_poi_superset(key)
+        cached_values, superset = self._poi_supersets.get(key, (frozenset(), None))
+        if values is True:
+            covered = cached_values is True
+        else:
+            values = [values] if isinstance(values, str) else values
+            covered = cached_values is True or cached_values.issuperset(values)
+        if superset is None or not covered:
+            offered_values = frozenset(load_osm_tags().get(key, [])) if offered else frozenset()
+            superset_values = True if values is True else cached_values | offered_values | frozenset(values)
+            superset = query_pois(self.geometry, self.location, {key: True if superset_values is True else sorted(superset_values)},
+                                  backend=self.poi_store)
+            # Only the columns the app uses are kept
+            superset = superset[[key] + [column for column in POI_COLUMNS if column in superset.columns]] if not superset.empty else superset
+            self._poi_supersets[key] = (superset_values, superset)
+        return superset
+
+    def _nested_poi_superset(self, key):
+        # The nested catchment's POIs inside this catchment, plus those of the difference region when it grew
+        superset_values, superset = self._nested['poi_supersets'][key]
+        frames = [superset] if not superset.empty else []
+        if self._nested['grown']:
+            difference = shapely.difference(self.geometry, self._nested['geometry'])
+            added = query_pois(difference, self.location, {key: True if superset_values is True else sorted(superset_values)},
+                               backend=self.poi_store) if not difference.is_empty else gpd.GeoDataFrame()
+            if not added.empty:
+                frames.append(added[[key] + [column for column in POI_COLUMNS if column in added.columns]])
+        if not frames:
+            return superset_values, gpd.GeoDataFrame()
+        superset = pd.concat(frames) if len(frames) > 1 else frames[0]
+        # POIs crossing into both regions are returned twice, and the difference query may return some outside the catchment
+        superset = superset[~superset.index.duplicated()]
+        return superset_values, superset[shapely.intersects(self.geometry, superset.geometry.to_numpy())]
+
+    def poi_enrichment(self, poi_tags, fetch_superset=True):
+        # Later category selections of the same group are filtered from the superset without another query;
+        # one-off queries (e.g. batch scoring) can skip the superset with fetch_superset=False
         if not self.geometry:
             raise ValueError("Catchment area not defined.")
-        poi_data = fetch_poi_within_catchment(self.geometry, self.location, poi_tags)
+        key = list(poi_tags.keys())[0]
+        values = poi_tags[key]
+        try:
+            superset = self.get_poi_superset(key, values, offered=fetch_superset)
+        except Exception as e:
+            logger.error("An error occurred while fetching POIs: %s", e)
+            superset = gpd.GeoDataFrame(columns=[key, 'name'])
+        if superset.empty or values is True:
+            poi_data = superset
+        else:
+            # Category selections are served from the superset by local filtering
+            poi_data = superset[superset[key].isin([values] if isinstance(values, str) else values)]
         self.poi_data = poi_data
         return poi_data
     
     def calculate_area_sq_miles(self):
         if not self.geometry:
             raise ValueError("Catchment area not defined.")
-        proj = partial(pyproj.transform,
-                    pyproj.Proj(init='epsg:4326'),  # Source coordinate system (WGS84)
-                    pyproj.Proj(proj='aea', lat_1=self.geometry.bounds[1], lat_2=self.geometry.bounds[3]))  # Albers Equal Area projection
-        projected_polygon = transform(proj, self.geometry) 
-
-        # Project the polygon to the new coordinate system
-        area_sq_miles = round(projected_polygon.area / 2589988.11,2)  # Convert area from square meters to square miles
+        # Area in an equal-area projection, converted from square meters to square miles
+        area_sq_miles = round(equal_area_sq_meters(self.geometry) / SQ_METERS_PER_SQ_MILE,2)
         self.area = area_sq_miles
         return area_sq_miles
     
     def calculate_total_population(self, census_api, acs_year):
         if not self.geometry:
             raise ValueError("Catchment area not defined.")
-        if self.radius_type == 'Distance (miles)':
-            states_gdf = load_state_boundaries(acs_year)
-            catchment_gdf = gpd.GeoDataFrame(index=[0], crs='EPSG:4326', geometry=[self.geometry])
-            intersecting_states = find_intersecting_states(catchment_gdf, states_gdf)
-            overlapping_tracts = calculate_overlapping_tracts(catchment_gdf, intersecting_states, acs_year)
-
-            # Fetch population from census
-            total_pop_df = fetch_census_data_for_tracts(census_api, acs_year, {'B01003_001E':'population_count'}, overlapping_tracts, "No")
-            total_pop = total_pop_df['B01003_001E'].sum()
+        self.population_error_bound = 0
+        surface = self.population_surface
+        if self.radius_type == 'Distance (miles)' and surface is not None and surface.census_year == str(acs_year):
+            # Summed-area lookups on the population surface, without the tract overlay or a Census fetch
+            estimate = surface.estimate(self.geometry)
+            if estimate['covered']:
+                self.population_error_bound = estimate['error_bound']
+                self.total_population = estimate['population']
+                return estimate['population']
+        if self.radius_type == 'Distance (miles)' or self.iso_properties.get('total_pop') is None:
+            # Apportioned population (isochrone backends without population data fall back to this too), computed once per catchment and year
+            total_pop = self.get_apportionment(census_api, acs_year).population[0]
         else:
             total_pop = self.iso_properties['total_pop']
         self.total_population = total_pop
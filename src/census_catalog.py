@@ -0,0 +1,306 @@
+"""
+Compiled, searchable catalog of ACS 5-year estimate variables.
+
+The Census API's `variables.json` (~28,000 entries) is parsed once per year into a
+compact table (variable, table, group, name, type) and an inverted search index of
+word tokens and trigrams, so the app loads it in milliseconds and answers type-ahead
+searches server-side. The catalog is laid out as::
+
+    <catalog_dir>/<census_year>/variables.parquet    # one row per estimate variable, sorted by group
+    <catalog_dir>/<census_year>/search_index.npz     # terms, posting offsets and posting rows
+
+Build it once per year with the build command, e.g.:
+    python -m src.census_catalog 2021
+Without a built catalog, the app compiles one in memory from the Census API.
+"""
+import argparse
+import bisect
+import os
+import re
+from collections import defaultdict
+
+import numpy as np
+import pandas as pd
+
+from src.core import fetch_census_variables
+
+CENSUS_CATALOG_DIR = os.environ.get('CATCHMENT_CENSUS_CATALOG', 'data/census_catalog')
+
+ACS_API_URL = "https://api.census.gov/data/{0}/acs/acs5"
+CATALOG_COLUMNS = ['variable', 'group', 'Variable Group', 'Variable Name', 'variable_type', 'predicateType']
+# Trigram terms are kept apart from word terms in the index
+TRIGRAM_PREFIX = '#'
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+# Predefined multi-variable profiles: {profile: {variable: variable type}}
+DEMOGRAPHIC_PROFILES = {
+    'Retail profile': {
+        'B01003_001E': 'population_count',  # Total population
+        'B11001_001E': 'population_count',  # Households
+        'B01002_001E': 'other_metric',  # Median age
+        'B19013_001E': 'other_metric',  # Median household income
+        'B19301_001E': 'other_metric',  # Per capita income
+        'B25077_001E': 'other_metric',  # Median home value
+        'B25003_002E': 'population_count',  # Owner-occupied housing units
+        'B25003_003E': 'population_count',  # Renter-occupied housing units
+        'B15003_022E': 'population_count',  # Bachelor's degree (population 25 years and over)
+        'B23025_004E': 'population_count',  # Employed civilian labor force
+    },
+    'Housing profile': {
+        'B25001_001E': 'population_count',  # Housing units
+        'B25002_003E': 'population_count',  # Vacant housing units
+        'B25003_002E': 'population_count',  # Owner-occupied housing units
+        'B25003_003E': 'population_count',  # Renter-occupied housing units
+        'B25035_001E': 'other_metric',  # Median year structure built
+        'B25064_001E': 'other_metric',  # Median gross rent
+        'B25077_001E': 'other_metric',  # Median home value
+        'B19013_001E': 'other_metric',  # Median household income
+    },
+}
+
+
+def tokenize(text):
+    """
+    Splits text into lowercase alphanumeric tokens.
+    """
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def trigrams(token):
+    """
+    Returns the trigrams of a token (none for tokens shorter than three characters).
+    """
+    return {token[i:i + 3] for i in range(len(token) - 2)}
+
+
+def _search_texts(variables):
+    return (variables['variable'] + ' ' + variables['group'] + ' ' + variables['Variable Group'] + ' '
+            + variables['Variable Name'])
+
+
+def build_search_index(variables):
+    """
+    Builds the inverted index of a catalog: for every word token and trigram, the rows containing it.
+
+    Parameters
+    ----------
+    variables : pandas.DataFrame
+        The catalog rows.
+
+    Returns
+    -------
+    dict
+        'terms' (sorted), 'offsets' and 'rows': the rows of terms[i] are rows[offsets[i]:offsets[i + 1]].
+    """
+    postings = defaultdict(list)
+    for row, text in enumerate(_search_texts(variables)):
+        tokens = set(tokenize(text))
+        for term in tokens | {TRIGRAM_PREFIX + trigram for token in tokens for trigram in trigrams(token)}:
+            postings[term].append(row)
+    terms = sorted(postings)
+    lengths = np.array([len(postings[term]) for term in terms], dtype=np.int64)
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    rows = np.fromiter((row for term in terms for row in postings[term]), dtype=np.int32, count=offsets[-1])
+    return {'terms': np.array(terms), 'offsets': offsets, 'rows': rows}
+
+
+class CensusCatalog:
+    """
+    The estimate variables of one ACS year, with token and trigram type-ahead search.
+
+    Parameters
+    ----------
+    variables : pandas.DataFrame
+        The catalog rows (see CATALOG_COLUMNS), sorted by group and variable.
+    search_index : dict
+        The inverted index of `variables` (see build_search_index).
+    """
+    def __init__(self, variables, search_index):
+        self.variables = variables
+        self.terms = search_index['terms']
+        self.offsets = search_index['offsets']
+        self.rows = search_index['rows']
+        self._term_ids = {term: i for i, term in enumerate(self.terms.tolist())}
+        # Word terms, for prefix matching of short query tokens
+        self._words = [term for term in self.terms.tolist() if not term.startswith(TRIGRAM_PREFIX)]
+        self._texts = _search_texts(variables).str.lower().to_numpy(dtype=str)
+
+    @classmethod
+    def from_variables(cls, variables_df):
+        """
+        Compiles a catalog from parsed `variables.json` rows (see `src.core.parse_census_variables`).
+        """
+        variables = variables_df.reindex(columns=CATALOG_COLUMNS).fillna({'group': '', 'Variable Group': '', 'predicateType': ''})
+        variables = variables.sort_values(['Variable Group', 'variable']).reset_index(drop=True)
+        return cls(variables, build_search_index(variables))
+
+    @classmethod
+    def load(cls, census_year, catalog_dir=CENSUS_CATALOG_DIR):
+        """
+        Loads a compiled catalog from disk.
+        """
+        year_dir = os.path.join(catalog_dir, str(census_year))
+        variables = pd.read_parquet(os.path.join(year_dir, 'variables.parquet'))
+        with np.load(os.path.join(year_dir, 'search_index.npz')) as search_index:
+            return cls(variables, dict(search_index))
+
+    def save(self, census_year, catalog_dir=CENSUS_CATALOG_DIR):
+        year_dir = os.path.join(catalog_dir, str(census_year))
+        os.makedirs(year_dir, exist_ok=True)
+        self.variables.to_parquet(os.path.join(year_dir, 'variables.parquet'), index=False)
+        np.savez(os.path.join(year_dir, 'search_index.npz'), terms=self.terms, offsets=self.offsets, rows=self.rows)
+
+    def _postings(self, term):
+        i = self._term_ids.get(term)
+        if i is None:
+            return np.empty(0, dtype=np.int32)
+        return self.rows[self.offsets[i]:self.offsets[i + 1]]
+
+    def _match(self, token):
+        # Rows with a word starting with (short tokens) or containing (longer tokens) the query token
+        if len(token) < 3:
+            start = bisect.bisect_left(self._words, token)
+            end = bisect.bisect_left(self._words, token + '\uffff')
+            return np.unique(np.concatenate([self._postings(word) for word in self._words[start:end]] or [np.empty(0, dtype=np.int32)]))
+        candidates = None
+        for trigram in trigrams(token):
+            postings = self._postings(TRIGRAM_PREFIX + trigram)
+            candidates = postings if candidates is None else np.intersect1d(candidates, postings, assume_unique=True)
+            if not len(candidates):
+                return candidates
+        # Trigrams can come from different words, so candidates are checked for the whole token
+        return candidates[np.char.find(self._texts[candidates], token) >= 0]
+
+    def search(self, query, limit=None):
+        """
+        Finds the variables matching every token of a query, best matches first.
+
+        Parameters
+        ----------
+        query : str
+            The search text, matched against variable codes, tables, groups and names
+            (e.g. 'median household income' or 'B19013').
+        limit : int, optional
+            The maximum number of variables returned.
+
+        Returns
+        -------
+        pandas.DataFrame
+            The matching catalog rows.
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return self.variables.iloc[:limit]
+        rows = None
+        for token in tokens:
+            matches = self._match(token)
+            rows = matches if rows is None else np.intersect1d(rows, matches, assume_unique=True)
+        # The query as a phrase ranks first, then whole-word matches, then the catalog order
+        score = sum(np.isin(rows, self._postings(token)).astype(int) for token in tokens)
+        score = score + len(tokens) * (np.char.find(self._texts[rows], ' '.join(tokens)) >= 0)
+        rows = rows[np.lexsort((rows, -score))]
+        return self.variables.iloc[rows[:limit]]
+
+    def search_groups(self, query, limit=None):
+        """
+        Returns the variable groups of the best matching variables for a query.
+        """
+        return list(dict.fromkeys(self.search(query)['Variable Group']))[:limit]
+
+    def variable_names(self, var_group):
+        """
+        Returns the variable names of a group.
+        """
+        return self.variables.loc[self.variables['Variable Group'] == var_group, 'Variable Name'].tolist()
+
+    def table_variables(self, table):
+        """
+        Returns the {variable code: variable type} of the estimates of an ACS table (e.g. 'B19001').
+        """
+        rows = self.variables[(self.variables['group'] == table) & self.variables['variable'].str.endswith('E')]
+        return dict(zip(rows['variable'], rows['variable_type']))
+
+    def variable_types(self, var_group, var_name):
+        """
+        Returns the {variable code: variable type} of a group's variable name.
+        """
+        rows = self.variables[(self.variables['Variable Group'] == var_group) & (self.variables['Variable Name'] == var_name)]
+        return dict(zip(rows['variable'], rows['variable_type']))
+
+
+def profile_variables(profile, catalog):
+    """
+    Resolves a demographic profile to its variables.
+
+    Parameters
+    ----------
+    profile : str
+        A predefined profile (a key of DEMOGRAPHIC_PROFILES) or an ACS table ID (e.g. 'B19001').
+    catalog : CensusCatalog
+        The catalog listing the variables of ACS tables.
+
+    Returns
+    -------
+    dict
+        The profile's {variable code: variable type}.
+    """
+    if profile in DEMOGRAPHIC_PROFILES:
+        return dict(DEMOGRAPHIC_PROFILES[profile])
+    variable_dict = catalog.table_variables(profile.strip().upper())
+    if not variable_dict:
+        raise ValueError(f"Unknown demographic profile or ACS table: {profile}")
+    return variable_dict
+
+
+def has_census_catalog(census_year, catalog_dir=CENSUS_CATALOG_DIR):
+    """
+    Returns True if a compiled catalog exists for the given year.
+    """
+    return os.path.exists(os.path.join(catalog_dir, str(census_year), 'search_index.npz'))
+
+
+def build_census_catalog(census_year, catalog_dir=CENSUS_CATALOG_DIR):
+    """
+    Downloads the ACS variables of a year and writes the compiled catalog.
+
+    Returns
+    -------
+    CensusCatalog or None
+        The catalog, or None if the variables could not be fetched.
+    """
+    variables_df = fetch_census_variables(ACS_API_URL.format(census_year))
+    if variables_df is None:
+        return None
+    catalog = CensusCatalog.from_variables(variables_df)
+    catalog.save(census_year, catalog_dir)
+    return catalog
+
+
+def load_census_catalog(census_year, catalog_dir=CENSUS_CATALOG_DIR):
+    """
+    Loads the compiled catalog of a year, or compiles one in memory from the Census API.
+
+    Returns
+    -------
+    CensusCatalog or None
+        The catalog, or None if it is not built and the variables could not be fetched.
+    """
+    if has_census_catalog(census_year, catalog_dir):
+        return CensusCatalog.load(census_year, catalog_dir)
+    variables_df = fetch_census_variables(ACS_API_URL.format(census_year))
+    return CensusCatalog.from_variables(variables_df) if variables_df is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile the searchable ACS variable catalog of a year.')
+    parser.add_argument('census_year', help='ACS year, e.g. 2021')
+    parser.add_argument('--catalog-dir', default=CENSUS_CATALOG_DIR, help='Root directory of the compiled catalogs')
+    args = parser.parse_args()
+    catalog = build_census_catalog(args.census_year, args.catalog_dir)
+    if catalog is None:
+        raise SystemExit('Could not fetch the ACS variables from the Census API')
+    print(f"Compiled {len(catalog.variables):,} variables and {len(catalog.terms):,} search terms into {args.catalog_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Compact choropleth payloads: tract geometries simplified to the map's resolution (keeping
+shared tract edges aligned), coordinates rounded to what is visible, and decile colors
+precomputed in one vectorized pass and embedded as a feature property.
+"""
+import math
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+DECILE_COLORS = np.array(['#ffffcc', '#ffeda0', '#fed976', '#feb24c', '#fd8d3c',
+                          '#fc4e2a', '#e31a1c', '#bd0026', '#800026', '#66001a'])
+MISSING_COLOR = '#999999'
+# Width of the embedded maps (see folium_static), and the simplification tolerance in screen pixels
+MAP_WIDTH_PX = 700
+SIMPLIFY_PIXELS = 0.5
+
+
+def simplify_tolerance(bounds, width_px=MAP_WIDTH_PX, pixels=SIMPLIFY_PIXELS):
+    """
+    Returns the simplification tolerance (in degrees) matching the zoom at which `bounds` fills the map.
+
+    Parameters
+    ----------
+    bounds : tuple of float
+        (minx, miny, maxx, maxy) of the area shown, in degrees.
+    width_px : int
+        The map width in pixels.
+    pixels : float
+        The tolerance in screen pixels.
+
+    Returns
+    -------
+    float
+        The tolerance in degrees.
+    """
+    minx, miny, maxx, maxy = bounds
+    return max(maxx - minx, maxy - miny, 1e-6) / width_px * pixels
+
+
+def coordinate_digits(tolerance):
+    """
+    Returns the number of decimals that keeps coordinate rounding well below the tolerance.
+    """
+    return min(max(math.ceil(-math.log10(tolerance / 4)), 0), 7)
+
+
+def simplify_coverage(geometries, tolerance):
+    """
+    Simplifies a polygon coverage (e.g. census tracts) so neighbouring polygons keep sharing
+    their edges, falling back to per-polygon topology-preserving simplification for inputs
+    that are not a valid coverage (or GEOS versions without coverage simplification).
+    """
+    geometries = np.asarray(geometries)
+    try:
+        return shapely.coverage_simplify(geometries, tolerance)
+    except (AttributeError, shapely.errors.GEOSException, shapely.errors.UnsupportedGEOSVersionError):
+        return shapely.simplify(geometries, tolerance, preserve_topology=True)
+
+
+def quantize(geometries, digits):
+    """
+    Snaps coordinates to a 10**-digits grid (keeping polygons valid) and rounds them for short JSON output.
+    """
+    geometries = shapely.set_precision(geometries, 10.0 ** -digits)
+    return shapely.transform(geometries, lambda coords: np.round(coords, digits))
+
+
+def decile_colors(values, deciles):
+    """
+    Maps values to decile colors in one pass: the color of the first decile threshold a value
+    does not exceed, the last color above the 9th decile, and grey for missing values.
+
+    Parameters
+    ----------
+    values : array-like of float
+        The values to color.
+    deciles : list of float
+        The 10th-90th percentile thresholds.
+
+    Returns
+    -------
+    numpy.ndarray
+        The color of each value.
+    """
+    values = np.asarray(values, dtype=float)
+    colors = DECILE_COLORS[np.searchsorted(np.asarray(deciles, dtype=float), values, side='left')]
+    return np.where(np.isnan(values), MISSING_COLOR, colors)
+
+
+def choropleth_geojson(gdf, plot_var, deciles, properties, bounds=None):
+    """
+    Builds the GeoJSON of a choropleth layer: simplified, quantized geometries with only
+    the given properties plus a precomputed 'fill_color'.
+
+    Parameters
+    ----------
+    gdf : geopandas.GeoDataFrame
+        The features (in degrees).
+    plot_var : str
+        The column to color by.
+    deciles : list of float
+        The decile thresholds of `plot_var`.
+    properties : list of str
+        The columns to keep as feature properties (e.g. tooltip fields).
+    bounds : tuple of float, optional
+        (minx, miny, maxx, maxy) of the map extent; defaults to the features' bounds.
+
+    Returns
+    -------
+    str
+        The GeoJSON FeatureCollection.
+    """
+    tolerance = simplify_tolerance(gdf.total_bounds if bounds is None else bounds)
+    geometries = quantize(simplify_coverage(gdf.geometry.to_numpy(), tolerance), coordinate_digits(tolerance))
+    layer = gpd.GeoDataFrame(gdf[properties].assign(fill_color=decile_colors(gdf[plot_var], deciles)),
+                             geometry=geometries, crs=gdf.crs)
+    return layer.to_json(drop_id=True)
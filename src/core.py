@@ -0,0 +1,628 @@
+"""
+Compute core of the app: tract loading and overlay, Census data fetching and scaling,
+and POI queries. Has no Streamlit or plotting dependency, so batch workers and other
+headless callers import it without the UI stack; slow imports (osmnx) are deferred
+to the functions that need them.
+"""
+import logging
+import os
+import pickle
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import requests
+import shapely
+from census import Census
+from requests_cache import install_cache
+
+from src import tract_store
+from src.geometry import centroid_coordinates, equal_area_sq_meters, geodesic_distances, METERS_PER_MILE
+
+logger = logging.getLogger(__name__)
+
+# Concurrency and retry settings for county-level Census API requests
+CENSUS_MAX_WORKERS = 8
+CENSUS_MAX_RETRIES = 3
+CENSUS_RETRY_BACKOFF = 1.0
+# Variables per Census API request: the API's 50 fields, less the GEO_ID the census client adds to split wider requests
+CENSUS_MAX_VARIABLES = 49
+OSM_TAGS_PATH = os.path.join(os.path.dirname(__file__), 'osm_tags.pkl')
+
+@lru_cache(maxsize=None)
+def load_osm_tags(path=OSM_TAGS_PATH):
+    """
+    Loads the OSM POI groups and categories offered in the app; read once per process.
+
+    Parameters
+    ----------
+    path : str
+        The pickled {group: [categories]} dictionary.
+
+    Returns
+    -------
+    dict
+        The OSM tags.
+    """
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+@lru_cache(maxsize=None)
+def fetch_census_variables(api_url):
+    """
+    Fetches census variables from the U.S. Census API with caching.
+    
+    Parameters
+    ----------
+    api_url : str
+        The base URL for the Census API endpoint.
+    
+    Returns
+    -------
+    pandas.DataFrame or None
+        A DataFrame containing the census variables and metadata, or None if the fetch fails.
+    """
+    # Install a cache named 'census_var_api_cache', stored as a SQLite DB, which lasts for one day (86400 seconds)
+    install_cache('census_var_api_cache', backend='sqlite', expire_after=86400)
+
+    variables_url = f"{api_url}/variables.json"
+    try:
+        response = requests.get(variables_url)
+        response.raise_for_status()  # Raise an exception for HTTP errors
+        return parse_census_variables(response.json())
+    except requests.RequestException as e:
+        logger.error("Failed to fetch variables.json: %s", e)
+        return None
+
+def parse_census_variables(variables_dict):
+    """
+    Parses the estimate variables of a Census API `variables.json` document.
+
+    Parameters
+    ----------
+    variables_dict : dict
+        The parsed `variables.json` ({'variables': {variable: metadata}}).
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per estimate variable, with 'variable', 'Variable Group', 'Variable Name' and
+        'variable_type' columns besides the API's metadata (e.g. 'group', 'predicateType').
+    """
+    # One frame for the whole catalog rather than one per variable
+    variables_df = pd.DataFrame.from_dict(variables_dict['variables'], orient='index')
+    variables_df = variables_df[variables_df['label'].str.contains('Estimate', na=False)].rename_axis('variable').reset_index()
+    variables_df.rename(columns={'concept':'Variable Group','label':'Variable Name'}, inplace=True)
+    variables_df['Variable Name'] = variables_df['Variable Name'].str.replace('Estimate!!', '', regex=False).str.replace('!!', ' ', regex=False)
+    # Dollar amounts are labelled with the survey year's dollars, e.g. "(IN 2021 INFLATION-ADJUSTED DOLLARS)"
+    variables_df['Variable Group'] = variables_df['Variable Group'].str.replace(r" \(IN \d{4} INFLATION-ADJUSTED DOLLARS\)", "", regex=True)
+    variables_df['Variable Name'] = variables_df['Variable Name'].str.replace(r" \(in \d{4} inflation-adjusted dollars\)", "", regex=True)
+
+    # Determine variable type based on the 'Variable Name'
+    variables_df['variable_type'] = np.where(variables_df['Variable Name'].str.startswith('Total:'), 'population_count', 'other_metric')
+    return variables_df
+
+@lru_cache(maxsize=None)
+def load_state_boundaries(census_year):
+    """
+    Loads state boundaries using the US Census Bureau's cartographic boundary files for a given year,
+    from the local tract store when it has been ingested for the year.
+    
+    Parameters
+    ----------
+    census_year : str
+        The census year for which to load state boundaries.
+    
+    Returns
+    -------
+    geopandas.GeoDataFrame
+        A GeoDataFrame containing the state boundaries.
+    """
+    if tract_store.has_tract_store(census_year):
+        return tract_store.load_states(str(census_year))
+    gdf = gpd.read_file(tract_store.STATE_BOUNDARIES_URL.format(census_year))
+    return gdf
+
+def find_intersecting_states(user_gdf, states_gdf):
+    """
+    Identifies states that intersect with a user-defined geography.
+    
+    Parameters
+    ----------
+    user_gdf : geopandas.GeoDataFrame
+        The user-defined geography.
+    states_gdf : geopandas.GeoDataFrame
+        The GeoDataFrame containing state boundaries.
+    
+    Returns
+    -------
+    pandas.Series
+        The GEOID of states that intersect with the user-defined geography.
+    """
+    intersecting_states = states_gdf[states_gdf.intersects(user_gdf.unary_union)]
+    return intersecting_states['GEOID']
+
+def load_tract_shapefile(state_code, census_year, bbox=None):
+    """
+    Loads census tracts for a given state code and year. Reads from the local tract store
+    when it has been ingested for the year (only the county partitions intersecting `bbox`),
+    otherwise downloads the state's tract shapefile from the Census website.
+    
+    Parameters
+    ----------
+    state_code : str
+        The state code for which to load the census tract shapefile.
+    census_year : str
+        The year of the census.
+    bbox : tuple of float, optional
+        (minx, miny, maxx, maxy) bounding box, in EPSG:4269, of the area of interest.
+    
+    Returns
+    -------
+    geopandas.GeoDataFrame
+        A GeoDataFrame containing the census tract shapefile data.
+    """
+    if tract_store.has_tract_store(census_year):
+        return tract_store.load_tracts(str(census_year), state_code, bbox)
+    return download_tract_shapefile(state_code, census_year)
+
+@lru_cache(maxsize=None)
+def download_tract_shapefile(state_code, census_year):
+    """
+    Downloads a census tract shapefile from the Census website for a given state code and year.
+
+    Parameters
+    ----------
+    state_code : str
+        The state code for which to download the census tract shapefile.
+    census_year : str
+        The year of the census.
+
+    Returns
+    -------
+    geopandas.GeoDataFrame
+        A GeoDataFrame containing the census tract shapefile data.
+    """
+    gdf = gpd.read_file(tract_store.TRACT_SHAPEFILE_URL.format(census_year, state_code))
+    return gdf
+
+def overlay_tracts(tract_gdf, catchment_geometry, contained_geoids=None):
+    """
+    Intersects census tracts with a catchment geometry in a single vectorized pass.
+
+    Candidate tracts are found with the tract GeoDataFrame's spatial index, tracts
+    fully inside the catchment are kept as-is (coverage of exactly 1), and only the
+    tracts crossing the catchment boundary are clipped. Areas are measured in an
+    equal-area CRS.
+
+    Parameters
+    ----------
+    tract_gdf : geopandas.GeoDataFrame
+        The census tracts to intersect (e.g., one state's tract shapefile).
+    catchment_geometry : shapely.geometry.base.BaseGeometry
+        The catchment geometry, in the same CRS as `tract_gdf`.
+    contained_geoids : collection of str, optional
+        GEOIDs of tracts already known to lie inside the catchment (e.g. inside a smaller
+        catchment nested in it), which skip the containment test.
+
+    Returns
+    -------
+    geopandas.GeoDataFrame
+        The overlapping tracts with geometries clipped to the catchment and a
+        'coverage_percentage' column holding the share of each tract's area inside it.
+    """
+    tract_gdf = tract_gdf[tract_gdf['ALAND'] > 0]
+    candidate_idx = np.sort(tract_gdf.sindex.query(catchment_geometry, predicate='intersects'))
+    tract_gdf = tract_gdf.iloc[candidate_idx].copy()
+
+    # Only tracts crossing the catchment boundary need an actual intersection
+    shapely.prepare(catchment_geometry)
+    tract_geoms = tract_gdf.geometry.to_numpy()
+    contained = tract_gdf['GEOID'].isin(contained_geoids).to_numpy(copy=True) if contained_geoids is not None else np.zeros(len(tract_gdf), dtype=bool)
+    contained[~contained] = shapely.contains(catchment_geometry, tract_geoms[~contained])
+    intersections = tract_geoms.copy()
+    intersections[~contained] = shapely.intersection(tract_geoms[~contained], catchment_geometry)
+
+    # Calculate the percentage of each tract area contained within the catchment
+    coverage = np.ones(len(tract_gdf))
+    boundary = np.concatenate([tract_geoms[~contained], intersections[~contained]])
+    boundary_areas = equal_area_sq_meters(boundary, tract_gdf.crs.to_string()).reshape(2, -1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        coverage[~contained] = boundary_areas[1] / boundary_areas[0]
+    tract_gdf['coverage_percentage'] = coverage
+
+    # Update the geometry to the intersection and keep only tracts with a non-empty intersection
+    tract_gdf['geometry'] = intersections
+    return tract_gdf[~tract_gdf.geometry.is_empty]
+
+def calculate_overlapping_tracts(user_gdf, state_codes, census_year, contained_geoids=None):
+    """
+    Calculates which tracts overlap with the user-defined geography for intersecting states
+    and updates tract geometries to the intersection with the user-defined geography.
+    Additionally, calculates the percentage of each tract area that is contained within the catchment.
+
+    Parameters
+    ----------
+    user_gdf : geopandas.GeoDataFrame
+        The user-defined geography.
+    state_codes : list of str
+        The state codes of the intersecting states.
+    census_year : str
+        The year of the census data.
+    contained_geoids : collection of str, optional
+        GEOIDs of tracts already known to lie inside the user-defined geography (see overlay_tracts).
+
+    Returns
+    -------
+    geopandas.GeoDataFrame
+        A GeoDataFrame of overlapping tracts with updated geometries to the intersection areas
+        and a new column indicating the percentage of the original tract covered by the intersection.
+    """
+    # TIGER geometries are in NAD83; the bbox limits tract store reads to the intersecting counties
+    user_gdf = user_gdf.to_crs('EPSG:4269')
+    bbox = tuple(user_gdf.total_bounds)
+    catchment_geometry = user_gdf.union_all()
+    overlapping_tracts = []
+    for state_code in state_codes:
+        tract_gdf = load_tract_shapefile(state_code, census_year, bbox)
+        overlapping_tracts.append(overlay_tracts(tract_gdf, catchment_geometry, contained_geoids))
+
+    if not overlapping_tracts:
+        return gpd.GeoDataFrame()
+    return pd.concat(overlapping_tracts, ignore_index=True)
+
+def is_transient_error(error):
+    """
+    Returns whether a failed request is worth retrying: a connection error, a timeout, or an
+    HTTP 429 (rate limited) or 5xx (server error) response.
+    """
+    if isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout)):
+        return True
+    response = getattr(error, 'response', None)
+    return (isinstance(error, requests.exceptions.HTTPError) and response is not None
+            and (response.status_code == 429 or response.status_code >= 500))
+
+
+def _raise_transient_status(response, *args, **kwargs):
+    if response.status_code == 429 or response.status_code >= 500:
+        response.raise_for_status()
+
+
+def raise_transient_statuses(census_api):
+    """
+    Makes a Census API client raise requests.HTTPError on HTTP 429 and 5xx responses.
+
+    The census client turns every unsuccessful response into a CensusException without its
+    status code, which would leave rate limiting and server errors indistinguishable from
+    invalid requests; clients without a requests session (e.g. stand-ins) are left as they are.
+    """
+    session = getattr(census_api, 'session', None)
+    if session is not None and _raise_transient_status not in session.hooks['response']:
+        session.hooks['response'].append(_raise_transient_status)
+
+
+def call_with_retries(func, *args, max_retries=CENSUS_MAX_RETRIES, backoff=CENSUS_RETRY_BACKOFF, **kwargs):
+    """
+    Calls a function, retrying with exponential backoff if it fails with a transient error
+    (see `is_transient_error`); any other error is raised at once.
+
+    Parameters
+    ----------
+    func : callable
+        The function to call.
+    *args, **kwargs
+        Arguments passed to `func`.
+    max_retries : int
+        The number of retries after the first failed attempt.
+    backoff : float
+        The delay in seconds before the first retry; doubled on every subsequent retry.
+
+    Returns
+    -------
+    object
+        The return value of `func`.
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            if attempt == max_retries or not is_transient_error(e):
+                raise
+            time.sleep(backoff * 2 ** attempt)
+
+def fetch_county_tract_data(census_api, census_year, fetch_vars, tracts, max_workers=CENSUS_MAX_WORKERS, max_retries=CENSUS_MAX_RETRIES,
+                            group_counties=False):
+    """
+    Fetches unscaled census data from the Census API for every county containing the given tracts,
+    with one concurrent request per county (or per state) and chunk of at most CENSUS_MAX_VARIABLES variables.
+
+    Parameters
+    ----------
+    census_api : census.Census
+        The Census API client.
+    census_year : str
+        The year of the census.
+    fetch_vars : list of str
+        The census variable codes to fetch.
+    tracts : pandas.DataFrame
+        The tracts to fetch data for, with 'STATEFP' and 'COUNTYFP' columns.
+    max_workers : int
+        The maximum number of concurrent county requests.
+    max_retries : int
+        The number of retries (with exponential backoff) for a failed county request.
+    group_counties : bool
+        Whether to request all counties of a state at once, for the fewest requests
+        (e.g. when fetching many variables).
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per tract of the fetched counties, with 'state', 'county', 'tract' and 'GEOID' columns.
+    """
+    # Enable caching for API requests; cache will last for one day (86400 seconds)
+    install_cache('census_api_cache', backend='sqlite', expire_after=86400)
+    raise_transient_statuses(census_api)
+
+    # Fetch census data for all tracts within each state and county: one request per county (or state) and variable chunk
+    counties = tracts[['STATEFP', 'COUNTYFP']].drop_duplicates()
+    if counties.empty:
+        return pd.DataFrame()
+    if group_counties:
+        geographies = [(state, ','.join(sorted(county_codes))) for state, county_codes in counties.groupby('STATEFP')['COUNTYFP']]
+    else:
+        geographies = list(counties.itertuples(index=False, name=None))
+    fetch_vars = list(dict.fromkeys(fetch_vars))
+    chunks = [fetch_vars[i:i + CENSUS_MAX_VARIABLES] for i in range(0, len(fetch_vars), CENSUS_MAX_VARIABLES)]
+    def fetch_county(request):
+        (state, county), chunk = request
+        return call_with_retries(census_api.acs5.state_county_tract, chunk, state, county,
+                                 Census.ALL, year=census_year, max_retries=max_retries)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        county_jsons = list(executor.map(fetch_county, [(geography, chunk) for chunk in chunks for geography in geographies]))
+
+    # Join the variable chunks of each tract
+    chunk_frames = [pd.DataFrame([row for county_json in county_jsons[i:i + len(geographies)] for row in county_json])
+                    for i in range(0, len(county_jsons), len(geographies))]
+    if not chunk_frames or any(frame.empty for frame in chunk_frames):
+        return pd.DataFrame()
+    census_data = chunk_frames[0]
+    for frame in chunk_frames[1:]:
+        census_data = census_data.merge(frame, on=['state', 'county', 'tract'], how='outer')
+
+    # Convert GEOID to a format that matches the overlapping_tracts for comparison
+    census_data['GEOID'] = census_data['state'] + census_data['county'] + census_data['tract']
+    return census_data
+
+def fetch_tract_values(census_api, census_year, variables, tracts, backend=None,
+                       max_workers=CENSUS_MAX_WORKERS, max_retries=CENSUS_MAX_RETRIES, group_counties=False):
+    """
+    Fetches unscaled census data for a set of tracts, from a local ACS store when one is given
+    and from the Census API for the variables and tracts the store is missing.
+
+    Parameters
+    ----------
+    census_api : census.Census
+        The Census API client.
+    census_year : str
+        The year of the census.
+    variables : list of str
+        The census variable codes to fetch.
+    tracts : pandas.DataFrame
+        The tracts to fetch data for, with 'GEOID', 'STATEFP' and 'COUNTYFP' columns.
+    backend : src.acs_store.ACSStore, optional
+        A local ACS store to read tract data from.
+    max_workers : int
+        The maximum number of concurrent county requests.
+    max_retries : int
+        The number of retries (with exponential backoff) for a failed county request.
+    group_counties : bool
+        Whether to request all counties of a state at once (see fetch_county_tract_data).
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per tract with 'state', 'county', 'tract', 'GEOID' and one column per variable.
+    """
+    if tracts.empty:
+        return pd.DataFrame()
+
+    if backend is None:
+        api_data = fetch_county_tract_data(census_api, census_year, variables, tracts, max_workers, max_retries, group_counties)
+        return api_data[api_data['GEOID'].isin(tracts['GEOID'])] if not api_data.empty else api_data
+
+    # Only the variables and tracts the store cannot serve are requested, and fill in the store's values
+    store_data, missing = backend.lookup(variables, tracts['GEOID'])
+    census_data = store_data.set_index('GEOID')
+    for missing_variables, missing_geoids in missing:
+        missing_tracts = tracts[tracts['GEOID'].isin(missing_geoids)]
+        api_data = fetch_county_tract_data(census_api, census_year, missing_variables, missing_tracts, max_workers,
+                                           max_retries, group_counties)
+        if not api_data.empty:
+            census_data = census_data.combine_first(api_data[api_data['GEOID'].isin(missing_geoids)].set_index('GEOID'))
+    if census_data.empty:
+        return pd.DataFrame()
+    columns = ['state', 'county', 'tract', 'GEOID'] + list(dict.fromkeys(variables))
+    return census_data.reset_index().reindex(columns=columns)
+
+def scale_census_data(census_data, variable_dict, overlapping_tracts, normalization):
+    """
+    Scales unscaled tract census data to the catchment: 'population_count' variables and total population
+    are multiplied by each tract's 'coverage_percentage'.
+
+    Parameters
+    ----------
+    census_data : pandas.DataFrame
+        Unscaled tract census data with a 'GEOID' column, including 'B01003_001E'.
+    variable_dict : dictionary
+        A dictionary containing the variable codes and associated variable types.
+    overlapping_tracts : geopandas.GeoDataFrame
+        The GeoDataFrame of overlapping tracts.
+    normalization : str
+        Indicates if the data should be normalized.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The scaled census data, with a 'coverage_percentage' column (and 'population_normalized' if requested).
+    """
+    if census_data.empty:
+        return census_data
+
+    # Filter the data to only include those tracts that are in the overlapping_tracts DataFrame
+    census_data = census_data.merge(overlapping_tracts[['GEOID', 'coverage_percentage']], on='GEOID', how='inner')
+
+    # scale total population by 'coverage_percentage'
+    census_data['B01003_001E'] = census_data['B01003_001E'] * census_data['coverage_percentage']
+
+    # Scale the data for variables of type 'population_count' by 'coverage_percentage' (total population is scaled above)
+    for var, vtype in variable_dict.items():
+        if vtype == 'population_count' and var != 'B01003_001E':
+            census_data[var] = census_data[var] * census_data['coverage_percentage']
+        if normalization == 'Yes':
+            census_data['population_normalized'] = census_data[var] / census_data['B01003_001E']
+
+    return census_data
+
+def fetch_census_data_for_tracts(census_api, census_year, variable_dict, overlapping_tracts, normalization,
+                                 max_workers=CENSUS_MAX_WORKERS, max_retries=CENSUS_MAX_RETRIES, backend=None):
+    """
+    Fetches census data for tracts within overlapping tracts dataframe, scaling data for 'population_count' variables 
+    by the 'coverage_percentage', with API request caching. Counties are fetched concurrently.
+    
+    Parameters
+    ----------
+    census_api : census.Census
+        The Census API client.
+    census_year : str
+        The year of the census.
+    variable_dict : dictionary
+        A dictionary containing the variable codes and associated variable types.
+    overlapping_tracts : geopandas.GeoDataFrame
+        The GeoDataFrame of overlapping tracts.
+    normalization : str
+        Indicates if the data should be normalized.
+    max_workers : int
+        The maximum number of concurrent county requests.
+    max_retries : int
+        The number of retries (with exponential backoff) for a failed county request.
+    backend : src.acs_store.ACSStore, optional
+        A local ACS store to read tract data from. Only tracts (or variables) missing from
+        the store are fetched from the Census API.
+    
+    Returns
+    -------
+    pandas.DataFrame
+        A DataFrame containing the fetched census data.
+    """
+    fetch_vars = list(variable_dict.keys())+['B01003_001E'] # add population variable to be used for normalization and weighted avg. calcs
+    census_data = fetch_tract_values(census_api, census_year, fetch_vars, overlapping_tracts, backend, max_workers, max_retries)
+    return scale_census_data(census_data, variable_dict, overlapping_tracts, normalization)
+
+def calculate_census_var_weighted_average(census_data, acs_variables):
+    """
+    Calculate the weighted average of specified census variables across all tracts, weighted by population.
+    
+    Parameters
+    ----------
+    census_data : pandas.DataFrame
+        A DataFrame containing fetched census data, which includes census variables and population counts.
+    acs_variables : list
+        List of census variable codes (column names) for which to calculate the weighted averages.
+        
+    Returns
+    -------
+    dict
+        A dictionary containing the weighted averages for each specified census variable.
+    """
+    # Calculate the total population for weighting purposes
+    total_population = census_data['B01003_001E'].sum()
+    positive = census_data[acs_variables[0]] > 0 # remove any negative value catchment areas
+
+    # Calculate the weighted sums for all variables present in the DataFrame at once
+    present = [var for var in acs_variables if var in census_data.columns]
+    weighted_sums = census_data.loc[positive, present].mul(census_data.loc[positive, 'B01003_001E'], axis=0).sum()
+
+    # Variables not in the DataFrame (or a zero total population) have no weighted average
+    if total_population > 0:  # Avoid division by zero
+        return {var: (weighted_sums[var] / total_population if var in present else None) for var in acs_variables}
+    return {var: None for var in acs_variables}
+
+def query_pois(catchment_polygon, location, poi_tags, backend=None):
+    """
+    Queries the points of interest within a catchment area polygon and category, adding
+    their centroids and the distance from a given location in miles. Errors are raised.
+
+    Parameters
+    ----------
+    catchment_polygon: 
+        A Shapely Polygon defining the catchment area.
+    location: 
+        A geopy Location object containing location coordinates.
+    poi_tags: 
+        A dictionary representing the OSM group and categories of interest (e.g., {'amenity':['cafe', 'restaurant']}).
+    backend: 
+        Optional local POI store (e.g. src.poi_store.POIStore) with an osmnx-compatible
+        features_from_polygon() method. Defaults to querying the Overpass API through osmnx.
+
+    Returns:
+    -------
+    GeoDataFrame
+        The named POIs with additional 'centroid_lon', 'centroid_lat' and 'distance' (in miles) columns,
+        or an empty GeoDataFrame if there are none.
+    """
+    if backend is None:
+        # osmnx is slow to import, so it is only loaded once POIs are requested from Overpass
+        import osmnx as ox
+        backend = ox
+
+        # Enable caching for API requests; cache will last for two days (172800 seconds)
+        install_cache('osm_poi_cache', backend='sqlite', expire_after=172800)
+
+    # Define the tags for OSM queries based on the specified category
+    key = list(poi_tags.keys())[0]
+    tags = {key: poi_tags[key]}
+
+    # Fetch POIs within the catchment area polygon
+    pois_gdf = backend.features_from_polygon(catchment_polygon, tags=tags)
+    pois_gdf.dropna(subset=["name"], inplace=True)
+
+    # Check if the returned GeoDataFrame is empty
+    if pois_gdf.empty:
+        logger.warning("No data returned for the specified category within the catchment area.")
+        return gpd.GeoDataFrame()  # Return an empty GeoDataFrame
+
+    # Centroids and the distance from the provided location to each centroid in miles, in batched calls
+    pois_gdf['centroid_lon'], pois_gdf['centroid_lat'] = centroid_coordinates(pois_gdf.geometry)
+    pois_gdf['distance'] = geodesic_distances(location.longitude, location.latitude,
+                                              pois_gdf['centroid_lon'], pois_gdf['centroid_lat']) / METERS_PER_MILE
+    return pois_gdf
+
+def fetch_poi_within_catchment(catchment_polygon, location, poi_tags, backend=None):
+    """
+    Fetch points of interest within a specified catchment area polygon and category,
+    with API request caching, and compute the distance from a given location in miles.
+
+    Parameters
+    ----------
+    catchment_polygon: 
+        A Shapely Polygon defining the catchment area.
+    location: 
+        A geopy Location object containing location coordinates.
+    poi_tags: 
+        A dictionary representing the OSM group and categories of interest (e.g., {'amenity':['cafe', 'restaurant']}).
+    backend: 
+        Optional local POI store (see query_pois). Defaults to querying the Overpass API through osmnx.
+
+    Returns:
+    -------
+    GeoDataFrame
+        GeoDataFrame containing the fetched POI data with an additional 'distance' column in miles.
+    """
+    try:
+        return query_pois(catchment_polygon, location, poi_tags, backend)
+    except Exception as e:
+        logger.error("An error occurred while fetching POIs: %s", e)
+        return gpd.GeoDataFrame(columns = [list(poi_tags.keys())[0], 'name'])
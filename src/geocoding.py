@@ -0,0 +1,301 @@
+"""
+Geocoding subsystem: a persistent cache of normalized addresses, a token-bucket
+scheduler that keeps each provider within its request quota, and a batch API.
+
+Any object with a geopy-style `geocode(query, timeout=...)` method can be used as the
+backend: a geopy Nominatim client (optionally pointed at a self-hosted or stand-in
+server through `domain`/`scheme`), or a local `GazetteerBackend`.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+from functools import lru_cache
+
+from geopy.exc import GeocoderRateLimited, GeocoderTimedOut, GeocoderUnavailable
+from geopy.geocoders import Nominatim
+from geopy.location import Location
+
+GEOCODE_CACHE_PATH = os.environ.get('CATCHMENT_GEOCODE_CACHE', 'geocode_cache.sqlite')
+GEOCODE_CACHE_TTL = 30 * 86400
+# Failed lookups are cached for less time, as they may be fixed upstream
+GEOCODE_NEGATIVE_TTL = 86400
+GEOCODE_TIMEOUT = 5
+GEOCODE_MAX_RETRIES = 3
+GEOCODE_RETRY_BACKOFF = 1.0
+# Requests per second and burst size of each provider (Nominatim's usage policy is 1 request/second)
+PROVIDER_RATE_LIMITS = {
+    'nominatim': (1.0, 1),
+    'gazetteer': (None, None),
+}
+DEFAULT_RATE_LIMIT = (1.0, 1)
+
+
+def normalize_address(address):
+    """
+    Normalizes an address for cache lookups: Unicode-normalized, lower case, without
+    periods and with single spaces and ', ' separators.
+
+    Parameters
+    ----------
+    address : str
+        The address.
+
+    Returns
+    -------
+    str
+        The normalized address.
+    """
+    address = unicodedata.normalize('NFKC', address).lower().replace('.', '')
+    address = re.sub(r'\s*,\s*', ', ', address)
+    address = re.sub(r'\s+', ' ', address)
+    return address.strip(' ,')
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket: `acquire` blocks until a request may be sent.
+    """
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if self.rate is None:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """
+        Empties the bucket for `seconds`, e.g. after the provider reports a rate limit.
+        """
+        with self._lock:
+            self._tokens = -seconds * self.rate if self.rate else 0
+            self._updated = time.monotonic()
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_token_bucket(provider):
+    """
+    Returns the process-wide token bucket of a provider, so every geocoder shares its quota.
+    """
+    with _buckets_lock:
+        if provider not in _buckets:
+            _buckets[provider] = TokenBucket(*PROVIDER_RATE_LIMITS.get(provider, DEFAULT_RATE_LIMIT))
+        return _buckets[provider]
+
+
+class GeocodeCache:
+    """
+    SQLite-backed cache of geocoding results keyed by provider and normalized address.
+
+    Failed lookups are cached too (for `negative_ttl_seconds`), so unresolvable addresses
+    are not re-requested on every run.
+    """
+    def __init__(self, path=GEOCODE_CACHE_PATH, ttl_seconds=GEOCODE_CACHE_TTL, negative_ttl_seconds=GEOCODE_NEGATIVE_TTL):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        with closing(self._connect()) as conn, conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS geocodes (provider TEXT, address TEXT, location_address TEXT, '
+                         'latitude REAL, longitude REAL, raw TEXT, created_at REAL, PRIMARY KEY (provider, address))')
+
+    def _connect(self):
+        # Callers close the connection (and commit through its context manager), so none outlive a call
+        return sqlite3.connect(self.path, timeout=30)
+
+    def get(self, provider, address):
+        """
+        Looks up an address.
+
+        Returns
+        -------
+        tuple
+            (found, location): `found` is False on a miss; `location` is a geopy Location,
+            or None for a cached failed lookup.
+        """
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute('SELECT location_address, latitude, longitude, raw, created_at FROM geocodes '
+                               'WHERE provider = ? AND address = ?', (provider, normalize_address(address))).fetchone()
+        if row is None:
+            return False, None
+        location_address, latitude, longitude, raw, created_at = row
+        if latitude is None:
+            return (now - created_at <= self.negative_ttl_seconds), None
+        if now - created_at > self.ttl_seconds:
+            return False, None
+        return True, Location(location_address, (latitude, longitude), json.loads(raw))
+
+    def put(self, provider, address, location):
+        if location is None:
+            values = (None, None, None, None)
+        else:
+            values = (location.address, location.latitude, location.longitude, json.dumps(location.raw, default=str))
+        with closing(self._connect()) as conn, conn:
+            conn.execute('INSERT OR REPLACE INTO geocodes VALUES (?, ?, ?, ?, ?, ?, ?)',
+                         (provider, normalize_address(address), *values, time.time()))
+
+    def clear(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM geocodes')
+
+
+class GazetteerBackend:
+    """
+    Local geocoding backend resolving addresses from a table of known addresses.
+
+    Parameters
+    ----------
+    entries : dict or pandas.DataFrame
+        {address: (latitude, longitude)}, or a frame with 'address', 'latitude' and 'longitude' columns.
+    """
+    def __init__(self, entries):
+        if hasattr(entries, 'itertuples'):
+            entries = {row.address: (row.latitude, row.longitude) for row in entries.itertuples()}
+        self.entries = {normalize_address(address): (address, point) for address, point in entries.items()}
+
+    def geocode(self, query, timeout=None, **kwargs):
+        match = self.entries.get(normalize_address(query))
+        if match is None:
+            return None
+        address, (latitude, longitude) = match
+        return Location(address, (latitude, longitude), {'lat': latitude, 'lon': longitude, 'display_name': address})
+
+
+class Geocoder:
+    """
+    Cached, rate-limited geocoder.
+
+    Parameters
+    ----------
+    backend : object
+        Anything with a geopy-style `geocode(query, timeout=...)` method.
+    provider : str
+        The provider name, selecting its rate limit and cache namespace (e.g. 'nominatim').
+    cache : GeocodeCache, optional
+        The persistent cache; None disables caching.
+    bucket : TokenBucket, optional
+        The request scheduler; defaults to the provider's process-wide bucket.
+    timeout : float
+        The request timeout in seconds.
+    max_retries : int
+        Retries of timed out, unavailable or rate-limited requests.
+    """
+    def __init__(self, backend, provider, cache=None, bucket=None, timeout=GEOCODE_TIMEOUT, max_retries=GEOCODE_MAX_RETRIES):
+        self.backend = backend
+        self.provider = provider
+        self.cache = cache
+        self.bucket = bucket or get_token_bucket(provider)
+        self.timeout = timeout
+        self.max_retries = max_retries
+
+    def _request(self, address):
+        for attempt in range(self.max_retries + 1):
+            self.bucket.acquire()
+            try:
+                return self.backend.geocode(address, timeout=self.timeout)
+            except GeocoderRateLimited as e:
+                if attempt == self.max_retries:
+                    raise
+                self.bucket.pause(e.retry_after or GEOCODE_RETRY_BACKOFF * 2 ** attempt)
+            except (GeocoderTimedOut, GeocoderUnavailable):
+                if attempt == self.max_retries:
+                    raise
+                time.sleep(GEOCODE_RETRY_BACKOFF * 2 ** attempt)
+
+    def geocode(self, address):
+        """
+        Geocodes one address, from the cache when possible.
+
+        Returns
+        -------
+        geopy.location.Location or None
+            The location, or None if the address could not be geocoded.
+        """
+        if self.cache is not None:
+            found, location = self.cache.get(self.provider, address)
+            if found:
+                return location
+        location = self._request(address)
+        if self.cache is not None:
+            self.cache.put(self.provider, address, location)
+        return location
+
+    def geocode_batch(self, addresses, max_workers=None):
+        """
+        Geocodes many addresses, yielding results as they arrive.
+
+        Addresses are deduplicated by their normalized form; cached results are yielded first,
+        the rest are requested through the provider's token bucket.
+
+        Parameters
+        ----------
+        addresses : iterable of str
+            The addresses.
+        max_workers : int, optional
+            Concurrent requests (defaults to the provider's burst size).
+
+        Yields
+        ------
+        tuple
+            (address, location or None, error or None) once for each distinct input address.
+        """
+        pending = {}
+        for address in addresses:
+            pending.setdefault(normalize_address(address), address)
+
+        misses = []
+        for address in pending.values():
+            found, location = self.cache.get(self.provider, address) if self.cache is not None else (False, None)
+            if found:
+                yield address, location, None
+            else:
+                misses.append(address)
+        if not misses:
+            return
+
+        max_workers = max_workers or self.bucket.capacity or 1
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self.geocode, address): address for address in misses}
+            for future in as_completed(futures):
+                try:
+                    yield futures[future], future.result(), None
+                except Exception as e:
+                    yield futures[future], None, e
+
+
+def nominatim_backend(user_agent, domain=None, scheme=None):
+    """
+    Returns a geopy Nominatim client; `domain`/`scheme` point it at a self-hosted or stand-in server.
+    """
+    kwargs = {'domain': domain, 'scheme': scheme} if domain else {}
+    return Nominatim(user_agent=user_agent, **kwargs)
+
+
+@lru_cache(maxsize=8)
+def get_geocoder(nominatim_client, domain=None, scheme=None):
+    """
+    Returns the process-wide cached Nominatim geocoder of a client user-agent.
+    """
+    return Geocoder(nominatim_backend(nominatim_client, domain, scheme), 'nominatim', GeocodeCache())
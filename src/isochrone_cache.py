@@ -0,0 +1,137 @@
+"""
+Persistent isochrone cache keyed by origin snapped to a grid, travel profile and range.
+
+Entries (WKB geometry + isochrone properties) live in a SQLite file, so they are shared
+by every Streamlit session and batch worker on the machine. Slightly different geocodes
+of the same storefront fall in the same grid cell and reuse the cached isochrone.
+"""
+import json
+import math
+import os
+import sqlite3
+import time
+from contextlib import closing
+from threading import Lock
+
+import shapely
+
+ISOCHRONE_CACHE_PATH = os.environ.get('CATCHMENT_ISOCHRONE_CACHE', 'isochrone_cache.sqlite')
+# Origins within the same ~100 m grid cell share isochrones
+ISOCHRONE_SNAP_METERS = 100.0
+ISOCHRONE_CACHE_TTL = 7 * 86400
+ISOCHRONE_CACHE_MAX_ENTRIES = 20000
+METERS_PER_DEGREE_LAT = 111320.0
+
+
+class IsochroneCache:
+    """
+    SQLite-backed isochrone cache with TTL and size-based (least recently used) eviction.
+    """
+    def __init__(self, path=ISOCHRONE_CACHE_PATH, snap_meters=ISOCHRONE_SNAP_METERS,
+                 ttl_seconds=ISOCHRONE_CACHE_TTL, max_entries=ISOCHRONE_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.snap_meters = snap_meters
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        with closing(self._connect()) as conn, conn:
+            conn.execute('CREATE TABLE IF NOT EXISTS isochrones (key TEXT PRIMARY KEY, wkb BLOB, properties TEXT, '
+                         'created_at REAL, accessed_at REAL, hits INTEGER DEFAULT 0)')
+            conn.execute('CREATE INDEX IF NOT EXISTS isochrones_accessed_at ON isochrones (accessed_at)')
+
+    def _connect(self):
+        # Callers close the connection (and commit through its context manager), so none outlive a call
+        return sqlite3.connect(self.path, timeout=30)
+
+    def snap(self, lon, lat):
+        """
+        Returns the (column, row) grid cell of an origin; cells are `snap_meters` on a side.
+        """
+        row = math.floor(lat * METERS_PER_DEGREE_LAT / self.snap_meters)
+        # Longitude cell width follows the latitude of the cell's row
+        meters_per_degree_lon = METERS_PER_DEGREE_LAT * max(math.cos(math.radians(row * self.snap_meters / METERS_PER_DEGREE_LAT)), 1e-6)
+        col = math.floor(lon * meters_per_degree_lon / self.snap_meters)
+        return col, row
+
+    def key(self, source, lon, lat, travel_profile, range_minutes):
+        col, row = self.snap(lon, lat)
+        return f'{source}|{travel_profile}|{range_minutes}|{self.snap_meters:g}|{col}|{row}'
+
+    def get(self, source, lon, lat, travel_profile, range_minutes):
+        """
+        Looks up a cached isochrone.
+
+        Parameters
+        ----------
+        source : str
+            The isochrone provider (e.g. the client's class name), so providers never share entries.
+        lon, lat : float
+            The origin.
+        travel_profile : str
+            The travel profile.
+        range_minutes : int
+            The travel time in minutes.
+
+        Returns
+        -------
+        tuple or None
+            (shapely geometry, isochrone properties), or None on a miss.
+        """
+        key = self.key(source, lon, lat, travel_profile, range_minutes)
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            row = conn.execute('SELECT wkb, properties FROM isochrones WHERE key = ? AND created_at >= ?',
+                               (key, now - self.ttl_seconds)).fetchone()
+            if row is not None:
+                conn.execute('UPDATE isochrones SET accessed_at = ?, hits = hits + 1 WHERE key = ?', (now, key))
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return shapely.from_wkb(row[0]), json.loads(row[1])
+
+    def put(self, source, lon, lat, travel_profile, range_minutes, geometry, properties):
+        """
+        Stores an isochrone, then evicts expired and least recently used entries beyond `max_entries`.
+        """
+        key = self.key(source, lon, lat, travel_profile, range_minutes)
+        now = time.time()
+        with closing(self._connect()) as conn, conn:
+            conn.execute('INSERT OR REPLACE INTO isochrones (key, wkb, properties, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                         (key, shapely.to_wkb(geometry), json.dumps(properties), now, now))
+            conn.execute('DELETE FROM isochrones WHERE created_at < ?', (now - self.ttl_seconds,))
+            conn.execute('DELETE FROM isochrones WHERE key IN (SELECT key FROM isochrones ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)',
+                         (self.max_entries,))
+
+    def stats(self):
+        """
+        Returns hit/miss counters of this process and the number of stored entries.
+        """
+        with closing(self._connect()) as conn, conn:
+            entries = conn.execute('SELECT COUNT(*) FROM isochrones').fetchone()[0]
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': self.hits / lookups if lookups else None,
+                'entries': entries, 'snap_meters': self.snap_meters}
+
+    def clear(self):
+        with closing(self._connect()) as conn, conn:
+            conn.execute('DELETE FROM isochrones')
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+_default_cache = None
+
+
+def get_isochrone_cache():
+    """
+    Returns the process-wide isochrone cache (created on first use).
+    """
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = IsochroneCache()
+    return _default_cache
@@ -0,0 +1,240 @@
+"""
+Offline travel-time isochrones from a pre-built, serialized OSMnx road graph.
+
+The graph is stored as flat NumPy arrays (one .npy file each) so it can be
+memory-mapped, and is cached per process after the first load. The engine exposes
+the same `isochrones(...)` interface as `openrouteservice.Client`, so it can be
+passed to a CatchmentArea as `isochrone_backend` in place of OpenRouteService.
+
+Build a graph once for a region, e.g.:
+    python -m src.isochrone_engine data/road_graphs/chicago -88.4 41.5 -87.5 42.2
+"""
+import argparse
+import os
+from functools import lru_cache
+
+import numpy as np
+import shapely
+from scipy import sparse
+from scipy.sparse.csgraph import dijkstra
+from scipy.spatial import cKDTree
+from shapely.geometry import mapping
+
+from src.geometry import aeqd_crs, equal_area_sq_meters, project, WGS84
+
+# Travel speeds (km/h) of each OpenRouteService profile; None uses the graph's per-edge driving speed
+PROFILE_SPEEDS_KPH = {
+    'driving-car': None,
+    'driving-hgv': None,
+    'foot-walking': 5.0,
+    'foot-hiking': 4.5,
+    'wheelchair': 3.5,
+    'cycling-regular': 15.0,
+    'cycling-road': 22.0,
+    'cycling-mountain': 13.0,
+    'cycling-electric': 20.0,
+}
+# Driving speed of edges whose highway type has no maxspeed data anywhere in the graph
+FALLBACK_SPEED_KPH = 40.0
+# Heavy goods vehicles: capped and slowed relative to cars
+HGV_MAX_SPEED_KPH = 80.0
+HGV_SPEED_FACTOR = 0.9
+MOTOR_PROFILES = {'driving-car', 'driving-hgv'}
+# Highway types closed to motor vehicles, and to everyone else
+NO_MOTOR_HIGHWAYS = {'footway', 'path', 'pedestrian', 'steps', 'cycleway', 'bridleway', 'corridor', 'track'}
+MOTOR_ONLY_HIGHWAYS = {'motorway', 'motorway_link', 'trunk', 'trunk_link'}
+# Ratio passed to shapely.concave_hull when turning reachable nodes into a polygon
+HULL_RATIO = 0.2
+# Buffer around the hull, so the polygon covers the roads themselves (and is never degenerate)
+HULL_BUFFER_METERS = 50.0
+GRAPH_ARRAYS = ['node_x', 'node_y', 'edge_u', 'edge_v', 'length', 'speed_kph', 'motor_ok', 'nonmotor_ok']
+
+
+def build_road_graph(graph_dir, west, south, east, north):
+    """
+    Downloads the road network of a bounding box with OSMnx and serializes it for the engine.
+
+    Parameters
+    ----------
+    graph_dir : str
+        The directory to write the graph arrays to.
+    west, south, east, north : float
+        The bounding box of the region, in WGS84.
+
+    Returns
+    -------
+    tuple
+        The number of nodes and edges written.
+    """
+    import osmnx as ox
+    graph = ox.graph_from_bbox((west, south, east, north), network_type='all', simplify=True)
+    graph = ox.add_edge_speeds(graph, fallback=FALLBACK_SPEED_KPH)
+
+    nodes = list(graph.nodes)
+    node_index = {node: i for i, node in enumerate(nodes)}
+    edges = list(graph.edges(data=True))
+    highways = [data.get('highway') for _, _, data in edges]
+    highways = [highway[0] if isinstance(highway, list) else highway for highway in highways]
+    arrays = {
+        'node_x': np.array([graph.nodes[node]['x'] for node in nodes]),
+        'node_y': np.array([graph.nodes[node]['y'] for node in nodes]),
+        'edge_u': np.array([node_index[u] for u, _, _ in edges], dtype=np.int32),
+        'edge_v': np.array([node_index[v] for _, v, _ in edges], dtype=np.int32),
+        'length': np.array([data.get('length', 0.0) for _, _, data in edges], dtype=np.float32),
+        'speed_kph': np.array([data.get('speed_kph', FALLBACK_SPEED_KPH) for _, _, data in edges], dtype=np.float32),
+        'motor_ok': np.array([highway not in NO_MOTOR_HIGHWAYS for highway in highways]),
+        'nonmotor_ok': np.array([highway not in MOTOR_ONLY_HIGHWAYS for highway in highways]),
+    }
+    save_road_graph(graph_dir, arrays)
+    return len(nodes), len(edges)
+
+
+def save_road_graph(graph_dir, arrays):
+    """
+    Writes graph arrays (see GRAPH_ARRAYS) to a directory of .npy files.
+    """
+    os.makedirs(graph_dir, exist_ok=True)
+    for name in GRAPH_ARRAYS:
+        np.save(os.path.join(graph_dir, f'{name}.npy'), arrays[name])
+    load_road_graph.cache_clear()
+
+
+@lru_cache(maxsize=8)
+def load_road_graph(graph_dir):
+    """
+    Memory-maps a serialized road graph; cached so each process loads a graph once.
+    """
+    return {name: np.load(os.path.join(graph_dir, f'{name}.npy'), mmap_mode='r') for name in GRAPH_ARRAYS}
+
+
+def fastest_edge_matrix(edge_u, edge_v, seconds, n_nodes):
+    """
+    Builds a sparse travel time matrix, keeping the fastest of any parallel edges.
+
+    scipy sums duplicate (u, v) entries when building a sparse matrix, which would turn parallel
+    edges (e.g. a street and its service road) into one impossibly slow edge.
+
+    Parameters
+    ----------
+    edge_u, edge_v : numpy.ndarray
+        The start and end node index of each edge.
+    seconds : numpy.ndarray
+        The travel time of each edge, in seconds.
+    n_nodes : int
+        The number of nodes in the graph.
+
+    Returns
+    -------
+    scipy.sparse.csr_matrix
+        The node-to-node travel time matrix.
+    """
+    # Sort by (u, v), fastest first, and keep the first edge of each pair
+    order = np.lexsort((seconds, edge_v, edge_u))
+    edge_u, edge_v, seconds = edge_u[order], edge_v[order], seconds[order]
+    first = np.ones(len(order), dtype=bool)
+    first[1:] = (edge_u[1:] != edge_u[:-1]) | (edge_v[1:] != edge_v[:-1])
+    return sparse.csr_matrix((seconds[first], (edge_u[first], edge_v[first])), shape=(n_nodes, n_nodes))
+
+
+class RoadGraphIsochroneEngine:
+    """
+    Computes travel-time isochrones with a bounded Dijkstra search over a serialized road graph.
+    """
+    def __init__(self, graph_dir):
+        self.graph_dir = graph_dir
+        self.graph = load_road_graph(graph_dir)
+        self._travel_times = {}
+        # Nearest-node lookups in approximately isotropic coordinates
+        self._lat_scale = np.cos(np.radians(np.mean(self.graph['node_y'])))
+        self._node_tree = cKDTree(np.column_stack([self.graph['node_x'] * self._lat_scale, self.graph['node_y']]))
+
+    def travel_time_matrix(self, profile):
+        """
+        Returns the sparse node-to-node travel time matrix (seconds) of an OpenRouteService profile.
+        """
+        if profile not in self._travel_times:
+            graph = self.graph
+            allowed = np.asarray(graph['motor_ok'] if profile in MOTOR_PROFILES else graph['nonmotor_ok'])
+            speed_kph = PROFILE_SPEEDS_KPH[profile]
+            if speed_kph is None:
+                speeds = np.asarray(graph['speed_kph'], dtype=float)
+                if profile == 'driving-hgv':
+                    speeds = np.minimum(speeds * HGV_SPEED_FACTOR, HGV_MAX_SPEED_KPH)
+            else:
+                speeds = np.full(len(allowed), speed_kph)
+            seconds = (np.asarray(graph['length'], dtype=float) / (speeds / 3.6))[allowed]
+            edge_u = np.asarray(graph['edge_u'])[allowed]
+            edge_v = np.asarray(graph['edge_v'])[allowed]
+            if profile not in MOTOR_PROFILES:
+                # One-way restrictions only bind vehicles: walkers and cyclists may use every edge in both directions
+                edge_u, edge_v = np.concatenate([edge_u, edge_v]), np.concatenate([edge_v, edge_u])
+                seconds = np.concatenate([seconds, seconds])
+            self._travel_times[profile] = fastest_edge_matrix(edge_u, edge_v, seconds, len(graph['node_x']))
+        return self._travel_times[profile]
+
+    def nearest_node(self, lon, lat):
+        return self._node_tree.query([lon * self._lat_scale, lat])[1]
+
+    def isochrone(self, lon, lat, seconds, profile):
+        """
+        Computes one isochrone polygon.
+
+        Parameters
+        ----------
+        lon, lat : float
+            The origin.
+        seconds : float
+            The travel time budget in seconds.
+        profile : str
+            The OpenRouteService profile name, e.g. 'driving-car'.
+
+        Returns
+        -------
+        shapely.geometry.Polygon
+            The (buffered) concave hull of the nodes reachable within the budget, in WGS84.
+        """
+        origin = self.nearest_node(lon, lat)
+        times = dijkstra(self.travel_time_matrix(profile), indices=origin, limit=seconds)
+        reachable = np.isfinite(times)
+        points = shapely.multipoints(np.column_stack([self.graph['node_x'][reachable], self.graph['node_y'][reachable]]))
+        # Build the hull in a local metric projection so the ratio behaves the same at every latitude
+        local_crs = aeqd_crs(lon, lat)
+        hull = shapely.concave_hull(project(points, WGS84, local_crs), ratio=HULL_RATIO).buffer(HULL_BUFFER_METERS)
+        return project(hull, local_crs, WGS84)
+
+    def isochrones(self, locations, range, profile, range_type='time', attributes=None, **kwargs):
+        """
+        OpenRouteService-compatible isochrones request (see openrouteservice.Client.isochrones).
+
+        Only time ranges are supported. Properties include 'group_index', 'value' and, if requested,
+        'area' (square meters); 'total_pop' is None as the graph carries no population.
+        """
+        if range_type != 'time':
+            raise ValueError("The road graph isochrone engine only supports range_type='time'.")
+        features = []
+        for group_index, (lon, lat) in enumerate(locations):
+            for seconds in range:
+                geometry = self.isochrone(lon, lat, seconds, profile)
+                properties = {'group_index': group_index, 'value': seconds, 'center': [lon, lat]}
+                if attributes and 'area' in attributes:
+                    properties['area'] = float(equal_area_sq_meters(geometry))
+                if attributes and 'total_pop' in attributes:
+                    properties['total_pop'] = None
+                features.append({'type': 'Feature', 'geometry': mapping(geometry), 'properties': properties})
+        return {'type': 'FeatureCollection', 'features': features}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build a serialized road graph for the offline isochrone engine.')
+    parser.add_argument('graph_dir', help='Directory to write the graph to')
+    parser.add_argument('west', type=float)
+    parser.add_argument('south', type=float)
+    parser.add_argument('east', type=float)
+    parser.add_argument('north', type=float)
+    args = parser.parse_args()
+    n_nodes, n_edges = build_road_graph(args.graph_dir, args.west, args.south, args.east, args.north)
+    print(f'Wrote {n_nodes:,} nodes and {n_edges:,} edges to {args.graph_dir}')
+
+
+if __name__ == '__main__':
+    main()
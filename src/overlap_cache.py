@@ -0,0 +1,101 @@
+"""
+Process-wide LRU cache of tract overlaps, keyed by catchment geometry and ACS year.
+
+Shared by every CatchmentArea in the process (and therefore across Streamlit
+reruns and sessions), so population and demographic enrichment of the same
+catchment only compute the tract overlap once.
+"""
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+
+import shapely
+
+OVERLAP_CACHE_MAX_ENTRIES = 32
+
+
+def geometry_key(geometry, census_year):
+    """
+    Builds a stable cache key from the normalized WKB of a geometry and the census year.
+
+    Parameters
+    ----------
+    geometry : shapely.geometry.base.BaseGeometry
+        The catchment geometry.
+    census_year : str
+        The ACS year.
+
+    Returns
+    -------
+    str
+        A hex digest identifying the (geometry, year) pair.
+    """
+    wkb = shapely.to_wkb(shapely.normalize(geometry), output_dimension=2, byte_order=1)
+    return hashlib.sha256(wkb + str(census_year).encode()).hexdigest()
+
+
+class OverlapCache:
+    """
+    Thread-safe LRU cache mapping (geometry, census year) to overlapping tracts.
+
+    Cached GeoDataFrames are shared between callers and must not be modified in place.
+    """
+    def __init__(self, max_entries=OVERLAP_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, geometry, census_year, compute):
+        """
+        Returns the cached overlap for a geometry and year, computing and storing it on a miss.
+
+        Parameters
+        ----------
+        geometry : shapely.geometry.base.BaseGeometry
+            The catchment geometry.
+        census_year : str
+            The ACS year.
+        compute : callable
+            Called with no arguments to compute the overlap on a cache miss.
+
+        Returns
+        -------
+        geopandas.GeoDataFrame
+            The overlapping tracts.
+        """
+        key = geometry_key(geometry, census_year)
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+overlap_cache = OverlapCache()
@@ -0,0 +1,114 @@
+"""
+Server-side POI clustering: points are binned on a screen-pixel grid for each zoom level,
+and each level is emitted as a compact array of [lat, lon, count] clusters and point indices.
+"""
+import numpy as np
+
+from src.geometry import centroid_coordinates
+
+# Clusters merge points within a grid cell of this many screen pixels
+CLUSTER_RADIUS_PX = 60
+# Web Mercator tile size in pixels
+TILE_SIZE_PX = 256
+CLUSTER_MAX_ZOOM = 18
+COORDINATE_DIGITS = 5
+
+
+def poi_points(poi_data):
+    """
+    Returns the POI centroids, as precomputed by `src.core.query_pois` or in one vectorized pass.
+
+    Parameters
+    ----------
+    poi_data : geopandas.GeoDataFrame
+        The POIs, in WGS84.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        The longitude and latitude of each POI.
+    """
+    if 'centroid_lon' in poi_data.columns:
+        return poi_data['centroid_lon'].to_numpy(), poi_data['centroid_lat'].to_numpy()
+    return centroid_coordinates(poi_data.geometry)
+
+
+def pixel_coordinates(lon, lat, zoom):
+    """
+    Returns Web Mercator pixel coordinates of points at a zoom level.
+    """
+    scale = TILE_SIZE_PX * 2 ** zoom
+    x = (np.asarray(lon) + 180) / 360 * scale
+    y = (1 - np.arcsinh(np.tan(np.radians(lat))) / np.pi) / 2 * scale
+    return x, y
+
+
+def cluster_points(lon, lat, zoom, radius_px=CLUSTER_RADIUS_PX):
+    """
+    Clusters points on a `radius_px` pixel grid at a zoom level.
+
+    Parameters
+    ----------
+    lon, lat : numpy.ndarray
+        The points.
+    zoom : int
+        The zoom level.
+    radius_px : int
+        The grid cell size in pixels.
+
+    Returns
+    -------
+    tuple of numpy.ndarray
+        The mean longitude, mean latitude, number of points and index of the first point of each cluster.
+    """
+    x, y = pixel_coordinates(lon, lat, zoom)
+    cells = np.column_stack([np.floor(x / radius_px), np.floor(y / radius_px)])
+    _, first, inverse, counts = np.unique(cells, axis=0, return_index=True, return_inverse=True, return_counts=True)
+    inverse = inverse.ravel()
+    return (np.bincount(inverse, weights=lon) / counts, np.bincount(inverse, weights=lat) / counts, counts, first)
+
+
+def cluster_pyramid(lon, lat, min_zoom, max_zoom=CLUSTER_MAX_ZOOM, radius_px=CLUSTER_RADIUS_PX):
+    """
+    Clusters points for every zoom level from `min_zoom` until no two points share a cluster.
+
+    Parameters
+    ----------
+    lon, lat : numpy.ndarray
+        The points.
+    min_zoom : int
+        The lowest zoom level to cluster.
+    max_zoom : int
+        The highest zoom level to cluster.
+    radius_px : int
+        The grid cell size in pixels.
+
+    Returns
+    -------
+    dict
+        'clusters': {zoom: [[lat, lon, count] or point index, ...]}, and 'max_zoom':
+        the last clustered zoom level (above it every point is shown individually).
+    """
+    clusters = {}
+    zoom = min_zoom
+    for zoom in range(min_zoom, max_zoom + 1):
+        cluster_lon, cluster_lat, counts, first = cluster_points(lon, lat, zoom, radius_px)
+        # Single-point clusters only reference their point
+        clusters[zoom] = [[cluster_lat, cluster_lon, count] if count > 1 else index
+                          for cluster_lat, cluster_lon, count, index in zip(np.round(cluster_lat, COORDINATE_DIGITS).tolist(),
+                                                                             np.round(cluster_lon, COORDINATE_DIGITS).tolist(),
+                                                                             counts.tolist(), first.tolist())]
+        if counts.max(initial=1) == 1:
+            break
+    return {'clusters': clusters, 'max_zoom': zoom}
+
+
+def fit_zoom(bounds, width_px=700, height_px=500):
+    """
+    Returns the (integer) zoom level at which `bounds` (minx, miny, maxx, maxy) fits a map of the given size.
+    """
+    minx, miny, maxx, maxy = bounds
+    x0, y1 = pixel_coordinates(minx, miny, 0)
+    x1, y0 = pixel_coordinates(maxx, maxy, 0)
+    span = max((x1 - x0) / width_px, (y1 - y0) / height_px, 1e-12)
+    return int(np.clip(np.floor(np.log2(1 / span)), 0, CLUSTER_MAX_ZOOM))
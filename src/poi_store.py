@@ -0,0 +1,230 @@
+"""
+Local GeoParquet store of OpenStreetMap POIs, used as an offline backend for
+`fetch_poi_within_catchment` in place of the Overpass API.
+
+The store is laid out as one file per ingested OSM extract::
+
+    <store_dir>/index.parquet              # one row per region + bbox
+    <store_dir>/<region>.parquet           # named POIs of the OSM keys offered in the app
+
+Rows are sorted along a Hilbert curve and carry a bbox covering column, so a query
+only reads the row groups overlapping the catchment before the exact geometry test.
+
+Build it once per regional extract (e.g. from https://download.geofabrik.de), e.g.:
+    python -m src.poi_store data/california-latest.osm.pbf
+    python -m src.poi_store data/nevada-latest.osm.pbf --region nevada
+"""
+import argparse
+import functools
+import operator
+import os
+
+import geopandas as gpd
+import pandas as pd
+import pyarrow.compute as pc
+import shapely
+
+from src.core import load_osm_tags
+
+POI_STORE_DIR = os.environ.get('CATCHMENT_POI_STORE', 'data/poi_store')
+
+ADDRESS_COLUMNS = ['addr:housenumber', 'addr:street', 'addr:city', 'addr:state', 'addr:postcode']
+POI_ROW_GROUP_SIZE = 10000
+
+
+def _region_path(region, store_dir):
+    return os.path.join(store_dir, f'{region}.parquet')
+
+
+def _region_name(pbf_path):
+    name = os.path.basename(pbf_path)
+    for suffix in ('.osm.pbf', '.pbf'):
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def read_pbf_pois(pbf_path, keys):
+    """
+    Reads the named nodes, ways and multipolygon relations tagged with any of `keys` from an OSM extract.
+
+    Parameters
+    ----------
+    pbf_path : str
+        The OSM extract (.osm.pbf).
+    keys : list of str
+        The OSM keys to keep (e.g. 'amenity', 'shop').
+
+    Returns
+    -------
+    geopandas.GeoDataFrame
+        One row per POI: 'element', 'id', 'name', the address fields and one column per key, in WGS84.
+    """
+    # pyosmium is only needed to build the store
+    import osmium
+
+    columns = ['name'] + ADDRESS_COLUMNS + list(keys)
+    wkb_factory = osmium.geom.WKBFactory()
+
+    class POIHandler(osmium.SimpleHandler):
+        def __init__(self):
+            super().__init__()
+            self.records = []
+
+        def add(self, element, osm_id, tags, create_wkb):
+            if 'name' not in tags or not any(key in tags for key in keys):
+                return
+            try:
+                wkb = create_wkb()
+            except (osmium.InvalidLocationError, RuntimeError):
+                return  # incomplete geometry at the edge of the extract
+            self.records.append([element, osm_id, wkb] + [tags.get(column) for column in columns])
+
+        def node(self, n):
+            self.add('node', n.id, n.tags, lambda: wkb_factory.create_point(n))
+
+        def way(self, w):
+            # Closed ways are reported as areas
+            if not w.is_closed():
+                self.add('way', w.id, w.tags, lambda: wkb_factory.create_linestring(w))
+
+        def area(self, a):
+            self.add('way' if a.from_way() else 'relation', a.orig_id(), a.tags, lambda: wkb_factory.create_multipolygon(a))
+
+    handler = POIHandler()
+    handler.apply_file(pbf_path, locations=True)
+    pois = pd.DataFrame(handler.records, columns=['element', 'id', 'geometry'] + columns)
+    geometries = shapely.from_wkb(pois['geometry'].to_numpy())
+    # Single-part areas are plain polygons, as with Overpass
+    single = shapely.get_num_geometries(geometries) == 1
+    geometries[single] = shapely.get_geometry(geometries[single], 0)
+    return gpd.GeoDataFrame(pois.drop(columns='geometry'), geometry=geometries, crs='EPSG:4326')
+
+
+def ingest_pbf(pbf_path, region=None, store_dir=POI_STORE_DIR):
+    """
+    Loads the POIs of an OSM extract into the local store, replacing a previous ingest of the same region.
+
+    Parameters
+    ----------
+    pbf_path : str
+        The OSM extract (.osm.pbf).
+    region : str, optional
+        The region name. Defaults to the extract's file name (e.g. 'california-latest').
+    store_dir : str
+        The root directory of the store.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The region index of the store.
+    """
+    region = region or _region_name(pbf_path)
+    os.makedirs(store_dir, exist_ok=True)
+    pois = read_pbf_pois(pbf_path, list(load_osm_tags()))
+    pois = pois.iloc[pois.geometry.hilbert_distance().argsort()].reset_index(drop=True)
+    pois.to_parquet(_region_path(region, store_dir), write_covering_bbox=True, row_group_size=POI_ROW_GROUP_SIZE)
+
+    index_path = os.path.join(store_dir, 'index.parquet')
+    index = pd.read_parquet(index_path) if os.path.exists(index_path) else pd.DataFrame()
+    if not index.empty:
+        index = index[index['region'] != region]
+    minx, miny, maxx, maxy = pois.total_bounds
+    index = pd.concat([index, pd.DataFrame([{'region': region, 'minx': minx, 'miny': miny, 'maxx': maxx,
+                                             'maxy': maxy, 'n_pois': len(pois)}])], ignore_index=True)
+    index.to_parquet(index_path)
+    return index
+
+
+def has_poi_store(store_dir=POI_STORE_DIR):
+    """
+    Returns True if the store holds at least one ingested region.
+    """
+    return os.path.exists(os.path.join(store_dir, 'index.parquet'))
+
+
+def tag_filter(tags):
+    """
+    Builds the Parquet filter of rows matching any of the OSM tags.
+
+    Parameters
+    ----------
+    tags : dict
+        {key: True (any value), a value, or a list of values}, as for `osmnx.features_from_polygon`.
+
+    Returns
+    -------
+    pyarrow.compute.Expression
+        The row filter.
+    """
+    expressions = []
+    for key, values in tags.items():
+        if values is True:
+            expressions.append(pc.field(key).is_valid())
+        else:
+            expressions.append(pc.field(key).isin([values] if isinstance(values, str) else list(values)))
+    return functools.reduce(operator.or_, expressions)
+
+
+class POIStore:
+    """
+    Read-only view of the local POI store, answering polygon and tag queries with a
+    bbox probe of the stored row groups and an exact intersection test.
+    """
+    def __init__(self, store_dir=POI_STORE_DIR):
+        self.store_dir = store_dir
+        self.index = pd.read_parquet(os.path.join(store_dir, 'index.parquet'))
+
+    def regions(self):
+        """
+        Returns the ingested regions.
+        """
+        return self.index['region'].tolist()
+
+    def features_from_polygon(self, polygon, tags):
+        """
+        Returns the POIs intersecting a polygon with any of the given tags, in the shape
+        returned by `osmnx.features_from_polygon`.
+
+        Parameters
+        ----------
+        polygon : shapely.geometry.Polygon or MultiPolygon
+            The query area, in WGS84.
+        tags : dict
+            {key: True, a value, or a list of values}, for keys offered in `src/osm_tags.pkl`.
+
+        Returns
+        -------
+        geopandas.GeoDataFrame
+            The POIs, indexed by ('element', 'id').
+        """
+        unknown = [key for key in tags if key not in load_osm_tags()]
+        if unknown:
+            raise ValueError(f"OSM keys not in the POI store: {unknown}")
+        minx, miny, maxx, maxy = polygon.bounds
+        index = self.index
+        regions = index[(index['minx'] <= maxx) & (index['maxx'] >= minx) & (index['miny'] <= maxy) & (index['maxy'] >= miny)]
+        columns = ['element', 'id', 'name'] + ADDRESS_COLUMNS + list(tags) + ['geometry']
+        frames = [gpd.read_parquet(_region_path(region, self.store_dir), columns=columns, bbox=polygon.bounds,
+                                   filters=tag_filter(tags)) for region in regions['region']]
+        if not frames:
+            return gpd.GeoDataFrame(columns=columns, geometry='geometry', crs='EPSG:4326').set_index(['element', 'id'])
+        pois = pd.concat(frames, ignore_index=True)
+        shapely.prepare(polygon)
+        pois = pois[shapely.intersects(polygon, pois.geometry.to_numpy())]
+        # Neighbouring extracts overlap at their borders
+        return pois.set_index(['element', 'id']).loc[lambda df: ~df.index.duplicated()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingest the POIs of an OSM extract into the local POI store.')
+    parser.add_argument('pbf_path', help='OSM extract (.osm.pbf), e.g. from https://download.geofabrik.de')
+    parser.add_argument('--region', help='Region name (default: the extract file name)')
+    parser.add_argument('--store-dir', default=POI_STORE_DIR, help='Root directory of the POI store')
+    args = parser.parse_args()
+    index = ingest_pbf(args.pbf_path, args.region, args.store_dir)
+    print(f"Ingested {index['n_pois'].sum():,} POIs in {len(index):,} regions into {args.store_dir}")
+
+
+if __name__ == '__main__':
+    main()
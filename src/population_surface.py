@@ -0,0 +1,413 @@
+"""
+Population surface: tract populations spread over a regular grid in the equal-area CRS,
+with a summed-area table for near-instant population estimates of any circle or polygon.
+
+A query sums the cells whose centres fall inside the catchment row by row (one summed-area
+lookup per row interval) and weights the cells crossed by the catchment boundary by the
+share of their area inside it. Within a cell, population is assumed to be uniform, so an
+estimate can differ from the exact tract overlay only through the boundary cells; the
+returned error bound is the largest such difference.
+
+Cells lie on one lattice anchored at the CRS origin (cell (row, column) spans x from
+column * cell_size and y down from -row * cell_size) and are kept in square tiles, of which
+only those holding tracts are stored, each with its own summed-area table. A country-wide
+grid therefore costs memory in proportion to its land, and tracts on both sides of the
+antimeridian (in the Aleutians) do not stretch the grid around the globe.
+
+The surface is stored as one array file per year and cell size::
+
+    <surface_dir>/<census_year>/<cell_size>m.npz
+
+Build it once from the local tract store, with tract populations from the local ACS store
+(or the Census API), e.g.:
+    python -m src.population_surface 2021 --states 06 32 --cell-size 500
+"""
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+import shapely
+from census import Census
+
+from src import tract_store
+from src.acs_store import ACSStore, has_acs_store
+from src.core import fetch_tract_values
+from src.geometry import project, EQUAL_AREA_CRS, WGS84
+
+POPULATION_SURFACE_DIR = os.environ.get('CATCHMENT_POPULATION_SURFACE', 'data/population_surface')
+DEFAULT_CELL_SIZE = 500
+# Cells per side of a tile
+TILE_CELLS = 256
+# Tract/cell pairs intersected per vectorized batch while building
+BUILD_BATCH_PAIRS = 500000
+# Sub-cell sample points per side used to estimate the covered share of boundary cells
+BOUNDARY_SAMPLES = 4
+
+
+def _surface_path(census_year, cell_size, surface_dir):
+    return os.path.join(surface_dir, str(census_year), f'{int(cell_size)}m.npz')
+
+
+def rasterize_population(geometries, population, cell_size=DEFAULT_CELL_SIZE, tile_cells=TILE_CELLS):
+    """
+    Spreads each polygon's population uniformly over its area and sums it per grid cell.
+
+    Parameters
+    ----------
+    geometries : numpy.ndarray of shapely geometries
+        The tract polygons, in the equal-area CRS.
+    population : numpy.ndarray of float
+        The population of each polygon.
+    cell_size : float
+        The cell size in meters.
+    tile_cells : int
+        The number of cells per side of a tile.
+
+    Returns
+    -------
+    dict
+        The (tile_cells, tile_cells) cell populations of each tile holding a polygon, keyed by
+        the tile's (row, column) on the lattice.
+    """
+    density = population / shapely.area(geometries)
+    # Polygons are split into their parts, so a tract on both sides of the antimeridian only spans the cells of its parts
+    geometries, part_index = shapely.get_parts(geometries, return_index=True)
+    density = density[part_index]
+    shapely.prepare(geometries)
+
+    # Cell ranges of each polygon's bounding box
+    bounds = shapely.bounds(geometries)
+    col0 = np.floor(bounds[:, 0] / cell_size).astype(np.int64)
+    col1 = np.maximum(np.ceil(bounds[:, 2] / cell_size).astype(np.int64) - 1, col0)
+    row0 = np.floor(-bounds[:, 3] / cell_size).astype(np.int64)
+    row1 = np.maximum(np.ceil(-bounds[:, 1] / cell_size).astype(np.int64) - 1, row0)
+    n_pairs = (col1 - col0 + 1) * (row1 - row0 + 1)
+
+    tiles = {}
+    batch_ends = np.searchsorted(np.cumsum(n_pairs), np.arange(BUILD_BATCH_PAIRS, n_pairs.sum() + BUILD_BATCH_PAIRS, BUILD_BATCH_PAIRS))
+    start = 0
+    for end in np.unique(np.minimum(batch_ends + 1, len(geometries))):
+        idx = np.repeat(np.arange(start, end), n_pairs[start:end])
+        # Position of each pair within its polygon's bounding box
+        offset = np.arange(len(idx)) - np.repeat(np.cumsum(n_pairs[start:end]) - n_pairs[start:end], n_pairs[start:end])
+        width = col1[idx] - col0[idx] + 1
+        rows, cols = row0[idx] + offset // width, col0[idx] + offset % width
+        cells = shapely.box(cols * cell_size, -(rows + 1) * cell_size, (cols + 1) * cell_size, -rows * cell_size)
+        # Only cells on a polygon's boundary need the (much slower) exact intersection
+        areas = np.full(len(idx), float(cell_size) ** 2)
+        boundary = ~shapely.contains_properly(geometries[idx], cells)
+        areas[boundary] = shapely.area(shapely.intersection(geometries[idx][boundary], cells[boundary]))
+        weights = density[idx] * areas
+        keys, tile_of_pair = np.unique(np.column_stack([rows // tile_cells, cols // tile_cells]), axis=0, return_inverse=True)
+        tile_of_pair = tile_of_pair.ravel()
+        for i, (tile_row, tile_col) in enumerate(keys):
+            pairs = tile_of_pair == i
+            cell = (rows[pairs] - tile_row * tile_cells) * tile_cells + cols[pairs] - tile_col * tile_cells
+            tile = tiles.setdefault((int(tile_row), int(tile_col)), np.zeros(tile_cells * tile_cells))
+            tile += np.bincount(cell, weights=weights[pairs], minlength=len(tile))
+        start = end
+    return {key: tile.reshape(tile_cells, tile_cells) for key, tile in tiles.items()}
+
+
+class PopulationSurface:
+    """
+    Gridded population in tiles, each with a summed-area table.
+
+    Parameters
+    ----------
+    tiles : dict
+        The (tile_cells, tile_cells) cell populations of each stored tile, keyed by the tile's
+        (row, column) on the lattice (see `rasterize_population`).
+    cell_size : float
+        The cell size in meters.
+    footprint : shapely.geometry.Polygon or MultiPolygon, optional
+        The region, in `crs`, whose population is fully held by the surface. Defaults to the
+        extent of the tiles.
+    crs : str
+        The (equal-area) CRS of the grid.
+    census_year : str, optional
+        The census year of the tract populations.
+    """
+    def __init__(self, tiles, cell_size, footprint=None, crs=EQUAL_AREA_CRS, census_year=None):
+        self.census_year = str(census_year) if census_year is not None else None
+        self.cell_size = float(cell_size)
+        self.crs = str(crs)
+        keys = sorted(tiles)
+        self.tile_cells = len(tiles[keys[0]]) if keys else TILE_CELLS
+        self.tile_keys = np.array(keys, dtype=np.int64).reshape(-1, 2)
+        # _sats[i, r, c] is the population of rows < r and columns < c of tile i; the last tile is empty
+        self._sats = np.zeros((len(keys) + 1, self.tile_cells + 1, self.tile_cells + 1))
+        for i, key in enumerate(keys):
+            self._sats[i, 1:, 1:] = tiles[key].cumsum(axis=0).cumsum(axis=1)
+        # Position of each stored tile in the stack, over the tiles' bounding box (the empty tile elsewhere)
+        self._tile_origin = self.tile_keys.min(axis=0) if keys else np.zeros(2, dtype=np.int64)
+        self._tile_lookup = np.full(tuple(self.tile_keys.max(axis=0) - self._tile_origin + 1) if keys else (0, 0), len(keys))
+        self._tile_lookup[tuple((self.tile_keys - self._tile_origin).T)] = np.arange(len(keys))
+        if footprint is None:
+            tile_size = self.tile_cells * self.cell_size
+            footprint = shapely.union_all(shapely.box(self.tile_keys[:, 1] * tile_size, -(self.tile_keys[:, 0] + 1) * tile_size,
+                                                      (self.tile_keys[:, 1] + 1) * tile_size, -self.tile_keys[:, 0] * tile_size))
+        self.footprint = footprint
+        shapely.prepare(self.footprint)
+
+    @classmethod
+    def load(cls, census_year, cell_size=DEFAULT_CELL_SIZE, surface_dir=POPULATION_SURFACE_DIR):
+        with np.load(_surface_path(census_year, cell_size, surface_dir)) as surface:
+            tiles = dict(zip(map(tuple, surface['tile_keys'].tolist()), surface['tiles']))
+            return cls(tiles, surface['cell_size'], shapely.from_wkb(surface['footprint'].tobytes()),
+                       surface['crs'].item(), census_year)
+
+    def save(self, census_year, surface_dir=POPULATION_SURFACE_DIR):
+        path = _surface_path(census_year, self.cell_size, surface_dir)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        np.savez_compressed(path, tile_keys=self.tile_keys, tiles=self.tile_grids(), cell_size=self.cell_size, crs=self.crs,
+                            footprint=np.frombuffer(shapely.to_wkb(self.footprint), dtype=np.uint8))
+
+    @property
+    def total_population(self):
+        return float(self._sats[:, -1, -1].sum())
+
+    def tile_grids(self):
+        """
+        Returns the (tiles, tile_cells, tile_cells) cell populations of the stored tiles, in the order of `tile_keys`.
+        """
+        return np.diff(np.diff(self._sats[:-1], axis=1), axis=2)
+
+    def _tile_index(self, tile_rows, tile_cols):
+        # Position in the stack of the tiles at the given lattice positions
+        tile_rows, tile_cols = tile_rows - self._tile_origin[0], tile_cols - self._tile_origin[1]
+        n_rows, n_cols = self._tile_lookup.shape
+        stored = (tile_rows >= 0) & (tile_rows < n_rows) & (tile_cols >= 0) & (tile_cols < n_cols)
+        index = np.full(len(tile_rows), len(self.tile_keys))
+        index[stored] = self._tile_lookup[tile_rows[stored], tile_cols[stored]]
+        return index
+
+    def rectangle_sums(self, row0, row1, col0, col1):
+        """
+        Returns the population of the cell rectangles [row0, row1) x [col0, col1) (arrays of lattice
+        indices) from four summed-area table lookups per tile each rectangle spans.
+        """
+        size = self.tile_cells
+        row0, col0 = np.asarray(row0, dtype=np.int64), np.asarray(col0, dtype=np.int64)
+        row1, col1 = np.maximum(row1, row0), np.maximum(col1, col0)
+        tile_row0, tile_col0 = row0 // size, col0 // size
+        n_tile_rows = np.where(row1 > row0, (row1 - 1) // size - tile_row0 + 1, 0)
+        n_tile_cols = np.where(col1 > col0, (col1 - 1) // size - tile_col0 + 1, 0)
+        n_pieces = n_tile_rows * n_tile_cols
+        # One piece per rectangle and tile
+        rect = np.repeat(np.arange(len(row0)), n_pieces)
+        offset = np.arange(len(rect)) - np.repeat(np.cumsum(n_pieces) - n_pieces, n_pieces)
+        tile_rows = tile_row0[rect] + offset // n_tile_cols[rect]
+        tile_cols = tile_col0[rect] + offset % n_tile_cols[rect]
+        r0, r1 = np.clip(row0[rect] - tile_rows * size, 0, size), np.clip(row1[rect] - tile_rows * size, 0, size)
+        c0, c1 = np.clip(col0[rect] - tile_cols * size, 0, size), np.clip(col1[rect] - tile_cols * size, 0, size)
+        tile, sat = self._tile_index(tile_rows, tile_cols), self._sats
+        sums = sat[tile, r1, c1] - sat[tile, r0, c1] - sat[tile, r1, c0] + sat[tile, r0, c0]
+        return np.bincount(rect, weights=sums, minlength=len(row0))
+
+    def window(self, row0, row1, col0, col1):
+        """
+        Returns the cell populations of rows [row0, row1) and columns [col0, col1) of the lattice,
+        with zeros outside the stored tiles.
+        """
+        size = self.tile_cells
+        window = np.zeros((row1 - row0, col1 - col0))
+        for tile_row in range(row0 // size, (row1 - 1) // size + 1):
+            for tile_col in range(col0 // size, (col1 - 1) // size + 1):
+                tile = self._tile_index(np.array([tile_row]), np.array([tile_col]))[0]
+                if tile == len(self.tile_keys):
+                    continue
+                grid = np.diff(np.diff(self._sats[tile], axis=0), axis=1)
+                r0, r1 = max(row0, tile_row * size), min(row1, (tile_row + 1) * size)
+                c0, c1 = max(col0, tile_col * size), min(col1, (tile_col + 1) * size)
+                window[r0 - row0:r1 - row0, c0 - col0:c1 - col0] = grid[r0 - tile_row * size:r1 - tile_row * size,
+                                                                        c0 - tile_col * size:c1 - tile_col * size]
+        return window
+
+    def _grid_segments(self, geometry):
+        # Boundary segments of a polygon, in (fractional) lattice columns and rows
+        rings = shapely.get_rings(shapely.get_parts(geometry))
+        coords, ring_index = shapely.get_coordinates(rings, return_index=True)
+        gx, gy = coords[:, 0] / self.cell_size, -coords[:, 1] / self.cell_size
+        same_ring = ring_index[1:] == ring_index[:-1]
+        return gx[:-1][same_ring], gy[:-1][same_ring], gx[1:][same_ring], gy[1:][same_ring]
+
+    def _centre_intervals(self, gx0, gy0, gx1, gy1):
+        # Even-odd crossings of the boundary with every row's centre line give, per row, the column
+        # intervals whose cell centres are inside the polygon
+        low, high = np.minimum(gy0, gy1), np.maximum(gy0, gy1)
+        first_row = np.ceil(low - 0.5).astype(np.int64)
+        n_rows = np.maximum(np.ceil(high - 0.5).astype(np.int64) - first_row, 0)
+        seg = np.repeat(np.arange(len(gx0)), n_rows)
+        rows = first_row[seg] + np.arange(len(seg)) - np.repeat(np.cumsum(n_rows) - n_rows, n_rows)
+        t = (rows + 0.5 - gy0[seg]) / (gy1[seg] - gy0[seg])
+        xs = gx0[seg] + t * (gx1[seg] - gx0[seg])
+        order = np.lexsort((xs, rows))
+        rows, xs = rows[order], xs[order]
+        # Cells whose centre c + 0.5 lies in [x_start, x_end)
+        return rows[0::2], np.ceil(xs[0::2] - 0.5).astype(np.int64), np.ceil(xs[1::2] - 0.5).astype(np.int64)
+
+    def _boundary_cells(self, gx0, gy0, gx1, gy1):
+        # Cells crossed by the boundary: each segment is split where it crosses grid lines, and
+        # the midpoint of every piece falls in one crossed cell
+        n_x = np.abs(np.floor(gx1) - np.floor(gx0)).astype(np.int64)
+        n_y = np.abs(np.floor(gy1) - np.floor(gy0)).astype(np.int64)
+        seg_x, seg_y = np.repeat(np.arange(len(gx0)), n_x), np.repeat(np.arange(len(gx0)), n_y)
+        step_x = np.arange(len(seg_x)) - np.repeat(np.cumsum(n_x) - n_x, n_x)
+        step_y = np.arange(len(seg_y)) - np.repeat(np.cumsum(n_y) - n_y, n_y)
+        line_x = np.where(gx1[seg_x] > gx0[seg_x], np.floor(gx0[seg_x]) + 1 + step_x, np.floor(gx0[seg_x]) - step_x)
+        line_y = np.where(gy1[seg_y] > gy0[seg_y], np.floor(gy0[seg_y]) + 1 + step_y, np.floor(gy0[seg_y]) - step_y)
+        n = len(gx0)
+        seg = np.concatenate([np.arange(n), np.arange(n), seg_x, seg_y])
+        t = np.concatenate([np.zeros(n), np.ones(n),
+                            (line_x - gx0[seg_x]) / (gx1[seg_x] - gx0[seg_x]),
+                            (line_y - gy0[seg_y]) / (gy1[seg_y] - gy0[seg_y])])
+        order = np.lexsort((t, seg))
+        seg, t = seg[order], t[order]
+        piece = seg[1:] == seg[:-1]
+        mid_t = (t[1:] + t[:-1])[piece] / 2
+        mid_seg = seg[1:][piece]
+        cols = np.floor(gx0[mid_seg] + mid_t * (gx1[mid_seg] - gx0[mid_seg])).astype(np.int64)
+        rows = np.floor(gy0[mid_seg] + mid_t * (gy1[mid_seg] - gy0[mid_seg])).astype(np.int64)
+        return np.unique(np.column_stack([rows, cols]), axis=0)
+
+    def estimate(self, geometry, crs=WGS84):
+        """
+        Estimates the population inside a circle or polygon.
+
+        Parameters
+        ----------
+        geometry : shapely.geometry.Polygon or MultiPolygon
+            The catchment.
+        crs : str
+            The CRS of `geometry`.
+
+        Returns
+        -------
+        dict
+            'population': the estimate; 'error_bound': the largest possible difference from
+            apportioning the same tract populations with the exact overlay; 'boundary_cells':
+            the number of cells crossed by the boundary; 'covered': whether the catchment lies
+            within the surface's footprint (population outside it is not counted).
+        """
+        geometry = project(geometry, crs, self.crs)
+        gx0, gy0, gx1, gy1 = self._grid_segments(geometry)
+
+        # Cells whose centres are inside, by rows of summed-area lookups
+        rows, col0, col1 = self._centre_intervals(gx0, gy0, gx1, gy1)
+        population = self.rectangle_sums(rows, rows + 1, col0, col1).sum()
+
+        # Boundary cells count for the share of their area inside instead
+        cells = self._boundary_cells(gx0, gy0, gx1, gy1)
+        values = self.rectangle_sums(cells[:, 0], cells[:, 0] + 1, cells[:, 1], cells[:, 1] + 1)
+        shapely.prepare(geometry)
+        cell_x = (cells[:, 1] + 0.5) * self.cell_size
+        cell_y = -(cells[:, 0] + 0.5) * self.cell_size
+        centre_inside = shapely.contains_xy(geometry, cell_x, cell_y)
+        offsets = ((np.arange(BOUNDARY_SAMPLES) + 0.5) / BOUNDARY_SAMPLES - 0.5) * self.cell_size
+        sample_x = (cell_x[:, None, None] + offsets[None, None, :]).repeat(BOUNDARY_SAMPLES, axis=1)
+        sample_y = (cell_y[:, None, None] - offsets[None, :, None]).repeat(BOUNDARY_SAMPLES, axis=2)
+        fractions = shapely.contains_xy(geometry, sample_x, sample_y).mean(axis=(1, 2))
+        population += (values * (fractions - centre_inside)).sum()
+
+        return {'population': float(population),
+                # The exact overlay places a boundary cell's population anywhere between none and all of it inside
+                'error_bound': float((values * np.maximum(fractions, 1 - fractions)).sum()),
+                'boundary_cells': len(cells),
+                'covered': bool(shapely.contains(self.footprint, geometry))}
+
+
+def has_population_surface(census_year, cell_size=DEFAULT_CELL_SIZE, surface_dir=POPULATION_SURFACE_DIR):
+    """
+    Returns True if a population surface has been built for the given year and cell size.
+    """
+    return os.path.exists(_surface_path(census_year, cell_size, surface_dir))
+
+
+def tract_population(census_year, tracts, census_api=None, acs_store=None):
+    """
+    Fetches the total population ('B01003_001E') of tracts, from the local ACS store when one is
+    given and from the Census API for the rest.
+
+    Returns
+    -------
+    pandas.Series
+        The population of each tract, indexed by GEOID (missing values as 0).
+    """
+    values = fetch_tract_values(census_api, census_year, ['B01003_001E'], tracts, backend=acs_store, group_counties=True)
+    if values.empty:
+        return pd.Series(0.0, index=pd.Index(tracts['GEOID'], name='GEOID'))
+    population = values.drop_duplicates('GEOID').set_index('GEOID')['B01003_001E'].astype(float)
+    # ACS uses large negative sentinels for unavailable estimates
+    return population.reindex(tracts['GEOID']).clip(lower=0).fillna(0)
+
+
+def surface_footprint(census_year, state_codes, store_dir=tract_store.TRACT_STORE_DIR):
+    """
+    Returns the region, in the equal-area CRS, whose population is fully held by a surface of
+    the given states: everywhere but the other states of the tract store. Water and land
+    outside the United States hold no tracts, so catchments reaching into them stay covered.
+    """
+    states = tract_store.load_states(census_year, store_dir)
+    others = states[~states['GEOID'].isin(state_codes)]
+    world = project(shapely.box(-180, -85, 180, 85), WGS84, EQUAL_AREA_CRS)
+    return shapely.difference(world, shapely.union_all(project(others.geometry.to_numpy(), others.crs.to_string(), EQUAL_AREA_CRS)))
+
+
+def build_population_surface(census_year, state_codes=None, cell_size=DEFAULT_CELL_SIZE, census_api=None,
+                             acs_store=None, store_dir=tract_store.TRACT_STORE_DIR):
+    """
+    Builds the population surface of the tracts in the local tract store.
+
+    Parameters
+    ----------
+    census_year : str
+        The census year.
+    state_codes : list of str, optional
+        The state FIPS codes to include. Defaults to every state in the store.
+    cell_size : float
+        The cell size in meters.
+    census_api : census.Census, optional
+        The Census API client, for tract populations missing from `acs_store`.
+    acs_store : src.acs_store.ACSStore, optional
+        A local ACS store with table B01003.
+    store_dir : str
+        The root directory of the tract store.
+
+    Returns
+    -------
+    PopulationSurface
+        The surface.
+    """
+    if state_codes:
+        tracts = pd.concat([tract_store.load_tracts(census_year, state_code=state_code, store_dir=store_dir)
+                            for state_code in state_codes], ignore_index=True)
+    else:
+        tracts = tract_store.load_tracts(census_year, store_dir=store_dir)
+    # Water-only tracts hold no population, as in the tract overlay
+    tracts = tracts[tracts['ALAND'] > 0]
+    population = tract_population(census_year, tracts, census_api, acs_store).to_numpy()
+    geometries = project(tracts.geometry.to_numpy(), tracts.crs.to_string(), EQUAL_AREA_CRS)
+    tiles = rasterize_population(geometries, population, cell_size)
+    return PopulationSurface(tiles, cell_size, surface_footprint(census_year, tracts['STATEFP'].unique(), store_dir),
+                             census_year=census_year)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the population surface of the local tract store.')
+    parser.add_argument('census_year', help='Census year, e.g. 2021')
+    parser.add_argument('--states', nargs='*', help='State FIPS codes to include (default: all states in the tract store)')
+    parser.add_argument('--cell-size', type=float, default=DEFAULT_CELL_SIZE, help='Cell size in meters')
+    parser.add_argument('--surface-dir', default=POPULATION_SURFACE_DIR, help='Root directory of the population surfaces')
+    parser.add_argument('--api-key', default=os.environ.get('CENSUS_API_KEY'), help='Census API key (default: $CENSUS_API_KEY)')
+    args = parser.parse_args()
+    acs_store = ACSStore(args.census_year) if has_acs_store(args.census_year) else None
+    surface = build_population_surface(args.census_year, args.states, args.cell_size, Census(args.api_key), acs_store)
+    surface.save(args.census_year, args.surface_dir)
+    print(f"Built a population surface of {len(surface.tile_keys):,} tiles "
+          f"({surface.total_population:,.0f} people) in {args.surface_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Rerun-aware memoization of app stages.
+
+Every widget interaction reruns the Streamlit script. A StageCache kept in the session
+state remembers, for each stage (geocoding, catchment geometry, area, population, map
+rendering...), the key it was last computed for and its result, so a rerun only
+recomputes the stages whose inputs changed.
+"""
+import time
+
+import pandas as pd
+
+
+class StageCache:
+    """
+    Per-session store of stage results, one slot per stage.
+    """
+    def __init__(self):
+        self._entries = {}
+        self.log = []
+
+    def start_rerun(self):
+        """
+        Clears the log of the previous rerun.
+        """
+        self.log = []
+
+    def get(self, stage, key, compute):
+        """
+        Returns the stage's result for a key, computing it only if the key changed.
+
+        Parameters
+        ----------
+        stage : str
+            The stage name.
+        key : tuple
+            The stage inputs (compared by equality).
+        compute : callable
+            Computes the stage's result; called without arguments.
+
+        Returns
+        -------
+        object
+            The stage's result.
+        """
+        entry = self._entries.get(stage)
+        if entry is not None and entry[0] == key:
+            self.log.append((stage, 'reused', 0.0))
+            return entry[1]
+        start = time.perf_counter()
+        value = compute()
+        self._entries[stage] = (key, value)
+        self.log.append((stage, 'recomputed', time.perf_counter() - start))
+        return value
+
+    def invalidate(self, *stages):
+        for stage in stages:
+            self._entries.pop(stage, None)
+
+    def report(self):
+        """
+        Returns the stages of the current rerun, whether they were recomputed and how long they took.
+        """
+        return pd.DataFrame(self.log, columns=['stage', 'status', 'seconds'])
@@ -0,0 +1,254 @@
+"""
+Site-selection sweep: the catchment population (and optionally the number of competing POIs)
+of every candidate location on a grid over a region, for circular catchments of one radius.
+
+Instead of scoring each candidate with its own CatchmentArea, the population surface
+(src.population_surface) is convolved with the catchment disc by FFT, so every cell of the
+region is scored at once. In the equal-area grid a circle is an ellipse whose shape changes
+with latitude, so tall regions are convolved in latitude bands with their own kernel.
+
+Example:
+    python -m src.site_sweep 2021 --bbox -122.6 37.2 -121.7 38.0 --radius 3 --spacing 1 \\
+        --poi-tags amenity=cafe --output sites.csv
+"""
+import argparse
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pyproj
+import shapely
+from geopy.point import Point
+from scipy.signal import fftconvolve
+
+from src.core import query_pois
+from src.geometry import project, geodesic_distances, get_transformer, METERS_PER_MILE, WGS84
+from src.population_surface import PopulationSurface, BOUNDARY_SAMPLES, DEFAULT_CELL_SIZE
+from src.poi_store import POIStore, has_poi_store
+
+SWEEP_TOP_SITES = 10
+# Rows of one latitude band share a kernel whose axes are within this relative error of each row's own
+SWEEP_SCALE_TOLERANCE = 0.005
+
+
+def disc_kernel(semi_x, semi_y, samples=BOUNDARY_SAMPLES):
+    """
+    Returns the share of each grid cell covered by an ellipse centred on a cell centre.
+
+    Parameters
+    ----------
+    semi_x, semi_y : float
+        The semi-axes of the ellipse, in cells.
+    samples : int
+        Sample points per cell side used to estimate the covered share.
+
+    Returns
+    -------
+    numpy.ndarray
+        The (2 * ny + 1, 2 * nx + 1) kernel, centred on its middle cell.
+    """
+    nx, ny = int(np.ceil(semi_x + 0.5)), int(np.ceil(semi_y + 0.5))
+    offsets = (np.arange(samples) + 0.5) / samples - 0.5
+    dx = np.arange(-nx, nx + 1)[None, :, None, None] + offsets[None, None, None, :]
+    dy = np.arange(-ny, ny + 1)[:, None, None, None] + offsets[None, None, :, None]
+    return ((dx / semi_x) ** 2 + (dy / semi_y) ** 2 <= 1).mean(axis=(2, 3))
+
+
+def _latitude_bands(semi_x, semi_y, tolerance=SWEEP_SCALE_TOLERANCE):
+    # Splits consecutive rows into bands whose kernel axes stay within the tolerance of the band's first row
+    bands, start = [], 0
+    for row in range(1, len(semi_x) + 1):
+        if row == len(semi_x) or abs(semi_x[row] / semi_x[start] - 1) > tolerance or abs(semi_y[row] / semi_y[start] - 1) > tolerance:
+            bands.append((start, row))
+            start = row
+    return bands
+
+
+class SiteSweep:
+    """
+    Scores of the candidate locations of a sweep.
+
+    Parameters
+    ----------
+    longitude, latitude : numpy.ndarray
+        The (rows, columns) coordinates of the candidate grid, in WGS84.
+    population : numpy.ndarray
+        The (rows, columns) catchment population of each candidate, NaN outside the region.
+    radius_miles : float
+        The catchment radius.
+    competitors : numpy.ndarray, optional
+        The (rows, columns) number of competing POIs within each candidate's catchment
+        (counted from the cell centres of the POIs).
+    pois : geopandas.GeoDataFrame, optional
+        The competing POIs, with 'centroid_lon' and 'centroid_lat' columns.
+    """
+    def __init__(self, longitude, latitude, population, radius_miles, competitors=None, pois=None):
+        self.longitude = longitude
+        self.latitude = latitude
+        self.population = population
+        self.radius_miles = radius_miles
+        self.competitors = competitors
+        self.pois = pois
+
+    def candidates(self):
+        """
+        Returns the heat surface in long form: one row per candidate inside the region, with
+        'longitude', 'latitude', 'population' (and 'competitors') columns.
+        """
+        inside = ~np.isnan(self.population)
+        candidates = pd.DataFrame({'longitude': self.longitude[inside], 'latitude': self.latitude[inside],
+                                   'population': self.population[inside]})
+        if self.competitors is not None:
+            candidates['competitors'] = self.competitors[inside].astype(int)
+        return candidates
+
+    def top_sites(self, n=SWEEP_TOP_SITES, min_separation_miles=None):
+        """
+        Ranks the candidates by catchment population, skipping candidates closer than
+        `min_separation_miles` (default: the catchment radius) to a better ranked site.
+
+        Returns
+        -------
+        geopandas.GeoDataFrame
+            The top sites with 'rank', 'longitude', 'latitude' and 'population' columns, and
+            'competitors' (counted exactly from the POIs) when the sweep counted competitors.
+        """
+        min_separation = (self.radius_miles if min_separation_miles is None else min_separation_miles) * METERS_PER_MILE
+        candidates = self.candidates()
+        lon, lat = candidates['longitude'].to_numpy(), candidates['latitude'].to_numpy()
+        available = np.ones(len(candidates), dtype=bool)
+        picks = []
+        order = np.argsort(-candidates['population'].to_numpy(), kind='stable')
+        for i in order:
+            if len(picks) == n:
+                break
+            if not available[i]:
+                continue
+            picks.append(i)
+            available &= geodesic_distances(lon[i], lat[i], lon, lat) >= min_separation
+        sites = candidates.iloc[picks].reset_index(drop=True)
+        sites.insert(0, 'rank', np.arange(1, len(sites) + 1))
+        if self.pois is not None:
+            poi_lon, poi_lat = self.pois['centroid_lon'].to_numpy(), self.pois['centroid_lat'].to_numpy()
+            radius = self.radius_miles * METERS_PER_MILE
+            sites['competitors'] = [int((geodesic_distances(site_lon, site_lat, poi_lon, poi_lat) <= radius).sum())
+                                    for site_lon, site_lat in zip(sites['longitude'], sites['latitude'])]
+        return gpd.GeoDataFrame(sites, geometry=gpd.points_from_xy(sites['longitude'], sites['latitude']), crs=WGS84)
+
+
+def sweep_sites(surface, region, radius_miles, spacing_miles=None, poi_tags=None, poi_store=None):
+    """
+    Scores every candidate location of a region by the population of its circular catchment.
+
+    Parameters
+    ----------
+    surface : src.population_surface.PopulationSurface
+        The population surface. Population outside its extent is not counted.
+    region : shapely.geometry.Polygon or tuple of float
+        The region to sweep, as a polygon or a (minx, miny, maxx, maxy) bounding box in WGS84.
+    radius_miles : float
+        The catchment radius.
+    spacing_miles : float, optional
+        The spacing of the candidate grid. Defaults to the surface's cell size; candidates
+        are the cell centres of the surface, so spacing is rounded to whole cells.
+    poi_tags : dict, optional
+        Competitor POIs to count within each catchment (e.g. {'amenity': ['cafe']}).
+    poi_store : src.poi_store.POIStore, optional
+        A local POI store to read competitors from instead of the Overpass API.
+
+    Returns
+    -------
+    SiteSweep
+        The candidate scores.
+    """
+    if isinstance(region, tuple):
+        region = shapely.box(*region)
+    radius = radius_miles * METERS_PER_MILE
+    cell = surface.cell_size
+    stride = max(1, int(round(spacing_miles * METERS_PER_MILE / cell))) if spacing_miles else 1
+
+    # Candidate cells: the surface's cells whose centres are inside the region, every `stride` cells
+    projected = project(region, WGS84, surface.crs)
+    minx, miny, maxx, maxy = projected.bounds
+    row0, row1 = int(np.floor(-maxy / cell)), int(np.ceil(-miny / cell))
+    col0, col1 = int(np.floor(minx / cell)), int(np.ceil(maxx / cell))
+    row0, col0 = row0 + (-row0) % stride, col0 + (-col0) % stride
+    rows, cols = np.arange(row0, row1, stride), np.arange(col0, col1, stride)
+    if not len(rows) or not len(cols):
+        raise ValueError("The region is smaller than the candidate spacing.")
+    x = (cols + 0.5) * cell
+    y = -(rows + 0.5) * cell
+    grid_x, grid_y = np.meshgrid(x, y)
+    longitude, latitude = get_transformer(surface.crs, WGS84).transform(grid_x, grid_y)
+    shapely.prepare(projected)
+    inside = shapely.contains_xy(projected, grid_x, grid_y)
+
+    # The catchment's semi-axes in cells, from the grid's scale factors at each candidate row
+    factors = pyproj.Proj(surface.crs).get_factors(np.full(len(rows), longitude[0].mean()), latitude[:, 0])
+    semi_x = radius * np.asarray(factors.parallel_scale) / cell
+    semi_y = radius * np.asarray(factors.meridional_scale) / cell
+
+    # Competitor POIs, counted per cell so that they are convolved like the population
+    pois, poi_counts = None, None
+    if poi_tags:
+        pad_x, pad_y = semi_x.max() * cell, semi_y.max() * cell
+        search_area = project(shapely.box(minx - pad_x, miny - pad_y, maxx + pad_x, maxy + pad_y), surface.crs, WGS84)
+        centre = search_area.centroid
+        pois = query_pois(search_area, Point(centre.y, centre.x), poi_tags, backend=poi_store)
+        if not pois.empty:
+            poi_x, poi_y = get_transformer(WGS84, surface.crs).transform(pois['centroid_lon'].to_numpy(), pois['centroid_lat'].to_numpy())
+            poi_counts = (np.floor(-poi_y / cell).astype(np.int64), np.floor(poi_x / cell).astype(np.int64))
+
+    population = np.full((len(rows), len(cols)), np.nan)
+    competitors = np.zeros((len(rows), len(cols))) if poi_tags else None
+    for start, end in _latitude_bands(semi_x, semi_y):
+        middle = (start + end - 1) // 2
+        kernel = disc_kernel(semi_x[middle], semi_y[middle])
+        ky, kx = kernel.shape[0] // 2, kernel.shape[1] // 2
+        # The band's rows of the full-resolution grid, plus the kernel's reach around them
+        band_row0, band_row1 = rows[start], rows[end - 1] + 1
+        window = (band_row0 - ky, band_row1 + ky, cols[0] - kx, cols[-1] + 1 + kx)
+        band = fftconvolve(surface.window(*window), kernel, mode='valid')
+        population[start:end] = band[rows[start:end] - band_row0][:, cols - cols[0]]
+        if poi_counts is not None:
+            counts = np.zeros((window[1] - window[0], window[3] - window[2]))
+            poi_rows, poi_cols = poi_counts[0] - window[0], poi_counts[1] - window[2]
+            keep = (poi_rows >= 0) & (poi_rows < counts.shape[0]) & (poi_cols >= 0) & (poi_cols < counts.shape[1])
+            np.add.at(counts, (poi_rows[keep], poi_cols[keep]), 1)
+            # Cells whose centres are within the catchment
+            centre_kernel = disc_kernel(semi_x[middle], semi_y[middle], samples=1)
+            band = fftconvolve(counts, centre_kernel, mode='valid')
+            competitors[start:end] = np.round(band[rows[start:end] - band_row0][:, cols - cols[0]])
+    # FFT round-off can leave tiny negative values where there is no population
+    population = np.where(inside, np.maximum(population, 0), np.nan)
+    return SiteSweep(longitude, latitude, population, radius_miles, competitors, pois if poi_tags else None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Rank candidate sites of a region by catchment population.')
+    parser.add_argument('census_year', help='Year of the population surface, e.g. 2021')
+    parser.add_argument('--bbox', type=float, nargs=4, required=True, metavar=('MINLON', 'MINLAT', 'MAXLON', 'MAXLAT'),
+                        help='Region to sweep')
+    parser.add_argument('--radius', type=float, required=True, help='Catchment radius in miles')
+    parser.add_argument('--spacing', type=float, help='Candidate spacing in miles (default: the surface cell size)')
+    parser.add_argument('--cell-size', type=float, default=DEFAULT_CELL_SIZE, help='Cell size of the population surface in meters')
+    parser.add_argument('--poi-tags', help='Competitor POIs to count, e.g. amenity=cafe,restaurant')
+    parser.add_argument('--top', type=int, default=SWEEP_TOP_SITES, help='Number of top sites to list')
+    parser.add_argument('--output', help='Write the top sites to this CSV file')
+    args = parser.parse_args()
+    poi_tags = None
+    if args.poi_tags:
+        key, values = args.poi_tags.split('=', 1)
+        poi_tags = {key: values.split(',')}
+    surface = PopulationSurface.load(args.census_year, args.cell_size)
+    sweep = sweep_sites(surface, tuple(args.bbox), args.radius, args.spacing, poi_tags,
+                        POIStore() if has_poi_store() else None)
+    sites = pd.DataFrame(sweep.top_sites(args.top).drop(columns='geometry'))
+    print(f"Scored {len(sweep.candidates()):,} candidate sites")
+    print(sites.to_string(index=False))
+    if args.output:
+        sites.to_csv(args.output, index=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,278 @@
+"""
+Local vector tile server: Mapbox Vector Tiles generated on demand, so large tract layers
+are streamed tile by tile to the browser instead of being embedded in the map's HTML.
+
+The server runs in-process on a background thread (`get_tile_server`) or as a sidecar:
+    python -m src.tile_server --census-year 2021 --port 8765
+Layers are either GeoDataFrames registered at runtime (e.g. the current catchment's
+census data) or tract boundaries read from the local tract store per tile. Encoded tiles
+are kept in a per-tile LRU cache.
+
+The server is local-only by default: it binds 127.0.0.1 on a random free port, so only a
+browser on the same machine as the app can load its tiles. The app therefore only uses it
+when opted in (see `vector_tiles_enabled`): set CATCHMENT_VECTOR_TILES=1 for local use or,
+for a deployed app, bind a reachable host and fixed port (CATCHMENT_TILE_HOST,
+CATCHMENT_TILE_PORT) and route the public CATCHMENT_TILE_URL to it through a proxy.
+"""
+import argparse
+import importlib.util
+import os
+import re
+import threading
+from collections import OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import shapely
+
+from src import tract_store
+from src.geometry import project, WGS84
+
+WEB_MERCATOR = 'EPSG:3857'
+MERCATOR_HALF_WORLD = 20037508.342789244
+TILE_EXTENT = 4096
+# Features are clipped to the tile plus this buffer (in tile units), so strokes do not show seams
+TILE_BUFFER = 64
+TILE_CACHE_MAX_TILES = 2048
+# Tilesets kept registered (e.g. one per session and layer); the least recently registered are dropped
+TILE_SERVER_MAX_TILESETS = 256
+TILE_SERVER_HOST = os.environ.get('CATCHMENT_TILE_HOST', '127.0.0.1')
+TILE_SERVER_PORT = int(os.environ.get('CATCHMENT_TILE_PORT', 0))
+# Public base URL of the tile server when the browser reaches it through a proxy
+TILE_SERVER_URL = os.environ.get('CATCHMENT_TILE_URL')
+# Opt-in for the local-only server, when the browser runs on the app's machine (e.g. local development)
+VECTOR_TILES_LOCAL = os.environ.get('CATCHMENT_VECTOR_TILES', '').lower() in ('1', 'true', 'yes')
+# Tract store tiles below this zoom would hold thousands of tracts each, and are left empty
+TRACT_STORE_MIN_ZOOM = 8
+TILE_PATH = re.compile(r'^/([\w.-]+)/(\d+)/(\d+)/(\d+)\.pbf$')
+
+
+def vector_tiles_available():
+    """
+    Returns whether the optional `mapbox_vector_tile` encoder is installed.
+    """
+    return importlib.util.find_spec('mapbox_vector_tile') is not None
+
+
+def vector_tiles_enabled():
+    """
+    Returns whether layers should be served as vector tiles: only when the encoder is installed
+    and the deployment opts in, with a public CATCHMENT_TILE_URL or with CATCHMENT_VECTOR_TILES=1
+    for a browser on the app's own machine. Otherwise the browser could not reach the tiles.
+    """
+    return vector_tiles_available() and bool(TILE_SERVER_URL or VECTOR_TILES_LOCAL)
+
+
+def tile_bounds(z, x, y):
+    """
+    Returns the (minx, miny, maxx, maxy) Web Mercator bounds of an XYZ tile.
+    """
+    size = 2 * MERCATOR_HALF_WORLD / 2 ** z
+    minx = -MERCATOR_HALF_WORLD + x * size
+    maxy = MERCATOR_HALF_WORLD - y * size
+    return minx, maxy - size, minx + size, maxy
+
+
+def _clean_properties(properties):
+    # MVT values are strings, numbers or booleans; missing values are left out
+    return {key: value for key, value in properties.items() if value is not None and value == value}
+
+
+class GeoDataFrameLayer:
+    """
+    Tile layer of a GeoDataFrame, projected to Web Mercator once and indexed for tile queries.
+
+    Parameters
+    ----------
+    gdf : geopandas.GeoDataFrame
+        The features.
+    properties : list of str
+        The columns to encode as feature properties.
+    min_zoom : int
+        Tiles below this zoom are empty.
+    """
+    def __init__(self, gdf, properties=(), min_zoom=0):
+        self.geometries = project(gdf.geometry.to_numpy(), gdf.crs.to_string(), WEB_MERCATOR)
+        self.tree = shapely.STRtree(self.geometries)
+        self.properties = [_clean_properties(row) for row in gdf[list(properties)].to_dict('records')]
+        self.min_zoom = min_zoom
+
+    def features(self, bounds):
+        idx = self.tree.query(shapely.box(*bounds))
+        return self.geometries[idx], [self.properties[i] for i in idx]
+
+
+class TractStoreLayer:
+    """
+    Tile layer of tract boundaries read from the local tract store for each tile.
+    """
+    def __init__(self, census_year, min_zoom=TRACT_STORE_MIN_ZOOM):
+        self.census_year = str(census_year)
+        self.min_zoom = min_zoom
+
+    def features(self, bounds):
+        # TIGER geometries are in NAD83, which is treated as WGS84 at tile resolution
+        bbox = shapely.bounds(project(shapely.box(*bounds), WEB_MERCATOR, WGS84))
+        tracts = tract_store.load_tracts(self.census_year, bbox=tuple(bbox))
+        geometries = project(tracts.geometry.to_numpy(), WGS84, WEB_MERCATOR)
+        return geometries, [{'GEOID': geoid} for geoid in tracts['GEOID']]
+
+
+def encode_tile(layers, z, x, y):
+    """
+    Encodes one Mapbox Vector Tile.
+
+    Parameters
+    ----------
+    layers : dict
+        {layer name: layer} (see GeoDataFrameLayer and TractStoreLayer).
+    z, x, y : int
+        The tile.
+
+    Returns
+    -------
+    bytes
+        The encoded tile.
+    """
+    import mapbox_vector_tile
+
+    bounds = tile_bounds(z, x, y)
+    buffer = (bounds[2] - bounds[0]) * TILE_BUFFER / TILE_EXTENT
+    buffered = (bounds[0] - buffer, bounds[1] - buffer, bounds[2] + buffer, bounds[3] + buffer)
+    # Vertices closer than one tile unit collapse when quantized, so simplify them away first
+    tolerance = (bounds[2] - bounds[0]) / TILE_EXTENT
+    encoded_layers = []
+    for name, layer in layers.items():
+        if z < layer.min_zoom:
+            continue
+        geometries, properties = layer.features(buffered)
+        geometries = shapely.simplify(shapely.clip_by_rect(geometries, *buffered), tolerance, preserve_topology=True)
+        features = [{'geometry': geometry, 'properties': props}
+                    for geometry, props in zip(geometries, properties) if not geometry.is_empty]
+        if features:
+            encoded_layers.append({'name': name, 'features': features})
+    return mapbox_vector_tile.encode(encoded_layers, default_options={'quantize_bounds': bounds, 'extents': TILE_EXTENT})
+
+
+class TileServer:
+    """
+    Threaded HTTP server of vector tilesets, with a per-tile LRU cache.
+
+    Tiles are served at `<url>/<tileset>/<z>/<x>/<y>.pbf`. By default `url` is a loopback
+    address on a random port, reachable from the app's own machine only (see module docstring).
+    """
+    def __init__(self, host=TILE_SERVER_HOST, port=TILE_SERVER_PORT, max_tiles=TILE_CACHE_MAX_TILES,
+                 max_tilesets=TILE_SERVER_MAX_TILESETS):
+        self.tilesets = OrderedDict()
+        self.max_tiles = max_tiles
+        self.max_tilesets = max_tilesets
+        self._tiles = OrderedDict()
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _handler(self))
+        self._httpd.daemon_threads = True
+        self.url = TILE_SERVER_URL or f'http://{host}:{self._httpd.server_port}'
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+
+    def register(self, tileset, layers):
+        """
+        Registers (or replaces) a tileset and returns its XYZ URL template.
+
+        Parameters
+        ----------
+        tileset : str
+            The tileset id (letters, digits, '.', '_' and '-').
+        layers : dict
+            {layer name: layer} (see GeoDataFrameLayer and TractStoreLayer).
+
+        Returns
+        -------
+        str
+            The URL template, e.g. 'http://127.0.0.1:8765/census/{z}/{x}/{y}.pbf'.
+        """
+        with self._lock:
+            self.tilesets[tileset] = layers
+            self.tilesets.move_to_end(tileset)
+            while len(self.tilesets) > self.max_tilesets:
+                self.tilesets.popitem(last=False)
+            for key in [key for key in self._tiles if key[0] == tileset or key[0] not in self.tilesets]:
+                del self._tiles[key]
+        return f'{self.url}/{tileset}/{{z}}/{{x}}/{{y}}.pbf'
+
+    def tile(self, tileset, z, x, y):
+        """
+        Returns an encoded tile from the cache, generating it on a miss; None for an unknown tileset.
+        """
+        key = (tileset, z, x, y)
+        with self._lock:
+            if key in self._tiles:
+                self._tiles.move_to_end(key)
+                return self._tiles[key]
+            layers = self.tilesets.get(tileset)
+        if layers is None:
+            return None
+        data = encode_tile(layers, z, x, y)
+        with self._lock:
+            self._tiles[key] = data
+            while len(self._tiles) > self.max_tiles:
+                self._tiles.popitem(last=False)
+        return data
+
+    def join(self):
+        self._thread.join()
+
+    def shutdown(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def _handler(server):
+    class TileRequestHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            match = TILE_PATH.match(self.path.split('?')[0])
+            data = server.tile(match.group(1), *map(int, match.groups()[1:])) if match else None
+            if data is None:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/vnd.mapbox-vector-tile')
+            self.send_header('Content-Length', str(len(data)))
+            # Tiles are requested from the map's iframe, which has a different origin
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Cache-Control', 'no-cache')
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+    return TileRequestHandler
+
+
+_default_server = None
+_default_server_lock = threading.Lock()
+
+
+def get_tile_server():
+    """
+    Returns the process-wide tile server (started on first use).
+    """
+    global _default_server
+    with _default_server_lock:
+        if _default_server is None:
+            _default_server = TileServer()
+        return _default_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve tract boundaries from the local tract store as vector tiles.')
+    parser.add_argument('--census-year', required=True, help='Tract store year, e.g. 2021')
+    parser.add_argument('--host', default=TILE_SERVER_HOST)
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+    server = TileServer(args.host, args.port)
+    url = server.register('tracts', {'tracts': TractStoreLayer(args.census_year)})
+    print(f'Serving tract tiles at {url}')
+    server.join()
+
+
+if __name__ == '__main__':
+    main()
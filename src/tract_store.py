@@ -0,0 +1,186 @@
+"""
+Local, partitioned GeoParquet store for TIGER census tract and state geometries.
+
+The store is laid out as::
+
+    <store_dir>/<census_year>/states.parquet
+    <store_dir>/<census_year>/index.parquet          # one row per (state, county) partition + bbox
+    <store_dir>/<census_year>/tracts/<STATEFP>/<COUNTYFP>.parquet
+
+Build it once with the ingest command, e.g.:
+    python -m src.tract_store 2021                  # all states
+    python -m src.tract_store 2021 --states 06 32   # California and Nevada only
+"""
+import argparse
+import os
+from functools import lru_cache
+
+import geopandas as gpd
+import pandas as pd
+import shapely
+
+TRACT_STORE_DIR = os.environ.get('CATCHMENT_TRACT_STORE', 'data/tract_store')
+
+# Only the columns the app uses are kept in the store
+TRACT_COLUMNS = ['GEOID', 'STATEFP', 'COUNTYFP', 'TRACTCE', 'ALAND', 'geometry']
+STATE_COLUMNS = ['GEOID', 'STUSPS', 'NAME', 'geometry']
+
+STATE_BOUNDARIES_URL = "https://www2.census.gov/geo/tiger/GENZ{0}/shp/cb_{0}_us_state_20m.zip"
+TRACT_SHAPEFILE_URL = "https://www2.census.gov/geo/tiger/TIGER{0}/TRACT/tl_{0}_{1}_tract.zip"
+
+
+def _year_dir(census_year, store_dir):
+    return os.path.join(store_dir, str(census_year))
+
+
+def ingest_tiger(census_year, state_codes=None, store_dir=TRACT_STORE_DIR):
+    """
+    Downloads TIGER state and tract files and writes them to the local store,
+    partitioned by state and county, along with a partition bbox index.
+
+    Parameters
+    ----------
+    census_year : str
+        The census year to ingest.
+    state_codes : list of str, optional
+        The state FIPS codes to ingest. Defaults to every state in the state boundaries file.
+    store_dir : str
+        The root directory of the store.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The partition index for the ingested year.
+    """
+    year_dir = _year_dir(census_year, store_dir)
+    os.makedirs(year_dir, exist_ok=True)
+
+    states_gdf = gpd.read_file(STATE_BOUNDARIES_URL.format(census_year))[STATE_COLUMNS]
+    states_gdf.to_parquet(os.path.join(year_dir, 'states.parquet'))
+
+    index_path = os.path.join(year_dir, 'index.parquet')
+    index = pd.read_parquet(index_path) if os.path.exists(index_path) else pd.DataFrame()
+    state_codes = state_codes or sorted(states_gdf['GEOID'])
+
+    partitions = []
+    for state_code in state_codes:
+        tract_gdf = gpd.read_file(TRACT_SHAPEFILE_URL.format(census_year, state_code))[TRACT_COLUMNS]
+        state_dir = os.path.join(year_dir, 'tracts', state_code)
+        os.makedirs(state_dir, exist_ok=True)
+        for county_code, county_gdf in tract_gdf.groupby('COUNTYFP'):
+            path = os.path.join('tracts', state_code, f'{county_code}.parquet')
+            county_gdf.reset_index(drop=True).to_parquet(os.path.join(year_dir, path))
+            minx, miny, maxx, maxy = county_gdf.total_bounds
+            partitions.append({'STATEFP': state_code, 'COUNTYFP': county_code, 'path': path,
+                               'minx': minx, 'miny': miny, 'maxx': maxx, 'maxy': maxy,
+                               'n_tracts': len(county_gdf), 'crs': county_gdf.crs.to_string()})
+
+    # Replace any previously ingested partitions for the same states
+    if not index.empty:
+        index = index[~index['STATEFP'].isin(state_codes)]
+    index = pd.concat([index, pd.DataFrame(partitions)], ignore_index=True)
+    index.to_parquet(index_path)
+    load_partition_index.cache_clear()
+    load_states.cache_clear()
+    return index
+
+
+def has_tract_store(census_year, store_dir=TRACT_STORE_DIR):
+    """
+    Returns True if the store holds an ingested partition index for the given year.
+    """
+    return os.path.exists(os.path.join(_year_dir(census_year, store_dir), 'index.parquet'))
+
+
+@lru_cache(maxsize=None)
+def load_partition_index(census_year, store_dir=TRACT_STORE_DIR):
+    """
+    Loads the (state, county) partition index with per-partition bounding boxes.
+    """
+    return pd.read_parquet(os.path.join(_year_dir(census_year, store_dir), 'index.parquet'))
+
+
+@lru_cache(maxsize=None)
+def load_states(census_year, store_dir=TRACT_STORE_DIR):
+    """
+    Loads state boundaries from the store.
+    """
+    return gpd.read_parquet(os.path.join(_year_dir(census_year, store_dir), 'states.parquet'))
+
+
+def find_partitions(census_year, bbox=None, state_code=None, store_dir=TRACT_STORE_DIR):
+    """
+    Finds the store partitions intersecting a bounding box.
+
+    Parameters
+    ----------
+    census_year : str
+        The census year.
+    bbox : tuple of float, optional
+        (minx, miny, maxx, maxy) in the store's CRS (EPSG:4269). If omitted, all partitions match.
+    state_code : str, optional
+        Restrict the search to a single state.
+    store_dir : str
+        The root directory of the store.
+
+    Returns
+    -------
+    pandas.DataFrame
+        The matching rows of the partition index.
+    """
+    index = load_partition_index(str(census_year), store_dir)
+    mask = pd.Series(True, index=index.index)
+    if state_code is not None:
+        mask &= index['STATEFP'] == state_code
+    if bbox is not None:
+        minx, miny, maxx, maxy = bbox
+        mask &= (index['minx'] <= maxx) & (index['maxx'] >= minx) & (index['miny'] <= maxy) & (index['maxy'] >= miny)
+    return index[mask]
+
+
+def load_tracts(census_year, state_code=None, bbox=None, store_dir=TRACT_STORE_DIR):
+    """
+    Loads tract geometries from the store, reading only the county partitions
+    whose bounding box intersects `bbox`.
+
+    Parameters
+    ----------
+    census_year : str
+        The census year.
+    state_code : str, optional
+        Restrict loading to a single state.
+    bbox : tuple of float, optional
+        (minx, miny, maxx, maxy) in the store's CRS (EPSG:4269).
+    store_dir : str
+        The root directory of the store.
+
+    Returns
+    -------
+    geopandas.GeoDataFrame
+        The tracts of all matching partitions.
+    """
+    partitions = find_partitions(census_year, bbox, state_code, store_dir)
+    year_dir = _year_dir(census_year, store_dir)
+    if partitions.empty:
+        crs = load_partition_index(str(census_year), store_dir)['crs'].iloc[0]
+        return gpd.GeoDataFrame(columns=TRACT_COLUMNS, geometry='geometry', crs=crs)
+    tract_gdf = pd.concat([gpd.read_parquet(os.path.join(year_dir, path)) for path in partitions['path']],
+                          ignore_index=True)
+    if bbox is not None:
+        # Drop tracts of the matching counties that fall outside the bbox
+        tract_gdf = tract_gdf[shapely.intersects(tract_gdf.geometry.to_numpy(), shapely.box(*bbox))].reset_index(drop=True)
+    return tract_gdf
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ingest TIGER tract and state geometries into the local tract store.')
+    parser.add_argument('census_year', help='Census year to ingest, e.g. 2021')
+    parser.add_argument('--states', nargs='*', help='State FIPS codes to ingest (default: all states)')
+    parser.add_argument('--store-dir', default=TRACT_STORE_DIR, help='Root directory of the tract store')
+    args = parser.parse_args()
+    index = ingest_tiger(args.census_year, args.states, args.store_dir)
+    print(f"Ingested {index['n_tracts'].sum():,} tracts in {len(index):,} county partitions into {args.store_dir}")
+
+
+if __name__ == '__main__':
+    main()
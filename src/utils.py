@@ -1,21 +1,28 @@
 import streamlit as st
+import streamlit.components.v1 as components
 from streamlit_folium import folium_static
 import folium
-from geopy.geocoders import Nominatim
+from branca.element import MacroElement
+from jinja2 import Template
 import pandas as pd
-import requests
-import geopandas as gpd
 import numpy as np
-from census import Census
-from scipy import *
-import plotly.figure_factory as ff
-import osmnx as ox
+import time
 from folium.plugins import HeatMap
 from folium.raster_layers import WmsTileLayer
-from shapely.geometry import mapping, Point
-from geopy.distance import geodesic
-from folium.plugins import Fullscreen
-from requests_cache import install_cache
+from shapely.geometry import mapping
+from folium.plugins import Fullscreen, VectorGridProtobuf
+import uuid
+from src.choropleth import choropleth_geojson, decile_colors
+from src.tile_server import GeoDataFrameLayer, get_tile_server, vector_tiles_enabled
+from src.poi_clusters import cluster_pyramid, fit_zoom, poi_points, COORDINATE_DIGITS
+from src.geocoding import get_geocoder
+from src.census_catalog import DEMOGRAPHIC_PROFILES
+# Compute functions live in the streamlit-free core module; re-exported here for the app
+from src.core import (CENSUS_MAX_WORKERS, CENSUS_MAX_RETRIES, CENSUS_RETRY_BACKOFF, load_osm_tags, fetch_census_variables,
+                      load_state_boundaries, find_intersecting_states, load_tract_shapefile, download_tract_shapefile,
+                      overlay_tracts, calculate_overlapping_tracts, call_with_retries, fetch_county_tract_data,
+                      fetch_tract_values, scale_census_data, fetch_census_data_for_tracts,
+                      calculate_census_var_weighted_average, fetch_poi_within_catchment)
 
 def update_map_layer(session_state):
     # Update the tile layer based on user selection without resetting the existing overlays
@@ -29,6 +36,127 @@ def update_map_layer(session_state):
             session_state.catchment_map.fit_bounds(st.session_state.bounds)
 
 
+def tile_layer_name(tile_layer_value):
+    # Name of the selected tile layer (WMS layers are folium objects, rebuilt on every rerun)
+    return getattr(tile_layer_value, 'layer_name', tile_layer_value)
+
+# Census layers with more tracts than this are served as vector tiles when vector tiles are enabled
+VECTOR_TILE_MIN_FEATURES = 2000
+CENSUS_TILE_STYLE = '{"fill": true, "fillColor": properties.fill_color, "fillOpacity": 0.7, "color": "black", "weight": 0.1}'
+# POI marker layers larger than this are drawn as server-side clusters
+POI_CLUSTER_MIN_POINTS = 500
+# Census variable search: the initial query and the number of matching variable groups offered
+DEFAULT_CENSUS_SEARCH = 'median household income'
+CENSUS_SEARCH_MAX_GROUPS = 50
+
+def tile_session(session_state):
+    # Session-specific prefix of the tilesets registered with the local tile server
+    if 'tile_session' not in session_state:
+        session_state.tile_session = uuid.uuid4().hex
+    return session_state.tile_session
+
+def vector_tile_options(layer_name, style, interactive=False):
+    """
+    Returns VectorGrid options styling a vector tile layer with a JavaScript style expression of `properties`.
+    """
+    return ('{"maxNativeZoom": 18, "interactive": %s, "vectorTileLayerStyles": {"%s": function(properties, zoom) {return %s;}}}'
+            % ('true' if interactive else 'false', layer_name, style))
+
+class VectorTileTooltip(MacroElement):
+    """
+    Sticky tooltip of an interactive vector tile layer, showing one feature property under an alias
+    (like the GeoJsonTooltip of embedded layers).
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var layer = {{ this._parent.get_name() }};
+            layer.bindTooltip('', {sticky: true});
+            layer.on('mouseover', function(e) {
+                var value = e.layer.properties[{{ this.field|tojson }}];
+                if (value === undefined) { return; }
+                var content = document.createElement('div');
+                var alias = document.createElement('b');
+                alias.textContent = {{ this.alias|tojson }} + ' ';
+                content.appendChild(alias);
+                content.appendChild(document.createTextNode(typeof value === 'number' ? value.toLocaleString() : value));
+                layer.setTooltipContent(content);
+                layer.openTooltip(e.latlng);
+            });
+            layer.on('mouseout', function() { layer.closeTooltip(); });
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, field, alias):
+        super().__init__()
+        self._name = 'VectorTileTooltip'
+        self.field = field
+        self.alias = alias
+
+class ClusteredPoiLayer(MacroElement):
+    """
+    Map layer of server-side POI clusters: one compact array of clusters per zoom level and one
+    [lat, lon, name] array of points, redrawn on zoom; points are shown individually above the last
+    clustered zoom level.
+    """
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            var map = {{ this._parent.get_name() }};
+            var data = {{ this.data|tojson }};
+            var layer = L.layerGroup().addTo(map);
+            function point(lat, lon, name) {
+                return L.circleMarker([lat, lon], {radius: 5, color: 'white', weight: 1, fillColor: '#3388ff', fillOpacity: 0.9})
+                    .bindTooltip(name);
+            }
+            function draw() {
+                layer.clearLayers();
+                var zoom = Math.round(map.getZoom());
+                if (zoom > data.max_zoom) {
+                    data.points.forEach(function(p) { point(p[0], p[1], data.names[p[2]]).addTo(layer); });
+                    return;
+                }
+                data.clusters[Math.max(zoom, data.min_zoom)].forEach(function(c) {
+                    if (typeof c === 'number') {
+                        var p = data.points[c];
+                        point(p[0], p[1], data.names[p[2]]).addTo(layer);
+                        return;
+                    }
+                    var size = 24 + 6 * Math.min(Math.floor(Math.log10(c[2])), 4);
+                    L.marker([c[0], c[1]], {icon: L.divIcon({className: '', iconSize: [size, size], html:
+                        '<div style="width:' + size + 'px;height:' + size + 'px;line-height:' + size + 'px;border-radius:50%;' +
+                        'background:rgba(51,136,255,0.85);color:white;text-align:center;font:bold 11px sans-serif">' + c[2] + '</div>'})})
+                        .bindTooltip(c[2] + ' locations').addTo(layer);
+                });
+            }
+            map.on('zoomend', draw);
+            draw();
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self, lon, lat, names, min_zoom):
+        super().__init__()
+        self._name = 'ClusteredPoiLayer'
+        name_codes, name_values = pd.factorize(pd.Series(names).fillna(''))
+        pyramid = cluster_pyramid(lon, lat, min_zoom)
+        points = zip(np.round(lat, COORDINATE_DIGITS).tolist(), np.round(lon, COORDINATE_DIGITS).tolist(), name_codes.tolist())
+        self.data = {'min_zoom': min_zoom, 'max_zoom': pyramid['max_zoom'], 'clusters': pyramid['clusters'],
+                     'points': [list(p) for p in points], 'names': list(name_values)}
+
+def map_html(m):
+    """
+    Renders a folium map to the HTML embedded by `folium_static`, so it can be memoized and shown in several tabs.
+    """
+    return folium.Figure().add_child(m).render()
+
+def show_map_html(html, width=700, height=500):
+    """
+    Displays a map rendered with `map_html`, sized like `folium_static`.
+    """
+    components.html(html, height=height + 10, width=width)
+
 def map_tile_layer_selections():
     tile_layer_dict = {"OpenStreetMap":"OpenStreetMap",
                        "CartoDB Positron":"CartoDB Positron", 
@@ -86,29 +214,80 @@ def make_catchment_area_selections(default_address):
     return address, radius_type, travel_profile, radius
 
 @st.experimental_fragment
-def make_census_variable_selections(filters_dict):
+def make_census_variable_selections(catalog):
     """
-    Display widgets to select demographic variables for data enrichment.
+    Display widgets to search and select demographic variables for data enrichment. Searches run
+    server-side, so only the matching variable groups are sent to the browser.
 
     Parameters
     ----------
-    filters_dict : dict
-        A dictionary with demographic variable groups as keys and lists of variable names as values.
+    catalog : src.census_catalog.CensusCatalog
+        The searchable catalog of Census variables.
 
     Returns
     -------
     tuple
         A tuple containing the selected variable group as a string, the selected variable name as a string,
-        and the normalization preference as a string.
-    """
-    var_group = st.selectbox('Choose Census Variable Group', options=(v for v in filters_dict.keys()),index=445)
-    var_name = st.selectbox('Choose Census Variable Name', options=filters_dict[var_group])
+        and the normalization preference as a string. The group and name are None if nothing matches the search.
+    """
+    query = st.text_input('Search Census Variables', value=DEFAULT_CENSUS_SEARCH,
+                          help='Words or word beginnings of a variable group or name, or an ACS table or variable code (e.g. B19013)')
+    var_groups = catalog.search_groups(query, limit=CENSUS_SEARCH_MAX_GROUPS)
+    if not var_groups:
+        st.info('No Census variables match your search.')
+        return None, None, "No"
+    var_group = st.selectbox('Choose Census Variable Group', options=var_groups)
+    var_name = st.selectbox('Choose Census Variable Name', options=catalog.variable_names(var_group))
     if var_name.startswith('Total') or var_name.startswith('Aggregate'):
         normalization = st.radio("Normalize by Population?",["No", "Yes"],index=0)
     else:
         normalization = "No"
     return var_group, var_name, normalization
 
+def make_demographic_profile_selections():
+    """
+    Display widgets to choose a multi-variable demographic profile: a predefined profile or a full ACS table.
+
+    Returns
+    -------
+    str
+        The predefined profile name or the ACS table ID.
+    """
+    profile = st.selectbox('Choose Demographic Profile', list(DEMOGRAPHIC_PROFILES) + ['Full ACS table'])
+    if profile == 'Full ACS table':
+        profile = st.text_input('ACS table ID', value='B19001', help='e.g. B19001 (household income brackets)')
+    return profile
+
+def profile_summary_table(summary, catalog):
+    """
+    Labels a demographic profile summary with variable groups and names, keeping the catchment
+    total of count variables and the population-weighted average of other metrics.
+
+    Parameters
+    ----------
+    summary : pandas.DataFrame
+        The profile summary (see CatchmentArea.demographic_profile).
+    catalog : src.census_catalog.CensusCatalog
+        The catalog of Census variables.
+
+    Returns
+    -------
+    pandas.DataFrame
+        One row per variable with 'Variable Group', 'Variable Name' and 'Catchment value' columns.
+    """
+    labels = catalog.variables.set_index('variable').reindex(summary.index)[['Variable Group', 'Variable Name']]
+    values = summary['total'].where(summary['variable_type'] == 'population_count', summary['average'])
+    return labels.assign(**{'Catchment value': values.round(2)})
+
+def total_population_caption(catchment_area):
+    """
+    Returns the caption of a catchment's estimated population, with the error bound of a population surface estimate.
+    """
+    caption = 'Estimated catchment population: ' + '{:,}'.format(int(catchment_area.total_population))
+    if catchment_area.population_error_bound:
+        caption += ' (±{:,})'.format(int(np.ceil(catchment_area.population_error_bound)))
+    return caption
+
 @st.experimental_fragment
 def make_poi_selections(osm_tags):
     """
@@ -126,12 +305,12 @@ def make_poi_selections(osm_tags):
     """
     poi_group = st.selectbox('Select POI group',list(osm_tags.keys()))
     poi_categories = st.multiselect('Select POI categories',osm_tags[poi_group])
-    poi_map_type = st.radio('Choose map type', ['POI markers','Heatmap (POI density)'])
+    poi_map_type = st.radio('Choose map type', ['POI markers','POI clusters','Heatmap (POI density)'])
     return {poi_group: poi_categories}, poi_map_type
 
 def geocode_address(address, nominatim_client):
     """
-    Geocodes an address to a latitude and longitude using caching.
+    Geocodes an address to a latitude and longitude through the cached, rate-limited geocoder.
     
     Parameters
     ----------
@@ -145,12 +324,8 @@ def geocode_address(address, nominatim_client):
     geopy.location.Location or None
         The location object for the address or None if geocoding fails.
     """
-    # Set up cache with requests_cache
-    install_cache('nominatim_cache', backend='sqlite', expire_after=86400)  # Cache expires after 86400 seconds (one day)
-    
-    geolocator = Nominatim(user_agent=nominatim_client)
     try:
-        return geolocator.geocode(address, timeout=5)
+        return get_geocoder(nominatim_client).geocode(address)
     except Exception as e:
         st.error(f"Error geocoding address: {str(e)}")
         return None
@@ -176,209 +351,6 @@ def plot_catchment_area(session_state):
     st.session_state.bounds = polygon.get_bounds()
     st.session_state.catchment_map.fit_bounds(st.session_state.bounds)
 
-@st.cache_data    
-def fetch_census_variables(api_url):
-    """
-    Fetches census variables from the U.S. Census API with caching.
-    
-    Parameters
-    ----------
-    api_url : str
-        The base URL for the Census API endpoint.
-    
-    Returns
-    -------
-    pandas.DataFrame or None
-        A DataFrame containing the census variables and metadata, or None if the fetch fails.
-    """
-    # Install a cache named 'census_var_api_cache', stored as a SQLite DB, which lasts for one day (86400 seconds)
-    install_cache('census_var_api_cache', backend='sqlite', expire_after=86400)
-
-    variables_url = f"{api_url}/variables.json"
-    try:
-        response = requests.get(variables_url)
-        response.raise_for_status()  # Raise an exception for HTTP errors
-        variables_dict = response.json()
-        variables_df = pd.concat({k: pd.DataFrame(v).T for k, v in variables_dict.items()}, axis=0)
-        variables_df = variables_df[variables_df['label'].str.contains('Estimate')].reset_index()
-        variables_df.rename(columns={'level_1':'variable','concept':'Variable Group','label':'Variable Name'}, inplace=True)
-        variables_df['Variable Name'] = variables_df['Variable Name'].str.replace('Estimate!!', '').str.replace('!!', ' ')
-        variables_df['Variable Group'] = variables_df['Variable Group'].str.replace(" (IN 2021 INFLATION-ADJUSTED DOLLARS)","")
-        variables_df['Variable Name'] = variables_df['Variable Name'].str.replace(" (in 2021 inflation-adjusted dollars)","")
-
-        # Determine variable type based on the 'Variable Name'
-        variables_df['variable_type'] = variables_df['Variable Name'].apply(
-            lambda x: 'population_count' if x.startswith('Total:') else 'other_metric'
-        )
-
-        return variables_df
-    except requests.RequestException as e:
-        st.error(f"Failed to fetch variables.json: {e}")
-        return None
-
-@st.cache_data 
-def load_state_boundaries(census_year):
-    """
-    Loads state boundaries using the US Census Bureau's cartographic boundary files for a given year.
-    
-    Parameters
-    ----------
-    census_year : str
-        The census year for which to load state boundaries.
-    
-    Returns
-    -------
-    geopandas.GeoDataFrame
-        A GeoDataFrame containing the state boundaries.
-    """
-    url = "https://www2.census.gov/geo/tiger/GENZ{0}/shp/cb_{0}_us_state_20m.zip".format(census_year)
-    gdf = gpd.read_file(url)
-    return gdf
-
-def find_intersecting_states(user_gdf, states_gdf):
-    """
-    Identifies states that intersect with a user-defined geography.
-    
-    Parameters
-    ----------
-    user_gdf : geopandas.GeoDataFrame
-        The user-defined geography.
-    states_gdf : geopandas.GeoDataFrame
-        The GeoDataFrame containing state boundaries.
-    
-    Returns
-    -------
-    pandas.Series
-        The GEOID of states that intersect with the user-defined geography.
-    """
-    intersecting_states = states_gdf[states_gdf.intersects(user_gdf.unary_union)]
-    return intersecting_states['GEOID']
-
-@st.cache_data 
-def load_tract_shapefile(state_code, census_year):
-    """
-    Loads a census tract shapefile from the Census website for a given state code and year.
-    
-    Parameters
-    ----------
-    state_code : str
-        The state code for which to load the census tract shapefile.
-    census_year : str
-        The year of the census.
-    
-    Returns
-    -------
-    geopandas.GeoDataFrame
-        A GeoDataFrame containing the census tract shapefile data.
-    """
-    url = f"https://www2.census.gov/geo/tiger/TIGER{census_year}/TRACT/tl_{census_year}_{state_code}_tract.zip"
-    gdf = gpd.read_file(url)
-    return gdf
-
-def calculate_overlapping_tracts(user_gdf, state_codes, census_year):
-    """
-    Calculates which tracts overlap with the user-defined geography for intersecting states
-    and updates tract geometries to the intersection with the user-defined geography.
-    Additionally, calculates the percentage of each tract area that is contained within the catchment.
-
-    Parameters
-    ----------
-    user_gdf : geopandas.GeoDataFrame
-        The user-defined geography.
-    state_codes : list of str
-        The state codes of the intersecting states.
-    census_year : str
-        The year of the census data.
-
-    Returns
-    -------
-    geopandas.GeoDataFrame
-        A GeoDataFrame of overlapping tracts with updated geometries to the intersection areas
-        and a new column indicating the percentage of the original tract covered by the intersection.
-    """
-    overlapping_tracts = gpd.GeoDataFrame()
-    for state_code in state_codes:
-        tract_gdf = load_tract_shapefile(state_code, census_year)
-
-        # Calculate the intersection of each tract with the user-defined geography
-        tract_gdf['intersection'] = tract_gdf.geometry.apply(lambda x: x.intersection(user_gdf.unary_union))
-
-        # Calculate the percentage of the tract area contained within the catchment
-        tract_gdf['coverage_percentage'] = tract_gdf.apply(lambda row: (row['intersection'].area / row['geometry'].area), axis=1)
-        
-        # Update the geometry to the intersection
-        tract_gdf['geometry'] = tract_gdf['intersection']
-        
-        # Keep only tracts that have a non-empty intersection and at least some land area
-        tract_gdf = tract_gdf[(~tract_gdf.geometry.is_empty) & (tract_gdf['ALAND']>0)]
-        
-        # Drop the temporary 'intersection' column as it's no longer needed
-        tract_gdf = tract_gdf.drop(columns=['intersection'])
-
-        overlapping_tracts = pd.concat([overlapping_tracts, tract_gdf], ignore_index=True)
-
-    return overlapping_tracts
-
-
-def fetch_census_data_for_tracts(census_api, census_year, variable_dict, overlapping_tracts, normalization):
-    """
-    Fetches census data for tracts within overlapping tracts dataframe, scaling data for 'population_count' variables 
-    by the 'coverage_percentage', with API request caching.
-    
-    Parameters
-    ----------
-    census_api : census.Census
-        The Census API client.
-    census_year : str
-        The year of the census.
-    variable_dict : dictionary
-        A dictionary containing the variable codes and associated variable types.
-    overlapping_tracts : geopandas.GeoDataFrame
-        The GeoDataFrame of overlapping tracts.
-    normalization : str
-        Indicates if the data should be normalized.
-    
-    Returns
-    -------
-    pandas.DataFrame
-        A DataFrame containing the fetched census data.
-    """
-    # Enable caching for API requests; cache will last for one day (86400 seconds)
-    install_cache('census_api_cache', backend='sqlite', expire_after=86400)
-
-    census_data_full = pd.DataFrame()
-
-    # Group the overlapping tracts by state and county for batch fetching
-    for (state_code, county_code), group in overlapping_tracts.groupby(['STATEFP', 'COUNTYFP']):
-
-        # Fetch census data for all tracts within this state and county
-        fetch_vars = list(variable_dict.keys())+['B01003_001E'] # add population variable to be used for normalization and weighted avg. calcs
-
-        census_json = census_api.acs5.state_county_tract(fetch_vars, state_code, county_code, Census.ALL, year=census_year)
-        # Convert the fetched data into a DataFrame
-        census_data = pd.DataFrame(census_json)
-        
-        # Convert GEOID to a format that matches the overlapping_tracts for comparison
-        census_data['GEOID'] = census_data.apply(lambda row: f"{row['state']}{row['county']}{row['tract']}", axis=1)
-        
-        # Filter the data to only include those tracts that are in the overlapping_tracts DataFrame
-        census_data = census_data.merge(overlapping_tracts[['GEOID', 'coverage_percentage']], on='GEOID', how='inner')
-
-        # scale total population by 'coverage_percentage'
-        census_data['B01003_001E'] = census_data['B01003_001E'] * census_data['coverage_percentage']
-
-        # Scale the data for variables of type 'population_count' by 'coverage_percentage'
-        for var, vtype in variable_dict.items():
-            if vtype == 'population_count':
-                census_data[var] = census_data[var] * census_data['coverage_percentage']
-            if normalization == 'Yes':
-                census_data['population_normalized'] = census_data[var] / census_data['B01003_001E']
-
-        # Append the filtered data to the all_census_data DataFrame
-        census_data_full = pd.concat([census_data_full, census_data], ignore_index=True)
-
-    return census_data_full
-
 def plot_census_data_on_map(session_state, census_variable, var_name, var_group, normalization):
     """
     Plots census data on a map, coloring tracts by a specified census variable.
@@ -431,50 +403,39 @@ def plot_census_data_on_map(session_state, census_variable, var_name, var_group,
         else:
             merged_data['tooltip_value'] = merged_data[plot_var]
 
-    geojson_data = merged_data.to_json()
-
-    folium.GeoJson(
-        geojson_data,
-        style_function=lambda feature: {
-            'fillColor': get_color(feature['properties'][plot_var], deciles),
-            'color': 'black',
-            'weight': 0.1,
-            'fillOpacity': 0.7,
-        },
-        tooltip=folium.GeoJsonTooltip(fields=['tooltip_value'],
-                                      aliases=[alias],
-                                      localize=True)
-    ).add_to(m)
+    start = time.perf_counter()
+    if len(merged_data) > VECTOR_TILE_MIN_FEATURES and vector_tiles_enabled():
+        # Large layers are streamed as vector tiles from the tile server instead of embedded
+        merged_data['fill_color'] = decile_colors(merged_data[plot_var], deciles)
+        layer = GeoDataFrameLayer(merged_data, ['GEOID', 'fill_color', 'tooltip_value'])
+        url = get_tile_server().register(f'{tile_session(session_state)}-census', {'census': layer})
+        vector_layer = VectorGridProtobuf(url, 'Census data', vector_tile_options('census', CENSUS_TILE_STYLE, interactive=True))
+        VectorTileTooltip('tooltip_value', alias).add_to(vector_layer)
+        vector_layer.add_to(m)
+    else:
+        # Simplified, quantized geometries with precomputed decile colors and only the tooltip property
+        geojson_data = choropleth_geojson(merged_data, plot_var, deciles, ['tooltip_value'],
+                                          session_state.catchment_area.geometry.bounds)
+
+        folium.GeoJson(
+            geojson_data,
+            style_function=lambda feature: {
+                'fillColor': feature['properties']['fill_color'],
+                'color': 'black',
+                'weight': 0.1,
+                'fillOpacity': 0.7,
+            },
+            tooltip=folium.GeoJsonTooltip(fields=['tooltip_value'],
+                                          aliases=[alias],
+                                          localize=True)
+        ).add_to(m)
     m.fit_bounds(session_state.bounds)
-    folium_static(m)
+    html = map_html(m)
+    render_seconds = time.perf_counter() - start
+    show_map_html(html)
+    st.caption(f'Map payload: {len(html.encode()) / 1e6:,.2f} MB ({len(merged_data):,} tracts), rendered in {render_seconds:.2f}s')
 
     
-def get_color(value, deciles):
-    """
-    Determines the color for a value based on which decile it falls into.
-    
-    Parameters
-    ----------
-    value : float
-       The value to be colored.
-    deciles : list of float
-        The decile thresholds for coloring.
-    
-    Returns
-    -------
-    str
-        The color code for the given value based on its decile.
-    """
-    colors = ['#ffffcc', '#ffeda0', '#fed976', '#feb24c', '#fd8d3c',
-              '#fc4e2a', '#e31a1c', '#bd0026', '#800026', '#66001a']
-    
-    if value is None:
-        return '#999999'  # Default color for missing values
-    for i, threshold in enumerate(deciles):
-        if value <= threshold:
-            return colors[i]
-    return colors[-1]  # Use the last color for values in the highest decile
-
 def create_distribution_plot(census_data, variables, var_name, normalization):
     """
     Creates a distribution plot for a specified census variable.
@@ -495,6 +456,9 @@ def create_distribution_plot(census_data, variables, var_name, normalization):
     plotly.graph_objs.Figure
         The figure object containing the distribution plot.
     """
+    # plotly is only imported once a plot is drawn
+    import plotly.figure_factory as ff
+
     # Create distplot with custom bin_size
     if normalization == 'Yes':
         dist_data = census_data[census_data[variables[0]]>0]['population_normalized']
@@ -512,94 +476,6 @@ def create_distribution_plot(census_data, variables, var_name, normalization):
     )
     return fig
 
-def calculate_census_var_weighted_average(census_data, acs_variables):
-    """
-    Calculate the weighted average of specified census variables across all tracts, weighted by population.
-    
-    Parameters
-    ----------
-    census_data : pandas.DataFrame
-        A DataFrame containing fetched census data, which includes census variables and population counts.
-    acs_variables : list
-        List of census variable codes (column names) for which to calculate the weighted averages.
-        
-    Returns
-    -------
-    dict
-        A dictionary containing the weighted averages for each specified census variable.
-    """
-    # Initialize a dictionary to store the weighted averages
-    weighted_averages = {}
-
-    # Calculate the total population for weighting purposes
-    total_population = census_data['B01003_001E'].sum()
-    census_data = census_data[census_data[acs_variables[0]] > 0] # remove any negative value catchment areas
-
-    # Calculate the weighted average for each specified variable
-    for var in acs_variables:
-        if var not in census_data.columns:
-            weighted_averages[var] = None
-            continue  # Skip if the variable is not in the DataFrame
-
-        # Calculate the weighted sum for the variable
-        census_data['weighted_value'] = census_data[var] * census_data['B01003_001E']
-        weighted_sum = census_data['weighted_value'].sum()
-        
-        # Calculate the weighted average for the variable
-        if total_population > 0:  # Avoid division by zero
-            weighted_averages[var] = weighted_sum / total_population
-        else:
-            weighted_averages[var] = None
-
-    return weighted_averages
-
-def fetch_poi_within_catchment(catchment_polygon, location, poi_tags):
-    """
-    Fetch points of interest within a specified catchment area polygon and category,
-    with API request caching, and compute the distance from a given location in miles.
-
-    Parameters
-    ----------
-    catchment_polygon: 
-        A Shapely Polygon defining the catchment area.
-    location: 
-        A geopy Location object containing location coordinates.
-    poi_tags: 
-        A dictionary representing the OSM group and categories of interest (e.g., {'amenity':['cafe', 'restaurant']}).
-
-    Returns:
-    -------
-    GeoDataFrame
-        GeoDataFrame containing the fetched POI data with an additional 'distance' column in miles.
-    """
-    # Enable caching for API requests; cache will last for two days (172800 seconds)
-    install_cache('osm_poi_cache', backend='sqlite', expire_after=172800)
-
-    try:
-        # Define the tags for OSM queries based on the specified category
-        key = list(poi_tags.keys())[0]
-        tags = {key: poi_tags[key]}
-        
-        # Attempt to fetch POIs within the catchment area polygon
-        pois_gdf = ox.features_from_polygon(catchment_polygon, tags=tags)
-        pois_gdf.dropna(subset=["name"], inplace=True)
-        
-        # Check if the returned GeoDataFrame is empty
-        if pois_gdf.empty:
-            st.error("No data returned for the specified category within the catchment area.")
-            return gpd.GeoDataFrame()  # Return an empty GeoDataFrame
-        
-        # Calculate the distance from the provided location to each POI in miles and append it as a new column
-        location_point = Point(location.longitude, location.latitude)
-        pois_gdf['distance'] = pois_gdf['geometry'].apply(
-            lambda x: geodesic((x.centroid.y, x.centroid.x), (location_point.y, location_point.x)).miles
-        )
-
-        return pois_gdf
-    except Exception as e:
-        st.error(f"An error occurred while fetching POIs: {e}")
-        return gpd.GeoDataFrame(columns = [key, 'name'])
-    
 def plot_poi_data_on_map(session_state, map_type):
     """
     Plots POI data on a map with interactive layer controls for selecting POI names,
@@ -632,31 +508,29 @@ def plot_poi_data_on_map(session_state, map_type):
     folium.Marker([session_state.catchment_area.geometry.centroid.y, session_state.catchment_area.geometry.centroid.x],
                   popup='Catchment Location', icon=folium.Icon(color='red', prefix='fa', icon='map-pin'), tooltip=session_state.catchment_area.address).add_to(m)
 
-    # Group POI data by name
-    grouped_poi_data = session_state.catchment_area.poi_data.groupby('name')
+    poi_data = session_state.catchment_area.poi_data
+    # POI centroids, computed once in one vectorized pass
+    poi_lon, poi_lat = poi_points(poi_data)
 
     if map_type == 'Heatmap (POI density)':
-        heatmap_points = []
-
-    # Add each POI name group as a separate layer
-    for poi_name, group in grouped_poi_data:
-        layer_group = folium.FeatureGroup(name=poi_name)
-
-        for _, poi in group.iterrows():
-            poi_location = [poi.geometry.centroid.y, poi.geometry.centroid.x]
-            if map_type == 'POI markers':
-                folium.Marker(location=poi_location,
-                              popup=f"{poi_name} - {', '.join(filter(None, [str(poi.get(field, '')) for field in ['addr:housenumber', 'addr:street', 'addr:city', 'addr:state', 'addr:postcode']]))}",
+        HeatMap(np.column_stack([poi_lat, poi_lon]).tolist(), name="Heatmap").add_to(m)
+    elif map_type == 'POI clusters' or len(poi_data) > POI_CLUSTER_MIN_POINTS:
+        # Clusters computed server-side for each zoom level and emitted as compact arrays
+        ClusteredPoiLayer(poi_lon, poi_lat, poi_data['name'], fit_zoom(session_state.catchment_area.geometry.bounds)).add_to(m)
+    else:
+        address_fields = [field for field in ['addr:housenumber', 'addr:street', 'addr:city', 'addr:state', 'addr:postcode'] if field in poi_data.columns]
+        addresses = poi_data[address_fields].apply(lambda poi: ', '.join(str(value) for value in poi if pd.notna(value) and value != ''), axis=1) \
+            if address_fields else pd.Series('', index=poi_data.index)
+
+        # Add each POI name group as a separate layer
+        for poi_name, idx in poi_data.groupby('name').indices.items():
+            layer_group = folium.FeatureGroup(name=poi_name)
+            for i in idx:
+                folium.Marker(location=[poi_lat[i], poi_lon[i]],
+                              popup=f"{poi_name} - {addresses.iloc[i]}",
                               tooltip=poi_name).add_to(layer_group)
-            elif map_type == 'Heatmap (POI density)':
-                heatmap_points.append(poi_location)
-
-        if map_type == 'POI markers':
             layer_group.add_to(m)
 
-    if map_type == 'Heatmap (POI density)':
-        HeatMap(heatmap_points, name="Heatmap").add_to(m)
-    else:
         # Ensure LayerControl is added after all layers have been added to the map
         folium.LayerControl().add_to(m)
 
@@ -686,8 +560,6 @@ def display_poi_counts(poi_tags, catchment_area):
     else:
         st.write("No POI data available.")
 
-import plotly.express as px
-
 @st.experimental_fragment
 def plot_poi_bar_chart(catchment_area):
     """
@@ -701,6 +573,8 @@ def plot_poi_bar_chart(catchment_area):
     - fig (plotly.graph_objects.Figure): The Plotly figure object that can be displayed with fig.show().
     """
 
+    import plotly.express as px
+
     metric_type = st.selectbox('Select Metric',['Location count','Locations per capita','Distance to catchment location'], index=1)
     pois_gdf = catchment_area.poi_data
 
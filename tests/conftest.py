@@ -0,0 +1,129 @@
+"""
+Shared fixtures: a synthetic local tract store and stand-in Census API and POI clients,
+so catchment enrichment runs offline.
+"""
+import os
+import tempfile
+import zlib
+
+# The stores resolve their locations at import time, so they are pointed at the fixtures before src is imported
+TRACT_STORE_DIR = tempfile.mkdtemp(prefix='catchment-tract-store-')
+os.environ['CATCHMENT_TRACT_STORE'] = TRACT_STORE_DIR
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import pytest
+import shapely
+from geopy.location import Location
+
+from src import tract_store
+from src.overlap_cache import overlap_cache
+
+CENSUS_YEAR = '2021'
+# Synthetic tracts: a 20 x 20 grid of 0.05 degree squares in two counties, centred on Fresno
+CENTER_LON, CENTER_LAT = -119.4, 36.8
+GRID_CELLS = 20
+CELL_DEGREES = 0.05
+
+
+def make_tracts():
+    xs = CENTER_LON + (np.arange(GRID_CELLS) - GRID_CELLS / 2) * CELL_DEGREES
+    ys = CENTER_LAT + (np.arange(GRID_CELLS) - GRID_CELLS / 2) * CELL_DEGREES
+    x0, y0 = [a.ravel() for a in np.meshgrid(xs, ys)]
+    county = np.where(x0 < CENTER_LON, '019', '039')
+    tract = [f'{i:06d}' for i in range(len(x0))]
+    return gpd.GeoDataFrame({'GEOID': ['06' + c + t for c, t in zip(county, tract)], 'STATEFP': '06',
+                             'COUNTYFP': county, 'TRACTCE': tract, 'ALAND': 1000},
+                            geometry=shapely.box(x0, y0, x0 + CELL_DEGREES, y0 + CELL_DEGREES), crs='EPSG:4269')
+
+
+def write_tract_store(tracts, census_year=CENSUS_YEAR, store_dir=TRACT_STORE_DIR):
+    """
+    Writes tracts (and their state's outline) to a tract store laid out like `src.tract_store.ingest_tiger`.
+    """
+    year_dir = os.path.join(store_dir, census_year)
+    partitions = []
+    for (state_code, county_code), county_gdf in tracts.groupby(['STATEFP', 'COUNTYFP']):
+        path = os.path.join('tracts', state_code, f'{county_code}.parquet')
+        os.makedirs(os.path.join(year_dir, 'tracts', state_code), exist_ok=True)
+        county_gdf.reset_index(drop=True).to_parquet(os.path.join(year_dir, path))
+        minx, miny, maxx, maxy = county_gdf.total_bounds
+        partitions.append({'STATEFP': state_code, 'COUNTYFP': county_code, 'path': path, 'minx': minx, 'miny': miny,
+                           'maxx': maxx, 'maxy': maxy, 'n_tracts': len(county_gdf), 'crs': county_gdf.crs.to_string()})
+    states = tracts.dissolve('STATEFP').reset_index()
+    gpd.GeoDataFrame({'GEOID': states['STATEFP'], 'STUSPS': 'CA', 'NAME': 'California'},
+                     geometry=states.geometry, crs=tracts.crs).to_parquet(os.path.join(year_dir, 'states.parquet'))
+    pd.DataFrame(partitions).to_parquet(os.path.join(year_dir, 'index.parquet'))
+    tract_store.load_partition_index.cache_clear()
+    tract_store.load_states.cache_clear()
+
+
+def tract_value(geoid, variable):
+    # Deterministic stand-in ACS value of a tract
+    return float(zlib.crc32((geoid + variable).encode()) % 5000 + 100)
+
+
+class StandInACS:
+    def __init__(self, tracts):
+        self.tracts = tracts
+        self.calls = []
+
+    def state_county_tract(self, fields, state_fips, county_fips, tract, year=None):
+        rows = self.tracts[(self.tracts['STATEFP'] == state_fips) & self.tracts['COUNTYFP'].isin(county_fips.split(','))]
+        self.calls.append((tuple(fields), state_fips, county_fips))
+        return [{'state': geoid[:2], 'county': geoid[2:5], 'tract': geoid[5:], **{field: tract_value(geoid, field) for field in fields}}
+                for geoid in rows['GEOID']]
+
+
+class StandInCensus:
+    """
+    Census API client answering `acs5.state_county_tract` from the synthetic tracts.
+    """
+    def __init__(self, tracts):
+        self.acs5 = StandInACS(tracts)
+
+
+class StandInPOIBackend:
+    """
+    POI backend with `features_from_polygon`, answering from a fixed set of points.
+    """
+    def __init__(self, pois):
+        self.pois = pois
+        self.queries = 0
+
+    def features_from_polygon(self, polygon, tags):
+        self.queries += 1
+        key, values = next(iter(tags.items()))
+        pois = self.pois[shapely.intersects(polygon, self.pois.geometry.to_numpy())]
+        return pois if values is True else pois[pois[key].isin([values] if isinstance(values, str) else values)].copy()
+
+
+@pytest.fixture(scope='session')
+def tracts():
+    tracts = make_tracts()
+    write_tract_store(tracts)
+    return tracts
+
+
+@pytest.fixture
+def census_api(tracts):
+    overlap_cache.clear()
+    return StandInCensus(tracts)
+
+
+@pytest.fixture
+def poi_backend():
+    rng = np.random.default_rng(0)
+    n = 2000
+    pois = gpd.GeoDataFrame({'element': 'node', 'id': np.arange(n), 'name': [f'POI {i}' for i in range(n)],
+                             'amenity': rng.choice(['cafe', 'restaurant', 'bank'], n)},
+                            geometry=gpd.points_from_xy(rng.uniform(CENTER_LON - 0.5, CENTER_LON + 0.5, n),
+                                                        rng.uniform(CENTER_LAT - 0.5, CENTER_LAT + 0.5, n)),
+                            crs='EPSG:4326').set_index(['element', 'id'])
+    return StandInPOIBackend(pois)
+
+
+@pytest.fixture
+def location():
+    return Location('Fresno, CA', (CENTER_LAT, CENTER_LON), {})
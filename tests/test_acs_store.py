@@ -0,0 +1,83 @@
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.acs_store import ACSStore
+from src.core import fetch_tract_values
+from tests.conftest import CENSUS_YEAR, tract_value
+
+
+@pytest.fixture
+def acs_store(tmp_path, tracts):
+    # B01003 holds every tract but those of county 039, B19013 every tract but only its first variable
+    year_dir = tmp_path / CENSUS_YEAR
+    year_dir.mkdir()
+    geoids = tracts['GEOID']
+    for table, table_geoids, variables in [('B01003', geoids[tracts['COUNTYFP'] == '019'], ['B01003_001E']),
+                                           ('B19013', geoids, ['B19013_001E'])]:
+        table_data = pd.DataFrame({'GEOID': table_geoids})
+        for variable in variables:
+            table_data[variable] = [tract_value(geoid, variable) for geoid in table_geoids]
+        table_data.sort_values('GEOID').to_parquet(year_dir / f'{table}.parquet', index=False)
+    return ACSStore(CENSUS_YEAR, store_dir=str(tmp_path))
+
+
+def test_lookup_serves_stored_tables(acs_store, tracts):
+    geoids = tracts['GEOID'].iloc[:5]
+    store_data, missing = acs_store.lookup(['B01003_001E', 'B19013_001E'], geoids)
+    assert missing == []
+    assert sorted(store_data['GEOID']) == sorted(geoids)
+    assert store_data['B19013_001E'].tolist() == [tract_value(geoid, 'B19013_001E') for geoid in store_data['GEOID']]
+    assert (store_data['state'] + store_data['county'] + store_data['tract']).tolist() == store_data['GEOID'].tolist()
+
+
+def test_lookup_leaves_only_missing_variables_and_tracts(acs_store, tracts):
+    geoids = tracts['GEOID']
+    east = sorted(geoids[tracts['COUNTYFP'] == '039'])
+    store_data, missing = acs_store.lookup(['B01003_001E', 'B19013_001E', 'B19013_002E', 'B25077_001E'], geoids)
+    # Every tract is served B19013_001E, and the tracts of county 019 B01003_001E
+    assert len(store_data) == len(geoids)
+    assert store_data['B19013_001E'].notna().all()
+    assert store_data.set_index('GEOID').loc[east, 'B01003_001E'].isna().all()
+    missing = {tuple(variables): sorted(missing_geoids) for variables, missing_geoids in missing}
+    assert missing == {('B01003_001E',): east, ('B19013_002E', 'B25077_001E'): sorted(geoids)}
+
+
+def test_lookup_of_absent_tables_misses_everything(acs_store, tracts):
+    store_data, missing = acs_store.lookup(['B25077_001E'], tracts['GEOID'])
+    assert store_data.empty
+    assert [(variables, sorted(geoids)) for variables, geoids in missing] == [(['B25077_001E'], sorted(tracts['GEOID']))]
+
+
+def test_fetch_tract_values_requests_only_what_the_store_misses(acs_store, census_api, tracts):
+    variables = ['B01003_001E', 'B19013_001E', 'B25077_001E']
+    values = fetch_tract_values(census_api, CENSUS_YEAR, variables, tracts, backend=acs_store)
+    assert list(values.columns) == ['state', 'county', 'tract', 'GEOID'] + variables
+    assert sorted(values['GEOID']) == sorted(tracts['GEOID'])
+    expected = np.array([[tract_value(geoid, variable) for variable in variables] for geoid in values['GEOID']])
+    np.testing.assert_array_equal(values[variables].to_numpy(), expected)
+    requested = {(fields, counties) for fields, _, counties in census_api.acs5.calls}
+    assert requested == {(('B01003_001E',), '039'), (('B25077_001E',), '019'), (('B25077_001E',), '039')}
+
+
+def test_unreadable_table_is_logged_and_left_to_the_census_api(acs_store, tracts, caplog):
+    path = os.path.join(acs_store.year_dir, 'B19013.parquet')
+    with open(path, 'wb') as f:
+        f.write(b'not a parquet file')
+    with caplog.at_level(logging.WARNING, logger='src.acs_store'):
+        store_data, missing = acs_store.lookup(['B19013_001E'], tracts['GEOID'])
+    assert 'B19013' in caplog.text and path in caplog.text
+    assert store_data.empty
+    assert [(variables, sorted(geoids)) for variables, geoids in missing] == [(['B19013_001E'], sorted(tracts['GEOID']))]
+
+
+def test_other_store_errors_are_raised(acs_store, tracts, monkeypatch):
+    def read_parquet(path, **kwargs):
+        raise PermissionError(13, 'Permission denied', path)
+
+    monkeypatch.setattr(pd, 'read_parquet', read_parquet)
+    with pytest.raises(PermissionError):
+        acs_store.lookup(['B19013_001E'], tracts['GEOID'])
@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+from src.batch import run_batch
+from tests.conftest import CENSUS_YEAR, CENTER_LAT, CENTER_LON, StandInCensus, make_tracts
+
+VARIABLES = {'B19013_001E': 'other_metric'}
+
+
+def stand_in_services(config):
+    # Sites are given by coordinates, so no geocoder is needed
+    return {'geocoder': None, 'census_api': StandInCensus(make_tracts()), 'ors_client': None, 'acs_store': None,
+            'isochrone_cache': None, 'poi_store': None}
+
+
+@pytest.fixture
+def sites_path(tmp_path, tracts):
+    path = str(tmp_path / 'sites.csv')
+    pd.DataFrame({'site_id': ['a', 'b', 'c'], 'latitude': CENTER_LAT + pd.Series([0, 0.1, -0.1]),
+                  'longitude': CENTER_LON + pd.Series([0, 0.1, -0.2])}).to_csv(path, index=False)
+    return path
+
+
+def batch(sites_path, output_path, **kwargs):
+    return run_batch(sites_path, output_path, CENSUS_YEAR, VARIABLES, max_workers=1,
+                     service_factory=stand_in_services, **{'radius': 3, **kwargs})
+
+
+def test_empty_input_writes_empty_results(tmp_path):
+    sites_path = str(tmp_path / 'sites.csv')
+    pd.DataFrame(columns=['site_id', 'latitude', 'longitude']).to_csv(sites_path, index=False)
+    results = batch(sites_path, str(tmp_path / 'results.parquet'))
+    assert results.empty
+
+
+def test_rerun_of_a_finished_batch_reuses_the_checkpoint(sites_path, tmp_path):
+    output_path = str(tmp_path / 'results.parquet')
+    results = batch(sites_path, output_path)
+    assert results['error'].isna().all()
+    assert sorted(results['site_id']) == ['a', 'b', 'c']
+    rerun = batch(sites_path, output_path)
+    pd.testing.assert_frame_equal(rerun, results)
+
+
+def test_checkpoint_of_other_settings_is_refused_unless_restarted(sites_path, tmp_path):
+    output_path = str(tmp_path / 'results.parquet')
+    batch(sites_path, output_path)
+    with pytest.raises(ValueError, match='radius'):
+        batch(sites_path, output_path, radius=5)
+    results = batch(sites_path, output_path, radius=5, restart=True)
+    assert len(results) == 3
+    assert (results['radius'] == 5).all()
@@ -0,0 +1,65 @@
+import pytest
+import requests
+from census.core import CensusException
+
+from src.core import call_with_retries, raise_transient_statuses
+
+
+def http_error(status_code):
+    response = requests.Response()
+    response.status_code = status_code
+    return requests.exceptions.HTTPError(f'{status_code} error', response=response)
+
+
+class Flaky:
+    # Fails with the given errors, then succeeds
+    def __init__(self, *errors):
+        self.errors = list(errors)
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.errors:
+            raise self.errors.pop(0)
+        return 'ok'
+
+
+@pytest.mark.parametrize('error', [requests.exceptions.ConnectionError(), requests.exceptions.ReadTimeout(),
+                                   http_error(429), http_error(503)])
+def test_transient_errors_are_retried(error):
+    func = Flaky(error, error)
+    assert call_with_retries(func, max_retries=2, backoff=0) == 'ok'
+    assert func.calls == 3
+
+
+@pytest.mark.parametrize('error', [http_error(400), http_error(404), CensusException('error: unknown variable'),
+                                   ValueError('bad input')])
+def test_other_errors_are_raised_at_once(error):
+    func = Flaky(error)
+    with pytest.raises(type(error)):
+        call_with_retries(func, max_retries=2, backoff=0)
+    assert func.calls == 1
+
+
+def test_transient_errors_are_raised_after_the_last_retry():
+    func = Flaky(*[http_error(502)] * 3)
+    with pytest.raises(requests.exceptions.HTTPError):
+        call_with_retries(func, max_retries=2, backoff=0)
+    assert func.calls == 3
+
+
+@pytest.mark.parametrize('status_code, raises', [(200, False), (204, False), (400, False), (429, True), (500, True)])
+def test_census_sessions_raise_on_transient_statuses(status_code, raises):
+    class CensusClient:
+        session = requests.Session()
+
+    raise_transient_statuses(CensusClient)
+    raise_transient_statuses(CensusClient)
+    assert len(CensusClient.session.hooks['response']) == 1
+    response = requests.Response()
+    response.status_code = status_code
+    if raises:
+        with pytest.raises(requests.exceptions.HTTPError):
+            requests.hooks.dispatch_hook('response', CensusClient.session.hooks, response)
+    else:
+        requests.hooks.dispatch_hook('response', CensusClient.session.hooks, response)
@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+
+from src.catchment_area import CatchmentArea
+from src.census_catalog import DEMOGRAPHIC_PROFILES
+from tests.conftest import CENSUS_YEAR
+
+
+@pytest.fixture
+def catchment_area(location):
+    # A 7 mile circle crosses many tracts, so border tracts are only partly covered
+    catchment_area = CatchmentArea('Fresno, CA', location, 'Distance (miles)', 7)
+    catchment_area.generate_geometry()
+    return catchment_area
+
+
+def test_profile_total_population_matches_catchment_population(catchment_area, census_api):
+    total_pop = catchment_area.calculate_total_population(census_api, CENSUS_YEAR)
+    profile_data, summary = catchment_area.demographic_profile(census_api, CENSUS_YEAR, DEMOGRAPHIC_PROFILES['Retail profile'])
+    assert profile_data['coverage_percentage'].lt(1).any()
+    assert profile_data['B01003_001E'].sum() == pytest.approx(total_pop)
+    assert summary.loc['B01003_001E', 'total'] == pytest.approx(total_pop)
+
+
+def test_profile_averages_are_weighted_by_apportioned_population(catchment_area, census_api):
+    profile_data, summary = catchment_area.demographic_profile(census_api, CENSUS_YEAR, DEMOGRAPHIC_PROFILES['Retail profile'])
+    weights = profile_data['B01003_001E']
+    expected = np.average(profile_data['B19013_001E'], weights=weights)
+    assert summary.loc['B19013_001E', 'average'] == pytest.approx(expected)
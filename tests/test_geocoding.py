@@ -0,0 +1,115 @@
+import sqlite3
+import time
+
+import pytest
+
+from src import geocoding
+from src.geocoding import GazetteerBackend, GeocodeCache, Geocoder, TokenBucket, normalize_address
+
+ADDRESSES = {'1 Main St., Fresno, CA': (36.74, -119.79), '200 Elm Ave, Clovis, CA': (36.82, -119.70)}
+
+
+class CountingBackend(GazetteerBackend):
+    def __init__(self, entries):
+        super().__init__(entries)
+        self.queries = []
+
+    def geocode(self, query, timeout=None, **kwargs):
+        self.queries.append(query)
+        return super().geocode(query, timeout, **kwargs)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return GeocodeCache(str(tmp_path / 'geocodes.sqlite'), ttl_seconds=100, negative_ttl_seconds=10)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Wall clock of the cache, advanced by the tests
+    now = [time.time()]
+    monkeypatch.setattr(geocoding.time, 'time', lambda: now[0])
+    return now
+
+
+def test_normalize_address():
+    assert normalize_address('  1 Main St. ,Fresno,  CA ') == '1 main st, fresno, ca'
+    assert normalize_address('１ MAIN   ST,\tFresno, CA,') == '1 main st, fresno, ca'
+
+
+def test_token_bucket_keeps_its_rate():
+    bucket = TokenBucket(rate=20, capacity=1)
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+    # The first request is sent at once, the next four one twentieth of a second apart
+    assert 0.19 <= time.monotonic() - start < 0.5
+
+
+def test_token_bucket_pause_delays_the_next_request():
+    bucket = TokenBucket(rate=100, capacity=1)
+    bucket.pause(0.1)
+    start = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - start >= 0.1
+
+
+def test_cache_expires_locations_after_the_ttl(cache, clock):
+    location = GazetteerBackend(ADDRESSES).geocode('1 Main St., Fresno, CA')
+    cache.put('gazetteer', '1 Main St., Fresno, CA', location)
+    found, cached = cache.get('gazetteer', '1 main st, fresno, ca')
+    assert found and (cached.latitude, cached.longitude) == (36.74, -119.79)
+    clock[0] += 101
+    assert cache.get('gazetteer', '1 Main St., Fresno, CA') == (False, None)
+
+
+def test_cache_expires_failed_lookups_after_the_negative_ttl(cache, clock):
+    cache.put('gazetteer', 'Nowhere', None)
+    assert cache.get('gazetteer', 'Nowhere') == (True, None)
+    clock[0] += 11
+    assert cache.get('gazetteer', 'Nowhere') == (False, None)
+    # Cached per provider
+    assert cache.get('nominatim', '1 Main St., Fresno, CA') == (False, None)
+
+
+def test_cache_closes_its_connections(cache, monkeypatch):
+    connections = []
+    connect = cache._connect
+    monkeypatch.setattr(cache, '_connect', lambda: connections.append(connect()) or connections[-1])
+    cache.put('gazetteer', 'Nowhere', None)
+    cache.get('gazetteer', 'Nowhere')
+    cache.clear()
+    assert len(connections) == 3
+    for conn in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute('SELECT 1')
+
+
+def test_geocode_batch_dedupes_and_yields_cached_results_first(cache):
+    backend = CountingBackend(ADDRESSES)
+    geocoder = Geocoder(backend, 'gazetteer', cache, bucket=TokenBucket(None))
+    geocoder.geocode('200 Elm Ave, Clovis, CA')
+    backend.queries.clear()
+
+    results = list(geocoder.geocode_batch(['1 Main St., Fresno, CA', '200 elm ave, clovis, ca', '1 main st, fresno, ca',
+                                           'Nowhere']))
+    assert results[0][0] == '200 elm ave, clovis, ca' and results[0][1].latitude == 36.82
+    assert sorted(address for address, _, _ in results) == ['1 Main St., Fresno, CA', '200 elm ave, clovis, ca', 'Nowhere']
+    assert sorted(backend.queries) == ['1 Main St., Fresno, CA', 'Nowhere']
+    located = {address: location for address, location, error in results}
+    assert located['Nowhere'] is None and located['1 Main St., Fresno, CA'].longitude == -119.79
+    # Every result is cached now, failed lookups included
+    backend.queries.clear()
+    assert len(list(geocoder.geocode_batch(ADDRESSES))) == 2
+    assert geocoder.geocode('Nowhere') is None
+    assert backend.queries == []
+
+
+def test_geocode_batch_reports_errors_per_address(cache):
+    class FailingBackend:
+        def geocode(self, query, timeout=None):
+            raise ValueError(f'bad query: {query}')
+
+    geocoder = Geocoder(FailingBackend(), 'gazetteer', cache, bucket=TokenBucket(None))
+    [(address, location, error)] = geocoder.geocode_batch(['1 Main St.'])
+    assert address == '1 Main St.' and location is None and isinstance(error, ValueError)
@@ -0,0 +1,53 @@
+import pandas as pd
+import pytest
+
+from src.catchment_area import CatchmentArea
+from src.overlap_cache import overlap_cache
+from tests.conftest import CENSUS_YEAR
+
+VARIABLES = {'B19013_001E': 'other_metric', 'B01001_002E': 'population_count'}
+POI_TAGS = {'amenity': ['cafe']}
+
+
+def enrich(catchment_area, census_api):
+    population = catchment_area.calculate_total_population(census_api, CENSUS_YEAR)
+    census_data, tracts = catchment_area.demographic_enrichment(census_api, VARIABLES, CENSUS_YEAR, 'Yes')
+    summary = catchment_area.summarize_census_variables(census_api, VARIABLES, CENSUS_YEAR)
+    pois = catchment_area.poi_enrichment(POI_TAGS)
+    return population, census_data, tracts, summary, pois
+
+
+def cold_run(location, radius, census_api, poi_backend):
+    catchment_area = CatchmentArea('Fresno, CA', location, 'Distance (miles)', radius, poi_store=poi_backend)
+    catchment_area.generate_geometry()
+    return enrich(catchment_area, census_api)
+
+
+@pytest.mark.parametrize('radius, resized_radius', [(10, 12), (12, 9)])
+def test_resized_catchment_matches_a_cold_run(location, census_api, poi_backend, radius, resized_radius):
+    catchment_area = CatchmentArea('Fresno, CA', location, 'Distance (miles)', radius, poi_store=poi_backend)
+    catchment_area.generate_geometry()
+    enrich(catchment_area, census_api)
+
+    # Neither run may reuse the other's tract overlaps
+    overlap_cache.clear()
+    census_api.acs5.calls.clear()
+    poi_backend.queries = 0
+    incremental = enrich(catchment_area.with_radius(resized_radius), census_api)
+    incremental_calls, incremental_queries = len(census_api.acs5.calls), poi_backend.queries
+
+    overlap_cache.clear()
+    census_api.acs5.calls.clear()
+    poi_backend.queries = 0
+    cold = cold_run(location, resized_radius, census_api, poi_backend)
+    cold_calls, cold_queries = len(census_api.acs5.calls), poi_backend.queries
+
+    population, census_data, tracts, summary, pois = incremental
+    assert population == pytest.approx(cold[0])
+    pd.testing.assert_frame_equal(census_data.sort_values('GEOID').reset_index(drop=True),
+                                  cold[1].sort_values('GEOID').reset_index(drop=True), check_dtype=False)
+    assert sorted(tracts['GEOID']) == sorted(cold[2]['GEOID'])
+    pd.testing.assert_frame_equal(summary, cold[3])
+    assert sorted(pois.index) == sorted(cold[4].index)
+    assert incremental_calls < cold_calls
+    assert incremental_queries <= cold_queries
@@ -0,0 +1,134 @@
+import sqlite3
+import time
+
+import pytest
+import shapely
+from geopy.location import Location
+
+from src import catchment_area as catchment_module
+from src import isochrone_cache
+from src.catchment_area import CatchmentArea, generate_drive_time_areas
+from src.isochrone_cache import IsochroneCache
+
+from tests.conftest import CENTER_LAT, CENTER_LON
+
+SQUARE = shapely.box(-119.5, 36.7, -119.3, 36.9)
+
+
+class StandInIsochrones:
+    """
+    Isochrone client answering every (location, range) pair with a square around the location.
+    """
+    def __init__(self):
+        self.requests = []
+
+    def isochrones(self, locations, range, **params):
+        self.requests.append((locations, range))
+        features = []
+        for group_index, (lon, lat) in enumerate(locations):
+            for seconds in range:
+                half = seconds / 60 * 0.01
+                features.append({'geometry': shapely.geometry.mapping(shapely.box(lon - half, lat - half, lon + half, lat + half)),
+                                 'properties': {'group_index': group_index, 'value': seconds}})
+        return {'features': features}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return IsochroneCache(str(tmp_path / 'isochrones.sqlite'), snap_meters=100, ttl_seconds=100, max_entries=3)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Wall clock of the cache, advanced by the tests
+    now = [time.time()]
+    monkeypatch.setattr(isochrone_cache.time, 'time', lambda: now[0])
+    return now
+
+
+def test_nearby_origins_share_a_grid_cell(cache):
+    # About 10 m apart, in the middle of a cell
+    col, row = cache.snap(CENTER_LON, CENTER_LAT)
+    lat = (row + 0.5) * cache.snap_meters / isochrone_cache.METERS_PER_DEGREE_LAT
+    lon = CENTER_LON
+    assert cache.key('ors', lon, lat, 'Walking', 10) == cache.key('ors', lon, lat + 0.00009, 'Walking', 10)
+    # About 200 m apart
+    assert cache.key('ors', lon, lat, 'Walking', 10) != cache.key('ors', lon, lat + 0.0018, 'Walking', 10)
+    assert cache.key('ors', lon, lat, 'Walking', 10) != cache.key('ors', lon + 0.0022, lat, 'Walking', 10)
+    # Profiles, ranges and sources never share entries
+    assert len({cache.key('ors', lon, lat, 'Walking', 10), cache.key('ors', lon, lat, 'Cycling (road)', 10),
+                cache.key('ors', lon, lat, 'Walking', 15), cache.key('graph', lon, lat, 'Walking', 10)}) == 4
+
+
+def test_get_counts_hits_and_misses(cache):
+    assert cache.get('ors', CENTER_LON, CENTER_LAT, 'Walking', 10) is None
+    cache.put('ors', CENTER_LON, CENTER_LAT, 'Walking', 10, SQUARE, {'value': 600})
+    geometry, properties = cache.get('ors', CENTER_LON, CENTER_LAT, 'Walking', 10)
+    assert geometry.equals(SQUARE)
+    assert properties == {'value': 600}
+    cache.get('ors', CENTER_LON, CENTER_LAT, 'Walking', 10)
+
+    assert cache.stats() == {'hits': 2, 'misses': 1, 'hit_rate': 2 / 3, 'entries': 1, 'snap_meters': 100}
+    cache.clear()
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'hit_rate': None, 'entries': 0, 'snap_meters': 100}
+
+
+def test_entries_expire_after_the_ttl(cache, clock):
+    cache.put('ors', CENTER_LON, CENTER_LAT, 'Walking', 10, SQUARE, {})
+    clock[0] += 99
+    assert cache.get('ors', CENTER_LON, CENTER_LAT, 'Walking', 10) is not None
+    clock[0] += 2
+    assert cache.get('ors', CENTER_LON, CENTER_LAT, 'Walking', 10) is None
+
+    # Expired entries are deleted on the next write
+    cache.put('ors', CENTER_LON, CENTER_LAT, 'Walking', 15, SQUARE, {})
+    assert cache.stats()['entries'] == 1
+
+
+def test_least_recently_used_entries_are_evicted_past_max_entries(cache, clock):
+    for range_minutes in (5, 10, 15):
+        cache.put('ors', CENTER_LON, CENTER_LAT, 'Walking', range_minutes, SQUARE, {})
+        clock[0] += 1
+    # Reading the oldest entry makes the 10-minute one the least recently used
+    assert cache.get('ors', CENTER_LON, CENTER_LAT, 'Walking', 5) is not None
+    clock[0] += 1
+    cache.put('ors', CENTER_LON, CENTER_LAT, 'Walking', 30, SQUARE, {})
+
+    assert cache.stats()['entries'] == 3
+    assert cache.get('ors', CENTER_LON, CENTER_LAT, 'Walking', 10) is None
+    for range_minutes in (5, 15, 30):
+        assert cache.get('ors', CENTER_LON, CENTER_LAT, 'Walking', range_minutes) is not None
+
+
+def test_connections_are_closed_after_each_call(cache, monkeypatch):
+    connections = []
+    connect = cache._connect
+    monkeypatch.setattr(cache, '_connect', lambda: connections.append(connect()) or connections[-1])
+    cache.put('ors', CENTER_LON, CENTER_LAT, 'Walking', 10, SQUARE, {})
+    cache.get('ors', CENTER_LON, CENTER_LAT, 'Walking', 10)
+    cache.stats()
+    cache.clear()
+
+    assert len(connections) == 4
+    for conn in connections:
+        with pytest.raises(sqlite3.ProgrammingError):
+            conn.execute('SELECT 1')
+
+
+def test_batched_catchments_use_their_own_cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(catchment_module, 'install_cache', lambda *args, **kwargs: None)
+    client = StandInIsochrones()
+    caches = [IsochroneCache(str(tmp_path / f'isochrones_{i}.sqlite')) for i in range(2)]
+    location = Location('Fresno, CA', (CENTER_LAT, CENTER_LON), {})
+    catchments = [CatchmentArea(f'Site {i}', location, 'Travel time (minutes)', 10, 'Walking', ors_client=client,
+                                isochrone_cache=caches[i]) for i in range(2)]
+
+    generate_drive_time_areas(catchments)
+    # One request per cache, each filling only its own cache
+    assert len(client.requests) == 2
+    assert [c.stats()['entries'] for c in caches] == [1, 1]
+
+    generate_drive_time_areas(catchments)
+    assert len(client.requests) == 2
+    assert [c.stats()['hits'] for c in caches] == [1, 1]
+    assert catchments[0].geometry.equals(catchments[1].geometry)
@@ -0,0 +1,47 @@
+import numpy as np
+import shapely
+from scipy.sparse.csgraph import dijkstra
+
+from src.isochrone_engine import RoadGraphIsochroneEngine, save_road_graph
+
+# Toy graph: four nodes 1 km apart along a street at 10 m/s (36 km/h)
+#   0 <-> 1 as two parallel edges (1.5 km and 1 km), 1 -> 2 one-way, 2 <-> 3 a footway
+NODE_X = np.array([-87.60, -87.59, -87.58, -87.57])
+NODE_Y = np.full(4, 41.8)
+
+
+def make_engine(graph_dir):
+    edges = [(0, 1, 1500.0, True), (0, 1, 1000.0, True), (1, 0, 1000.0, True), (1, 2, 1000.0, True),
+             (2, 3, 1000.0, False), (3, 2, 1000.0, False)]
+    u, v, length, motor_ok = zip(*edges)
+    save_road_graph(str(graph_dir), {
+        'node_x': NODE_X, 'node_y': NODE_Y,
+        'edge_u': np.array(u, dtype=np.int32), 'edge_v': np.array(v, dtype=np.int32),
+        'length': np.array(length, dtype=np.float32), 'speed_kph': np.full(len(edges), 36.0, dtype=np.float32),
+        'motor_ok': np.array(motor_ok), 'nonmotor_ok': np.ones(len(edges), dtype=bool),
+    })
+    return RoadGraphIsochroneEngine(str(graph_dir))
+
+
+def test_parallel_edges_keep_the_fastest(tmp_path):
+    engine = make_engine(tmp_path)
+    times = dijkstra(engine.travel_time_matrix('driving-car'), indices=0)
+    np.testing.assert_allclose(times, [0, 100, 200, np.inf])
+
+
+def test_one_way_edges_bind_drivers_only(tmp_path):
+    engine = make_engine(tmp_path)
+    driving = dijkstra(engine.travel_time_matrix('driving-car'), indices=2)
+    np.testing.assert_allclose(driving, [np.inf, np.inf, 0, np.inf])
+    # 5 km/h walking: 720 s per kilometre, against the one-way direction
+    walking = dijkstra(engine.travel_time_matrix('foot-walking'), indices=3)
+    np.testing.assert_allclose(walking, [2160, 1440, 720, 0], rtol=1e-6)
+
+
+def test_isochrone_covers_reachable_nodes(tmp_path):
+    engine = make_engine(tmp_path)
+    nodes = shapely.points(NODE_X, NODE_Y)
+    driving = engine.isochrone(NODE_X[0], NODE_Y[0], 150, 'driving-car')
+    assert shapely.contains(driving, nodes).tolist() == [True, True, False, False]
+    walking = engine.isochrone(NODE_X[3], NODE_Y[3], 1500, 'foot-walking')
+    assert shapely.contains(walking, nodes).tolist() == [False, True, True, True]
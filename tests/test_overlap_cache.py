@@ -0,0 +1,41 @@
+import shapely
+
+from src import catchment_area as catchment_module
+from src.catchment_area import CatchmentArea
+from src.overlap_cache import OVERLAP_CACHE_MAX_ENTRIES, OverlapCache, geometry_key, overlap_cache
+from tests.conftest import CENSUS_YEAR
+
+VARIABLES = {'B19013_001E': 'other_metric', 'B01001_002E': 'population_count'}
+
+
+def test_population_and_demographics_share_one_overlap(location, census_api, monkeypatch):
+    calls = []
+    calculate_overlapping_tracts = catchment_module.calculate_overlapping_tracts
+    monkeypatch.setattr(catchment_module, 'calculate_overlapping_tracts',
+                        lambda *args: calls.append(args) or calculate_overlapping_tracts(*args))
+
+    # Two catchments of the same site, as in two Streamlit reruns
+    population_run, demographics_run = (CatchmentArea('Fresno, CA', location, 'Distance (miles)', 10) for _ in range(2))
+    population_run.generate_geometry()
+    demographics_run.generate_geometry()
+    population_run.calculate_total_population(census_api, CENSUS_YEAR)
+    _, tracts = demographics_run.demographic_enrichment(census_api, VARIABLES, CENSUS_YEAR, 'Yes')
+
+    assert len(calls) == 1
+    assert (overlap_cache.hits, overlap_cache.misses) == (1, 1)
+    assert demographics_run.get_overlapping_tracts(CENSUS_YEAR) is population_run.get_overlapping_tracts(CENSUS_YEAR)
+    assert not tracts.empty
+
+
+def test_least_recently_used_entries_are_evicted_at_the_cap():
+    cache = OverlapCache()
+    boxes = [shapely.box(i, 0, i + 1, 1) for i in range(OVERLAP_CACHE_MAX_ENTRIES + 1)]
+    for i, box in enumerate(boxes[:-1]):
+        cache.get_or_compute(box, CENSUS_YEAR, lambda i=i: i)
+    # Reading the first entry makes the second one the least recently used
+    assert cache.get_or_compute(boxes[0], CENSUS_YEAR, lambda: 'recomputed') == 0
+    cache.get_or_compute(boxes[-1], CENSUS_YEAR, lambda: OVERLAP_CACHE_MAX_ENTRIES)
+
+    assert len(cache) == OVERLAP_CACHE_MAX_ENTRIES
+    assert cache.get(geometry_key(boxes[1], CENSUS_YEAR)) is None
+    assert [cache.get(geometry_key(box, CENSUS_YEAR)) for box in boxes[:1] + boxes[2:]] == [0] + list(range(2, OVERLAP_CACHE_MAX_ENTRIES + 1))
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+import shapely
+
+from src.catchment_area import CatchmentArea
+from src.geometry import geodesic_circle, project, EQUAL_AREA_CRS, METERS_PER_MILE
+from src.population_surface import PopulationSurface, build_population_surface, rasterize_population
+from tests.conftest import CENSUS_YEAR, CENTER_LAT, CENTER_LON, StandInCensus, make_tracts, write_tract_store
+
+CELL_SIZE = 500
+
+
+@pytest.fixture(scope='module')
+def two_state_store(tmp_path_factory):
+    # The synthetic tracts, with the eastern county moved to a second state that the surface leaves out
+    store_dir = str(tmp_path_factory.mktemp('two-state-store'))
+    tracts = make_tracts()
+    east = tracts['COUNTYFP'] == '039'
+    tracts.loc[east, 'STATEFP'] = '32'
+    tracts.loc[east, 'GEOID'] = '32' + tracts.loc[east, 'GEOID'].str[2:]
+    write_tract_store(tracts, store_dir=store_dir)
+    return tracts, store_dir
+
+
+def test_estimate_matches_tract_overlay(location, census_api, tracts):
+    surface = build_population_surface(CENSUS_YEAR, ['06'], CELL_SIZE, census_api)
+    catchment_area = CatchmentArea('Fresno, CA', location, 'Distance (miles)', 12)
+    catchment_area.generate_geometry()
+    exact = catchment_area.calculate_total_population(census_api, CENSUS_YEAR)
+    estimate = surface.estimate(catchment_area.geometry)
+    assert estimate['covered']
+    assert abs(estimate['population'] - exact) <= estimate['error_bound']
+
+
+def test_catchments_reaching_a_missing_state_are_not_covered(two_state_store):
+    tracts, store_dir = two_state_store
+    surface = build_population_surface(CENSUS_YEAR, ['06'], CELL_SIZE, StandInCensus(tracts), store_dir=store_dir)
+    west = geodesic_circle(CENTER_LON - 0.3, CENTER_LAT, 5 * METERS_PER_MILE)
+    # Inside the bounding box of the surface's tracts, but reaching the eastern state
+    assert surface.estimate(west)['covered']
+    assert not surface.estimate(geodesic_circle(CENTER_LON, CENTER_LAT, 5 * METERS_PER_MILE))['covered']
+    # Beyond the tracts, where no state holds any population
+    assert surface.estimate(geodesic_circle(CENTER_LON - 2, CENTER_LAT, 5 * METERS_PER_MILE))['covered']
+
+
+def test_estimates_and_windows_do_not_depend_on_tiling(tracts):
+    geometries = project(tracts.geometry.to_numpy(), tracts.crs.to_string(), EQUAL_AREA_CRS)
+    population = np.random.default_rng(0).integers(500, 8000, len(tracts)).astype(float)
+    large = PopulationSurface(rasterize_population(geometries, population, CELL_SIZE), CELL_SIZE)
+    small = PopulationSurface(rasterize_population(geometries, population, CELL_SIZE, tile_cells=16), CELL_SIZE)
+    assert len(small.tile_keys) > len(large.tile_keys)
+    assert small.total_population == pytest.approx(population.sum())
+    circle = geodesic_circle(CENTER_LON, CENTER_LAT, 20 * METERS_PER_MILE)
+    assert small.estimate(circle)['population'] == pytest.approx(large.estimate(circle)['population'])
+    row, col = int(small.tile_keys[:, 0].min()) - 3, int(small.tile_keys[:, 1].min()) - 3
+    np.testing.assert_allclose(small.window(row, row + 100, col, col + 70), large.window(row, row + 100, col, col + 70))
+
+
+def test_tracts_across_the_antimeridian_only_fill_their_own_tiles():
+    # An Aleutian tract in two parts, either side of 180 degrees
+    tract = shapely.MultiPolygon([shapely.box(179.9, 51.8, 180, 51.9), shapely.box(-180, 51.8, -179.9, 51.9)])
+    tiles = rasterize_population(project(np.array([tract]), 'EPSG:4269', EQUAL_AREA_CRS), np.array([1000.0]), CELL_SIZE)
+    assert len(tiles) <= 4
+    surface = PopulationSurface(tiles, CELL_SIZE)
+    assert surface.total_population == pytest.approx(1000)
+    east = project(shapely.box(179.9, 51.8, 180, 51.9), 'EPSG:4269', 'EPSG:4326')
+    estimate = surface.estimate(east)
+    assert abs(estimate['population'] - 500) <= estimate['error_bound']
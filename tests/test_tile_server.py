@@ -0,0 +1,57 @@
+import geopandas as gpd
+import numpy as np
+import pytest
+import shapely
+
+from src.geometry import project, WGS84
+from src import tile_server
+from src.tile_server import GeoDataFrameLayer, TILE_EXTENT, WEB_MERCATOR, encode_tile, tile_bounds
+
+mapbox_vector_tile = pytest.importorskip('mapbox_vector_tile')
+
+# The tile of zoom 10 holding Fresno, CA
+Z, X, Y = 10, 172, 401
+
+
+def tile_layer():
+    minx, miny, maxx, maxy = tile_bounds(Z, X, Y)
+    size = maxx - minx
+    # A square in the tile's north-west quarter, and a square in another tile
+    squares = [shapely.box(minx + size / 8, maxy - size * 3 / 8, minx + size * 3 / 8, maxy - size / 8),
+               shapely.box(minx - 4 * size, miny - 4 * size, minx - 3 * size, miny - 3 * size)]
+    gdf = gpd.GeoDataFrame({'GEOID': ['06019000100', '06019000200'], 'population': [1200, np.nan]},
+                           geometry=project(np.array(squares), WEB_MERCATOR, WGS84), crs=WGS84)
+    return GeoDataFrameLayer(gdf, ['GEOID', 'population'])
+
+
+def test_tile_bounds_cover_the_world_at_zoom_zero():
+    minx, miny, maxx, maxy = tile_bounds(0, 0, 0)
+    assert (minx, miny) == pytest.approx((-maxx, -maxy))
+    assert tile_bounds(1, 0, 0) == pytest.approx((minx, 0, 0, maxy))
+
+
+@pytest.mark.parametrize('tile_url, local, enabled', [(None, False, False), ('https://tiles.example.org', False, True),
+                                                      (None, True, True)])
+def test_vector_tiles_are_opt_in(monkeypatch, tile_url, local, enabled):
+    # The local server is unreachable from a remote browser, so installing the encoder alone does not enable tiles
+    monkeypatch.setattr(tile_server, 'TILE_SERVER_URL', tile_url)
+    monkeypatch.setattr(tile_server, 'VECTOR_TILES_LOCAL', local)
+    assert tile_server.vector_tiles_enabled() is enabled
+
+
+def test_encoded_tile_holds_the_layer_in_tile_coordinates():
+    tile = mapbox_vector_tile.decode(encode_tile({'census': tile_layer()}, Z, X, Y))
+    assert list(tile) == ['census']
+    assert tile['census']['extent'] == TILE_EXTENT
+    [feature] = tile['census']['features']
+    assert feature['properties'] == {'GEOID': '06019000100', 'population': 1200}
+    # Decoded with the y axis up: the north-west quarter spans 1/8 to 3/8 of the extent from the left and the top
+    xs, ys = np.array(feature['geometry']['coordinates'][0]).T
+    assert (xs.min(), xs.max()) == pytest.approx((TILE_EXTENT / 8, TILE_EXTENT * 3 / 8), abs=1)
+    assert (ys.min(), ys.max()) == pytest.approx((TILE_EXTENT * 5 / 8, TILE_EXTENT * 7 / 8), abs=1)
+
+
+def test_layers_below_their_min_zoom_are_left_out():
+    layer = tile_layer()
+    layer.min_zoom = Z + 1
+    assert mapbox_vector_tile.decode(encode_tile({'census': layer}, Z, X, Y)) == {}